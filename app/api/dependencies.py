@@ -1,8 +1,19 @@
-from app.database import SessionLocal
+from typing import Optional
+from app.database import AsyncSessionLocal
+from app.repositories.query_writer import WalletQueryWriter, get_query_writer
+from app.services.tron import TronService
+from app.utils.tron_client import get_tron_client
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+def get_session_factory():
+    # Для потоковых ответов: сессия должна жить, пока отдаётся тело ответа
+    return AsyncSessionLocal
+
+def get_tron_service() -> TronService:
+    return TronService(client=get_tron_client())
+
+def get_wallet_query_writer() -> Optional[WalletQueryWriter]:
+    return get_query_writer()
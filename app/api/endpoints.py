@@ -1,10 +1,34 @@
-from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
-from app.schemas import WalletQueryCreate, WalletQueryResponse, PaginatedResponse
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import settings
+from app.schemas import (
+    WalletQueryCreate,
+    WalletQueryResponse,
+    PaginatedResponse,
+    TotalMode,
+    WalletBatchQueryCreate,
+    WalletBatchItem,
+    WalletBatchResponse,
+    WalletInfo,
+    WalletSnapshotResponse,
+    TronAddress,
+    DailyHistoryResponse,
+)
 from app.services.tron import TronService
+from app.models import as_utc, utcnow
+from app.repositories.query_writer import WalletQueryWriter
 from app.repositories.wallet import WalletRepository
-from app.api.dependencies import get_db
-from app.api.errors import InvalidRequestError, handle_app_errors
+from app.api.dependencies import get_db, get_session_factory, get_tron_service, get_wallet_query_writer
+from app.utils.cache import TTLValue
+from app.utils.export import MEDIA_TYPES, ExportFormat, csv_header, encode_csv, encode_ndjson
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.api.errors import AppError, InvalidRequestError, TronAPIError, handle_app_errors
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -13,43 +37,282 @@ router = APIRouter()
 async def get_wallet_info(
     request: Request,
     wallet: WalletQueryCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    tron_service: TronService = Depends(get_tron_service),
+    query_writer: Optional[WalletQueryWriter] = Depends(get_wallet_query_writer)
 ):
-    tron_service = TronService()
     wallet_repo = WalletRepository(db)
     
-    wallet_info = tron_service.get_wallet_info(wallet.wallet_address)
-    db_query = wallet_repo.create_wallet_query(wallet_info)
+    wallet_info = await tron_service.get_wallet_info(wallet.wallet_address)
+
+    return await _record_wallet_query(wallet_info, wallet_repo, query_writer)
+
+async def _record_wallet_query(
+    wallet_info: WalletInfo,
+    wallet_repo: WalletRepository,
+    query_writer: Optional[WalletQueryWriter]
+) -> WalletQueryResponse:
+    if query_writer is not None:
+        created_at = utcnow()
+        await query_writer.enqueue(wallet_info, created_at)
+        return WalletQueryResponse(**wallet_info.model_dump(), created_at=created_at)
+
+    db_query = await wallet_repo.create_wallet_query(wallet_info)
     
     return WalletQueryResponse(
         address=db_query.address,
         bandwidth=db_query.bandwidth,
         energy=db_query.energy,
         trx_balance=db_query.trx_balance,
+        resources=wallet_info.resources,
         id=db_query.id,
         created_at=db_query.created_at
     )
 
+@router.get("/wallet-info/{address}", response_model=WalletSnapshotResponse)
+@handle_app_errors
+async def get_wallet_snapshot(
+    request: Request,
+    address: TronAddress,
+    max_age: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    tron_service: TronService = Depends(get_tron_service),
+    query_writer: Optional[WalletQueryWriter] = Depends(get_wallet_query_writer)
+):
+    """Последнее состояние кошелька.
+
+    Если в wallet_latest есть снимок не старше max_age секунд, он отдаётся
+    без обращения к TronGrid. Иначе берётся значение из кэша, если оно
+    получено из TronGrid не раньше max_age секунд назад, или делается
+    запрос в обход кэша; max_age=0 всегда запрашивает TronGrid.
+    """
+    if max_age is None:
+        max_age = settings.WALLET_LATEST_MAX_AGE
+    if max_age < 0:
+        raise InvalidRequestError("max_age must be a non-negative integer")
+
+    wallet_repo = WalletRepository(db)
+
+    if max_age > 0:
+        latest = await wallet_repo.get_latest(address)
+        if latest is not None:
+            updated_at = as_utc(latest.updated_at)
+            if utcnow() - updated_at <= timedelta(seconds=max_age):
+                return WalletSnapshotResponse(
+                    address=latest.address,
+                    bandwidth=latest.bandwidth,
+                    energy=latest.energy,
+                    trx_balance=latest.trx_balance,
+                    updated_at=updated_at,
+                    source="database"
+                )
+
+    wallet_info = None
+    if max_age > 0:
+        wallet_info = await tron_service.get_wallet_info(address)
+        fetched_at = wallet_info.fetched_at
+        if fetched_at is not None and utcnow() - as_utc(fetched_at) > timedelta(seconds=max_age):
+            wallet_info = None
+    if wallet_info is None:
+        wallet_info = await tron_service.refresh_wallet_info(address)
+    result = await _record_wallet_query(wallet_info, wallet_repo, query_writer)
+
+    return WalletSnapshotResponse(
+        **wallet_info.model_dump(),
+        updated_at=as_utc(wallet_info.fetched_at or result.created_at),
+        source="tron"
+    )
+
+@router.post("/wallet-info/batch", response_model=WalletBatchResponse)
+@handle_app_errors
+async def get_wallet_info_batch(
+    request: Request,
+    batch: WalletBatchQueryCreate,
+    db: AsyncSession = Depends(get_db),
+    tron_service: TronService = Depends(get_tron_service),
+    query_writer: Optional[WalletQueryWriter] = Depends(get_wallet_query_writer)
+):
+    if not batch.wallet_addresses:
+        raise InvalidRequestError("wallet_addresses must not be empty")
+    if len(batch.wallet_addresses) > settings.BATCH_MAX_ADDRESSES:
+        raise InvalidRequestError(
+            f"Too many addresses: maximum is {settings.BATCH_MAX_ADDRESSES}"
+        )
+
+    wallet_repo = WalletRepository(db)
+
+    results = await tron_service.get_multiple_wallets(batch.wallet_addresses)
+    found = [info for info in results.values() if not isinstance(info, AppError)]
+    if query_writer is not None:
+        created_at = utcnow()
+        rows = {}
+        for info in found:
+            await query_writer.enqueue(info, created_at)
+            rows[info.address] = WalletQueryResponse(**info.model_dump(), created_at=created_at)
+    else:
+        rows = {row.address: row for row in await wallet_repo.create_wallet_queries(found)}
+
+    items = []
+    for address, info in results.items():
+        if isinstance(info, TronAPIError):
+            items.append(WalletBatchItem(address=address, error="API request failed"))
+        elif isinstance(info, AppError):
+            items.append(WalletBatchItem(address=address, error=str(info)))
+        else:
+            result = WalletQueryResponse.model_validate(rows[info.address])
+            result.resources = info.resources
+            items.append(WalletBatchItem(address=address, result=result))
+
+    return WalletBatchResponse(items=items)
+
+history_total = TTLValue(settings.HISTORY_COUNT_CACHE_TTL)
+
+def _history_range(
+    since: Optional[datetime],
+    until: Optional[datetime]
+) -> tuple[Optional[datetime], Optional[datetime]]:
+    since = as_utc(since) if since is not None else None
+    until = as_utc(until) if until is not None else None
+    if since is not None and until is not None and since >= until:
+        raise InvalidRequestError("since must be earlier than until")
+    return since, until
+
+async def _get_history_total(
+    wallet_repo: WalletRepository,
+    total_mode: TotalMode,
+    address: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Optional[int]:
+    if total_mode == "none":
+        return None
+    filtered = address is not None or since is not None or until is not None
+    if total_mode == "estimated" and not filtered:
+        return await wallet_repo.estimate_total_queries_count()
+    if total_mode == "cached" and not filtered and settings.CACHE_ENABLED:
+        hit, total = history_total.get()
+        if hit:
+            return total
+        total = await wallet_repo.get_total_queries_count()
+        history_total.set(total)
+        return total
+    # Для выборки с фильтром нет ни оценки, ни кэша: ключей по произвольным
+    # since/until неограниченно много. COUNT идёт по индексу (address, created_at, id)
+    return await wallet_repo.get_total_queries_count(address, since, until)
+
 @router.get("/query-history/", response_model=PaginatedResponse)
 @handle_app_errors
 async def get_query_history(
     request: Request,
     page: int = 1,
     per_page: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    total_mode: TotalMode = "exact",
+    address: Optional[TronAddress] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db)
 ):
     wallet_repo = WalletRepository(db)
     
     if page < 1 or per_page < 1:
         raise InvalidRequestError("Page and per_page must be positive integers")
+    since, until = _history_range(since, until)
     
-    skip = (page - 1) * per_page
-    queries = wallet_repo.get_wallet_queries(skip, per_page)
-    total = wallet_repo.get_total_queries_count()
+    if cursor is not None:
+        created_at, query_id = decode_cursor(cursor)
+        queries = await wallet_repo.get_wallet_queries_before(
+            created_at, query_id, per_page + 1, address=address, since=since, until=until
+        )
+        page = None
+    else:
+        skip = (page - 1) * per_page
+        queries = await wallet_repo.get_wallet_queries(
+            skip, per_page + 1, address=address, since=since, until=until
+        )
+
+    next_cursor = None
+    if len(queries) > per_page:
+        queries = queries[:per_page]
+        next_cursor = encode_cursor(queries[-1].created_at, queries[-1].id)
+
+    total = await _get_history_total(wallet_repo, total_mode, address, since, until)
     
     return PaginatedResponse(
         total=total,
         page=page,
         per_page=per_page,
-        items=queries
-    )
\ No newline at end of file
+        items=queries,
+        next_cursor=next_cursor
+    )
+
+@router.get("/query-history/export")
+@handle_app_errors
+async def export_query_history(
+    request: Request,
+    export_format: ExportFormat = Query("ndjson", alias="format"),
+    address: Optional[TronAddress] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_factory: Callable[[], AsyncSession] = Depends(get_session_factory)
+):
+    """Выгрузка истории в NDJSON или CSV потоком, в хронологическом порядке.
+
+    Строки читаются курсором пачками и сериализуются напрямую, без
+    WalletQueryResponse, так что память не растёт с объёмом выгрузки.
+    """
+    since, until = _history_range(since, until)
+    encode = encode_ndjson if export_format == "ndjson" else encode_csv
+
+    # Своя сессия: зависимость get_db может закрыться раньше, чем отдано тело.
+    # Первая пачка читается до ответа, чтобы ошибка БД стала обычным 500, а не обрывом 200
+    session = session_factory()
+    batches = WalletRepository(session).stream_wallet_queries(
+        address, since, until, settings.HISTORY_EXPORT_BATCH_SIZE
+    )
+    try:
+        first = await anext(batches, None)
+    except BaseException:
+        await batches.aclose()
+        await session.close()
+        raise
+
+    async def body():
+        try:
+            if export_format == "csv":
+                yield csv_header()
+            if first is not None:
+                yield encode(first)
+            async for rows in batches:
+                yield encode(rows)
+        except Exception as e:
+            # Статус уже отправлен: ошибка пробрасывается, и сервер обрывает
+            # соединение без завершающего чанка, клиент не примет обрезанный файл за полный
+            logger.error(f"Query history export aborted: {str(e)}")
+            raise
+        finally:
+            await batches.aclose()
+            await session.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="query-history.{export_format}"'}
+    )
+
+@router.get("/query-history/daily", response_model=DailyHistoryResponse)
+@handle_app_errors
+async def get_daily_history(
+    request: Request,
+    address: TronAddress,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Дневные сводки адреса (UTC), включая дни, сырые записи которых уже удалены"""
+    if since is not None and until is not None and since > until:
+        raise InvalidRequestError("since must not be later than until")
+
+    rollups = await WalletRepository(db).get_daily_rollups(address, since, until)
+
+    return DailyHistoryResponse(address=address, items=rollups)
@@ -14,6 +14,10 @@ class TronAPIError(AppError):
     """Ошибка при обращении к Tron API"""
     pass
 
+class UpstreamUnavailableError(TronAPIError):
+    """Tron API недоступен: вызов отклонён (цепь разомкнута, лимит исчерпан) или не дошёл до ответа"""
+    pass
+
 class DatabaseError(AppError):
     """Ошибка работы с базой данных"""
     pass
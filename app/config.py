@@ -1,11 +1,57 @@
 from typing import Optional
 from pydantic_settings import BaseSettings
 
+def _split_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
 class Settings(BaseSettings):
     #API
     database_url: str = "sqlite:///./tron_wallet.db"
+    async_database_url: Optional[str] = None # по умолчанию выводится из database_url
     tron_network: str = "shasta"
 
+    # DATABASE
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # SQLITE
+    SQLITE_PRAGMAS_ENABLED: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -65536 # отрицательное значение - в KiB (64 MiB)
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_TEMP_STORE: str = "MEMORY"
+    SQLITE_POOL_SIZE: int = 5
+
+    # WRITE-BEHIND
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL_MS: int = 200
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000
+    WRITE_BEHIND_OVERFLOW: str = "block" # block, drop
+    WRITE_BEHIND_SHUTDOWN_TIMEOUT: float = 10.0
+
+    # WATCHLIST
+    WATCHLIST_ENABLED: bool = False
+    WATCHLIST_ADDRESSES: str = "" # через запятую, обновляются всегда
+    WATCHLIST_TOP_N: int = 1000 # самые частые адреса из wallet_queries; 0 - только заданные
+    WATCHLIST_LOOKBACK_HOURS: int = 24
+    WATCHLIST_RELOAD_INTERVAL: float = 300.0
+    WATCHLIST_REFRESH_AHEAD: float = 0.8 # обновлять после этой доли CACHE_TTL
+    WATCHLIST_MAX_RPS: float = 5.0 # вызовов upstream в секунду на реплику, обновление адреса - 2 вызова
+    WATCHLIST_CONCURRENCY: int = 4
+
+    # BLOCK FOLLOWER
+    BLOCK_FOLLOWER_ENABLED: bool = False # с ним CACHE_TTL можно сильно увеличить
+    BLOCK_FOLLOWER_MODE: str = "invalidate" # invalidate, refresh
+    BLOCK_FOLLOWER_POLL_INTERVAL: float = 3.0
+    BLOCK_FOLLOWER_MAX_BLOCKS: int = 100 # блоков за один запрос getblockbylimitnext
+    BLOCK_FOLLOWER_CONCURRENCY: int = 4
+
     # LOGGING
     DEBUG: bool = True
     LOG_LEVEL: str = "CRITICAL" # DEBUG, INFO, WARNING, ERROR, CRITICAL
@@ -14,10 +60,99 @@ class Settings(BaseSettings):
     SENTRY_DSN: Optional[str] = None
     TELEGRAM_BOT_TOKEN: Optional[str] = None
     TELEGRAM_CHAT_ID: Optional[str] = None
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 200
+    LOG_FLUSH_INTERVAL: float = 1.0
+    LOG_HTTP_TIMEOUT: float = 5.0
+    LOG_TELEGRAM_MIN_INTERVAL: float = 10.0
+    LOG_TELEGRAM_DEDUPE_WINDOW: float = 300.0
+
+    # TRON HTTP CLIENT
+    TRON_HTTP_MAX_CONNECTIONS: int = 100
+    TRON_HTTP_MAX_KEEPALIVE: int = 20
+    TRON_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    TRON_HTTP_TIMEOUT: float = 10.0
+    TRON_HTTP_CONNECT_TIMEOUT: float = 5.0
+    TRON_HTTP2_ENABLED: bool = False
+
+    # ENDPOINTS
+    TRON_MAINNET_ENDPOINTS: str = "https://api.trongrid.io" # через запятую, первый - основной
+    TRON_SHASTA_ENDPOINTS: str = "https://api.shasta.trongrid.io"
+    TRON_ENDPOINT_EWMA_ALPHA: float = 0.3
+    TRON_ENDPOINT_COOLDOWN: float = 10.0
+    TRON_HEDGE_ENABLED: bool = False
+    TRON_HEDGE_PERCENTILE: float = 0.95
+    TRON_HEDGE_MIN_DELAY: float = 0.05
+
+    # RATE LIMIT
+    # None - только при заданных TRON_API_KEYS: общий анонимный лимит
+    # ограничил бы процесс ~7 промахами кэша в секунду (по 2 вызова на адрес)
+    TRON_RATE_LIMIT_ENABLED: Optional[bool] = None
+    TRON_API_KEYS: str = "" # через запятую; пусто - запросы без своего ключа
+    TRON_API_KEY_DOMAINS: str = "trongrid.io" # через запятую; ключ и лимит только для этих хостов и их поддоменов
+    TRON_RATE_LIMIT_QPS: float = 15.0 # на каждый ключ, по лимиту TronGrid для ключа
+    TRON_RATE_LIMIT_BURST: float = 15.0
+    TRON_RATE_LIMIT_MAX_WAIT: float = 5.0
+    TRON_RATE_LIMIT_MAX_RETRIES: int = 2
+
+    # CIRCUIT BREAKER
+    TRON_BREAKER_ENABLED: bool = True
+    TRON_BREAKER_FAIL_MAX: int = 5
+    TRON_BREAKER_RESET_TIMEOUT: float = 30.0
+
+    # ADAPTIVE CONCURRENCY
+    TRON_LIMIT_INITIAL: int = 20
+    TRON_LIMIT_MIN: int = 2
+    TRON_LIMIT_MAX: int = 100
+    TRON_LIMIT_LATENCY_TARGET: float = 1.0
+    TRON_LIMIT_BACKOFF: float = 0.7
+    TRON_LIMIT_QUEUE_TIMEOUT: float = 1.0
+
+    # BATCH
+    BATCH_MAX_ADDRESSES: int = 100
+    BATCH_CONCURRENCY: int = 10
+
+    # HISTORY
+    HISTORY_COUNT_CACHE_TTL: int = 30
+    HISTORY_MAINTENANCE_ENABLED: bool = False # дневные сводки и срок хранения
+    HISTORY_MAINTENANCE_INTERVAL: float = 3600.0
+    HISTORY_RETENTION_DAYS: int = 0 # 0 - хранить сырые записи бессрочно
+    HISTORY_RETENTION_MODE: str = "delete" # delete, archive (в wallet_queries_archive)
+    HISTORY_RETENTION_CHUNK_SIZE: int = 5000
+    HISTORY_RETENTION_CHUNK_PAUSE: float = 0.05
+    HISTORY_EXPORT_BATCH_SIZE: int = 1000 # строк на выборку курсора при экспорте
+
+    # WALLET LATEST
+    WALLET_LATEST_MAX_AGE: int = 60 # по умолчанию для GET /api/wallet-info/{address}, секунд
 
     # CACHE
     CACHE_ENABLED: bool = True
     CACHE_MAX_SIZE: int = 1000
+    CACHE_TTL: int = 300
+    CACHE_STALE_TTL: int = 60
+    CACHE_NEGATIVE_TTL: int = 15
+    CACHE_FALLBACK_TTL: int = 3600 # сколько хранить значение для отдачи при недоступном TronGrid
+    CACHE_SWEEP_INTERVAL: float = 60.0
+    CACHE_BACKEND: str = "memory" # memory, redis, tiered
+    CACHE_L1_MAX_TTL: float = 30.0
+    CACHE_REDIS_PREFIX: str = "tron_api:"
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    @property
+    def watchlist_addresses(self) -> list[str]:
+        return _split_list(self.WATCHLIST_ADDRESSES)
+
+    @property
+    def tron_api_keys(self) -> list[str]:
+        return _split_list(self.TRON_API_KEYS)
+
+    @property
+    def tron_api_key_domains(self) -> list[str]:
+        return _split_list(self.TRON_API_KEY_DOMAINS)
+
+    def tron_endpoints(self, network: Optional[str] = None) -> list[str]:
+        network = network or self.tron_network
+        return _split_list(self.TRON_MAINNET_ENDPOINTS if network == "mainnet" else self.TRON_SHASTA_ENDPOINTS)
     
     class Config:
         env_file = ".env"
@@ -1,13 +1,89 @@
-from sqlalchemy import create_engine
+from typing import Any
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 from app.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.database_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def is_sqlite_memory(url: str) -> bool:
+    database = make_url(url).database
+    return not database or database == ":memory:" or database.startswith("file::memory:")
+
+def sqlite_pragmas() -> dict[str, Any]:
+    return {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+        "temp_store": settings.SQLITE_TEMP_STORE,
+    }
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: dict[str, Any]):
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False}
+        if is_sqlite_memory(url):
+            # Одна общая in-memory база на процесс
+            options["poolclass"] = StaticPool
+            return options
+        # Для файловой SQLite держим открытые соединения: pragma и кэш страниц
+        # живут на соединении, а пишущий всё равно один
+        options["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+        options.update(
+            pool_size=settings.SQLITE_POOL_SIZE,
+            max_overflow=0,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+        return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+def create_sync_engine(url: str) -> Engine:
+    engine = create_engine(url, **engine_options(url))
+    if url.startswith("sqlite") and settings.SQLITE_PRAGMAS_ENABLED:
+        apply_sqlite_pragmas(engine, sqlite_pragmas())
+    return engine
+
+def create_async_db_engine(url: str):
+    engine = create_async_engine(url, **engine_options(url, is_async=True))
+    if url.startswith("sqlite") and settings.SQLITE_PRAGMAS_ENABLED:
+        apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas())
+    return engine
+
+ASYNC_DATABASE_URL = settings.async_database_url or to_async_url(SQLALCHEMY_DATABASE_URL)
+
+engine = create_sync_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+async_engine = create_async_db_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+Base = declarative_base()
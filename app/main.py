@@ -1,10 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.api.endpoints import router
 from app.config import settings
-from app.utils.logging.logging import setup_logging
+from app.database import AsyncSessionLocal, async_engine
+from app.repositories.query_writer import get_query_writer, start_query_writer, stop_query_writer
+from app.services.block_follower import get_block_follower, start_block_follower, stop_block_follower
+from app.services.history_maintenance import get_history_maintenance, start_history_maintenance, stop_history_maintenance
+from app.services.tron import TronService
+from app.services.watchlist import get_watchlist_refresher, start_watchlist_refresher, stop_watchlist_refresher
+from app.utils.cache import cache_manager
+from app.utils.logging.logging import setup_logging, shutdown_logging
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.tron_client import close_tron_client, get_pool_stats, get_resilience_stats, get_tron_client
 
 setup_logging()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tron_client = get_tron_client()
+    if settings.WRITE_BEHIND_ENABLED:
+        start_query_writer(AsyncSessionLocal)
+    if settings.WATCHLIST_ENABLED and settings.CACHE_ENABLED:
+        start_watchlist_refresher(TronService(client=tron_client), AsyncSessionLocal)
+    if settings.BLOCK_FOLLOWER_ENABLED and settings.CACHE_ENABLED:
+        start_block_follower(tron_client, TronService(client=tron_client))
+    if settings.HISTORY_MAINTENANCE_ENABLED:
+        start_history_maintenance(AsyncSessionLocal)
+    yield
+    await stop_history_maintenance()
+    await stop_block_follower()
+    await stop_watchlist_refresher()
+    await stop_query_writer()
+    await close_tron_client()
+    await cache_manager.close()
+    await async_engine.dispose()
+    shutdown_logging()
+
 app = FastAPI(
     title="Tron Wallet Info Service",
     description="Microservice for retrieving Tron wallet information",
@@ -12,10 +44,27 @@ app = FastAPI(
     docs_url="/api/docs",  
     redoc_url="/api/redoc",  
     openapi_url="/api/openapi.json",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
 app.include_router(router, prefix="/api")
 
 @app.get("/", include_in_schema=False) 
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    writer = get_query_writer()
+    refresher = get_watchlist_refresher()
+    follower = get_block_follower()
+    maintenance = get_history_maintenance()
+    return {
+        "status": "ok",
+        "tron_pool": get_pool_stats(),
+        "tron_resilience": get_resilience_stats(),
+        "write_behind": writer.stats() if writer is not None else None,
+        "watchlist": refresher.stats() if refresher is not None else None,
+        "block_follower": follower.stats() if follower is not None else None,
+        "history_maintenance": maintenance.stats() if maintenance is not None else None,
+    }
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,16 +1,80 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime, timezone
+from sqlalchemy import Column, Date, Index, Integer, String, DateTime
 from sqlalchemy.sql import func
 from app.database import Base
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite хранит и возвращает время без часового пояса, в UTC: приводим
+    # к UTC и входные значения, иначе сравнение строк в запросах неверно
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
 class WalletQuery(Base):
     __tablename__ = "wallet_queries"
+    __table_args__ = (
+        Index("ix_wallet_queries_created_at_id", "created_at", "id"),
+        # История адреса за период и курсор по ней - без сортировки
+        Index("ix_wallet_queries_address_created_at_id", "address", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    address = Column(String, index=True)
+    address = Column(String)
     bandwidth = Column(Integer, nullable=True)
     energy = Column(Integer, nullable=True)
     trx_balance = Column(Integer, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Значение из Python, чтобы в SQLite у всех строк был одинаковый формат
+    # времени (с микросекундами) и сравнение курсоров пагинации было корректным
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
     
     def __repr__(self):
-        return f"<WalletQuery {self.wallet_address}>"
\ No newline at end of file
+        return f"<WalletQuery {self.address}>"
+
+class WalletLatest(Base):
+    """Последнее известное состояние адреса; обновляется при каждом запросе к TronGrid"""
+    __tablename__ = "wallet_latest"
+
+    address = Column(String, primary_key=True)
+    bandwidth = Column(Integer, nullable=True)
+    energy = Column(Integer, nullable=True)
+    trx_balance = Column(Integer, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=utcnow)
+
+    def __repr__(self):
+        return f"<WalletLatest {self.address}>"
+
+class WalletQueryArchive(Base):
+    """Записи wallet_queries старше срока хранения (HISTORY_RETENTION_MODE=archive)"""
+    __tablename__ = "wallet_queries_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    address = Column(String)
+    bandwidth = Column(Integer, nullable=True)
+    energy = Column(Integer, nullable=True)
+    trx_balance = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), index=True)
+
+    def __repr__(self):
+        return f"<WalletQueryArchive {self.address}>"
+
+class WalletDailyRollup(Base):
+    """Сводка запросов адреса за сутки (UTC); переживает удаление сырых записей"""
+    __tablename__ = "wallet_daily_rollups"
+
+    address = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    queries = Column(Integer, nullable=False)
+    min_trx_balance = Column(Integer, nullable=True)
+    max_trx_balance = Column(Integer, nullable=True)
+    last_trx_balance = Column(Integer, nullable=True)
+    min_energy = Column(Integer, nullable=True)
+    max_energy = Column(Integer, nullable=True)
+    last_energy = Column(Integer, nullable=True)
+    min_bandwidth = Column(Integer, nullable=True)
+    max_bandwidth = Column(Integer, nullable=True)
+    last_bandwidth = Column(Integer, nullable=True)
+    last_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<WalletDailyRollup {self.address} {self.day}>"
@@ -0,0 +1,156 @@
+import asyncio
+from datetime import datetime
+from typing import Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.errors import DatabaseError
+from app.config import settings
+from app.repositories.wallet import WalletRepository
+from app.schemas import WalletInfo
+import logging
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WalletQueryWriter:
+    """Отложенная (write-behind) запись истории запросов пачками в фоне"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        max_queue_size: int = 10000,
+        overflow: str = "block"
+    ):
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"Unknown write-behind overflow policy: {overflow}")
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Write-behind query writer started")
+
+    async def enqueue(self, wallet_info: WalletInfo, created_at: datetime) -> bool:
+        record = {
+            "address": wallet_info.address,
+            "bandwidth": wallet_info.bandwidth,
+            "energy": wallet_info.energy,
+            "trx_balance": wallet_info.trx_balance,
+            "created_at": created_at,
+            "fetched_at": wallet_info.fetched_at
+        }
+        if self._closed:
+            self.dropped += 1
+            logger.warning("Write-behind writer is closed, query record dropped")
+            return False
+        if self.overflow == "drop":
+            try:
+                self._queue.put_nowait(record)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                logger.warning("Write-behind queue is full, query record dropped")
+                return False
+        else:
+            await self._queue.put(record)
+        self.enqueued += 1
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        try:
+            async with self._session_factory() as session:
+                self.written += await WalletRepository(session).insert_wallet_queries(batch)
+            self.flushes += 1
+        except DatabaseError:
+            self.failed += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Write-behind flush failed: {str(e)}", exc_info=True)
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Прекращает приём записей и дожидается сброса очереди в БД"""
+        if self._task is None or self._closed:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Write-behind writer did not drain in {timeout}s, "
+                f"{self._queue.qsize()} records lost"
+            )
+            self._task.cancel()
+        logger.info(f"Write-behind query writer stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+_writer: Optional[WalletQueryWriter] = None
+
+def get_query_writer() -> Optional[WalletQueryWriter]:
+    return _writer
+
+def start_query_writer(session_factory: Callable[[], AsyncSession]) -> WalletQueryWriter:
+    global _writer
+    if _writer is None:
+        _writer = WalletQueryWriter(
+            session_factory,
+            batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+            flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL_MS / 1000,
+            max_queue_size=settings.WRITE_BEHIND_QUEUE_SIZE,
+            overflow=settings.WRITE_BEHIND_OVERFLOW
+        )
+        _writer.start()
+    return _writer
+
+async def stop_query_writer():
+    global _writer
+    if _writer is not None:
+        await _writer.stop(timeout=settings.WRITE_BEHIND_SHUTDOWN_TIMEOUT)
+        _writer = None
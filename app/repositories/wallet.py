@@ -1,47 +1,470 @@
-from sqlalchemy import exc
-from sqlalchemy.orm import Session
-from app.models import WalletQuery
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, Optional
+from sqlalchemy import delete, exc, func, insert, select, text, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import WalletDailyRollup, WalletLatest, WalletQuery, WalletQueryArchive, utcnow
 from app.schemas import WalletInfo
 from app.api.errors import DatabaseError
+from app.utils.metrics import DB_OPERATION_LATENCY
 import logging
 
 logger = logging.getLogger(__name__)
 
+_DB_COMMIT = DB_OPERATION_LATENCY.labels("commit")
+_DB_REFRESH = DB_OPERATION_LATENCY.labels("refresh")
+_DB_INSERT = DB_OPERATION_LATENCY.labels("insert")
+_DB_SELECT = DB_OPERATION_LATENCY.labels("select")
+_DB_COUNT = DB_OPERATION_LATENCY.labels("count")
+_DB_UPSERT = DB_OPERATION_LATENCY.labels("upsert")
+_DB_DELETE = DB_OPERATION_LATENCY.labels("delete")
+_DB_ROLLUP = DB_OPERATION_LATENCY.labels("rollup")
+
+_DIALECT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+def _latest_records(records: list[dict]) -> list[dict]:
+    """По одной записи на адрес - самой свежей.
+
+    Одна команда ON CONFLICT не может обновить строку дважды.
+    """
+    latest = {}
+    for record in records:
+        current = latest.get(record["address"])
+        if current is None or current["updated_at"] <= record["updated_at"]:
+            latest[record["address"]] = record
+    return list(latest.values())
+
+def _filter_history(
+    query,
+    address: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Фильтр по адресу и полуинтервалу [since, until) для wallet_queries"""
+    if address is not None:
+        query = query.where(WalletQuery.address == address)
+    if since is not None:
+        query = query.where(WalletQuery.created_at >= since)
+    if until is not None:
+        query = query.where(WalletQuery.created_at < until)
+    return query
+
+def day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
 class WalletRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def create_wallet_query(self, wallet_info: WalletInfo) -> WalletQuery:
+    async def create_wallet_query(self, wallet_info: WalletInfo) -> WalletQuery:
         try:
+            created_at = utcnow()
             db_query = WalletQuery(
                 address=wallet_info.address,
                 bandwidth=wallet_info.bandwidth,
                 energy=wallet_info.energy,
-                trx_balance=wallet_info.trx_balance
+                trx_balance=wallet_info.trx_balance,
+                created_at=created_at
             )
             self.db.add(db_query)
-            self.db.commit()
-            self.db.refresh(db_query)
+            await self._upsert_latest([{
+                "address": wallet_info.address,
+                "bandwidth": wallet_info.bandwidth,
+                "energy": wallet_info.energy,
+                "trx_balance": wallet_info.trx_balance,
+                # Значение могло прийти из кэша: снимок датируется получением из TronGrid
+                "updated_at": wallet_info.fetched_at or created_at
+            }])
+            with _DB_COMMIT.time():
+                await self.db.commit()
+            with _DB_REFRESH.time():
+                await self.db.refresh(db_query)
             return db_query
         except exc.SQLAlchemyError as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Database error: {str(e)}", exc_info=True)
             raise DatabaseError("Failed to create wallet record") from e
 
-    def get_wallet_queries(self, skip: int = 0, limit: int = 10) -> list[WalletQuery]:
+    async def create_wallet_queries(self, wallet_infos: list[WalletInfo]) -> list[Row]:
+        if not wallet_infos:
+            return []
+        try:
+            table = WalletQuery.__table__
+            with _DB_INSERT.time():
+                result = await self.db.execute(
+                    insert(table).returning(*table.c, sort_by_parameter_order=True),
+                    [
+                        {
+                            "address": info.address,
+                            "bandwidth": info.bandwidth,
+                            "energy": info.energy,
+                            "trx_balance": info.trx_balance
+                        }
+                        for info in wallet_infos
+                    ]
+                )
+            rows = result.all()
+            await self._upsert_latest([
+                {
+                    "address": row.address,
+                    "bandwidth": row.bandwidth,
+                    "energy": row.energy,
+                    "trx_balance": row.trx_balance,
+                    "updated_at": info.fetched_at or row.created_at
+                }
+                for row, info in zip(rows, wallet_infos)
+            ])
+            with _DB_COMMIT.time():
+                await self.db.commit()
+            return rows
+        except exc.SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to create wallet records") from e
+
+    async def insert_wallet_queries(self, records: list[dict]) -> int:
+        """Записи с ключами колонок wallet_queries и необязательным fetched_at"""
+        if not records:
+            return 0
+        try:
+            with _DB_INSERT.time():
+                await self.db.execute(insert(WalletQuery.__table__), [
+                    {key: value for key, value in record.items() if key != "fetched_at"}
+                    for record in records
+                ])
+            await self._upsert_latest([
+                {
+                    "address": record["address"],
+                    "bandwidth": record["bandwidth"],
+                    "energy": record["energy"],
+                    "trx_balance": record["trx_balance"],
+                    "updated_at": record.get("fetched_at") or record["created_at"]
+                }
+                for record in records
+            ])
+            with _DB_COMMIT.time():
+                await self.db.commit()
+            return len(records)
+        except exc.SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to insert wallet records") from e
+
+    async def _upsert_latest(self, records: list[dict]):
+        """Обновляет wallet_latest в текущей транзакции.
+
+        Более старый снимок (например, из отложенной пачки) не затирает новый.
+        """
+        if not records:
+            return
+        statement = _DIALECT_INSERTS[self.db.get_bind().dialect.name](WalletLatest).values(
+            _latest_records(records)
+        )
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[WalletLatest.address],
+            set_={
+                "bandwidth": excluded.bandwidth,
+                "energy": excluded.energy,
+                "trx_balance": excluded.trx_balance,
+                "updated_at": excluded.updated_at,
+            },
+            where=WalletLatest.updated_at <= excluded.updated_at
+        )
+        with _DB_UPSERT.time():
+            await self.db.execute(statement)
+
+    async def get_latest(self, address: str) -> Optional[WalletLatest]:
         try:
-            return self.db.query(WalletQuery)\
-                    .order_by(WalletQuery.created_at.desc())\
-                    .offset(skip)\
-                    .limit(limit)\
-                    .all()
+            with _DB_SELECT.time():
+                return await self.db.get(WalletLatest, address)
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to fetch latest wallet state") from e
+
+    async def get_wallet_queries(
+        self,
+        skip: int = 0,
+        limit: int = 10,
+        address: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> list[WalletQuery]:
+        try:
+            with _DB_SELECT.time():
+                result = await self.db.execute(
+                    _filter_history(select(WalletQuery), address, since, until)
+                        .order_by(WalletQuery.created_at.desc(), WalletQuery.id.desc())
+                        .offset(skip)
+                        .limit(limit)
+                )
+            return list(result.scalars().all())
         except exc.SQLAlchemyError as e:
             logger.error(f"Database error: {str(e)}", exc_info=True)
             raise DatabaseError("Failed to fetch queries") from e
 
-    def get_total_queries_count(self) -> int:
+    async def get_wallet_queries_before(
+        self,
+        created_at: Optional[datetime] = None,
+        query_id: Optional[int] = None,
+        limit: int = 10,
+        address: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> list[WalletQuery]:
+        try:
+            query = _filter_history(select(WalletQuery), address, since, until)
+            if created_at is not None and query_id is not None:
+                query = query.where(
+                    tuple_(WalletQuery.created_at, WalletQuery.id) < tuple_(created_at, query_id)
+                )
+            with _DB_SELECT.time():
+                result = await self.db.execute(
+                    query
+                        .order_by(WalletQuery.created_at.desc(), WalletQuery.id.desc())
+                        .limit(limit)
+                )
+            return list(result.scalars().all())
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to fetch queries") from e
+
+    async def stream_wallet_queries(
+        self,
+        address: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[list[Row]]:
+        """Записи истории в хронологическом порядке пачками по batch_size.
+
+        Курсор на стороне сервера (yield_per): память не зависит от объёма
+        выборки. Отдаются кортежи (id, address, bandwidth, energy,
+        trx_balance, created_at), без ORM-объектов.
+        """
+        columns = (
+            WalletQuery.id,
+            WalletQuery.address,
+            WalletQuery.bandwidth,
+            WalletQuery.energy,
+            WalletQuery.trx_balance,
+            WalletQuery.created_at,
+        )
+        query = (
+            _filter_history(select(*columns), address, since, until)
+                .order_by(WalletQuery.created_at, WalletQuery.id)
+                .execution_options(yield_per=batch_size)
+        )
+        try:
+            result = await self.db.stream(query)
+            async for partition in result.partitions():
+                yield partition
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to stream queries") from e
+
+    async def get_total_queries_count(
+        self,
+        address: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> int:
+        try:
+            with _DB_COUNT.time():
+                return await self.db.scalar(
+                    _filter_history(select(func.count()).select_from(WalletQuery), address, since, until)
+                )
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to count queries") from e
+
+    async def estimate_total_queries_count(self) -> int:
+        try:
+            if self.db.get_bind().dialect.name == "postgresql":
+                estimate = await self.db.scalar(
+                    text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+                    {"table": WalletQuery.__tablename__}
+                )
+                if estimate is not None and estimate >= 0:
+                    return estimate
+            # Удаляются только самые старые записи (retention), так что диапазон id
+            # по первичному ключу ~ числу строк
+            first_id, last_id = (await self.db.execute(
+                select(func.min(WalletQuery.id), func.max(WalletQuery.id))
+            )).one()
+            return last_id - first_id + 1 if last_id is not None else 0
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to estimate queries count") from e
+
+    async def get_top_addresses(self, limit: int, since: Optional[datetime] = None) -> list[str]:
+        try:
+            query = select(WalletQuery.address)
+            if since is not None:
+                query = query.where(WalletQuery.created_at >= since)
+            query = (
+                query
+                    .group_by(WalletQuery.address)
+                    .order_by(func.count().desc())
+                    .limit(limit)
+            )
+            with _DB_SELECT.time():
+                return list((await self.db.scalars(query)).all())
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to fetch top addresses") from e
+
+    async def get_first_query_time(self) -> Optional[datetime]:
+        try:
+            with _DB_SELECT.time():
+                return await self.db.scalar(select(func.min(WalletQuery.created_at)))
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to fetch first query time") from e
+
+    async def get_last_rollup_day(self) -> Optional[date]:
+        try:
+            with _DB_SELECT.time():
+                return await self.db.scalar(select(func.max(WalletDailyRollup.day)))
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to fetch last rollup day") from e
+
+    async def rollup_day(self, day: date) -> int:
+        """Пересчитывает сводки за сутки (UTC) по сырым записям; возвращает число адресов"""
+        start, end = day_bounds(day)
+        try:
+            in_day = (WalletQuery.created_at >= start, WalletQuery.created_at < end)
+            ranked = (
+                select(
+                    WalletQuery.address,
+                    WalletQuery.trx_balance,
+                    WalletQuery.energy,
+                    WalletQuery.bandwidth,
+                    func.row_number().over(
+                        partition_by=WalletQuery.address,
+                        order_by=(WalletQuery.created_at.desc(), WalletQuery.id.desc())
+                    ).label("position")
+                )
+                .where(*in_day)
+                .subquery()
+            )
+            with _DB_ROLLUP.time():
+                aggregates = (await self.db.execute(
+                    select(
+                        WalletQuery.address,
+                        func.count(),
+                        func.min(WalletQuery.trx_balance),
+                        func.max(WalletQuery.trx_balance),
+                        func.min(WalletQuery.energy),
+                        func.max(WalletQuery.energy),
+                        func.min(WalletQuery.bandwidth),
+                        func.max(WalletQuery.bandwidth),
+                        func.max(WalletQuery.created_at)
+                    )
+                    .where(*in_day, WalletQuery.address.is_not(None))
+                    .group_by(WalletQuery.address)
+                )).all()
+                last = {
+                    row.address: row
+                    for row in (await self.db.execute(
+                        select(ranked).where(ranked.c.position == 1)
+                    )).all()
+                }
+            records = [
+                {
+                    "address": address,
+                    "day": day,
+                    "queries": queries,
+                    "min_trx_balance": min_balance,
+                    "max_trx_balance": max_balance,
+                    "last_trx_balance": last[address].trx_balance,
+                    "min_energy": min_energy,
+                    "max_energy": max_energy,
+                    "last_energy": last[address].energy,
+                    "min_bandwidth": min_bandwidth,
+                    "max_bandwidth": max_bandwidth,
+                    "last_bandwidth": last[address].bandwidth,
+                    "last_at": last_at,
+                }
+                for (
+                    address, queries, min_balance, max_balance, min_energy, max_energy,
+                    min_bandwidth, max_bandwidth, last_at
+                ) in aggregates
+            ]
+            if records:
+                statement = _DIALECT_INSERTS[self.db.get_bind().dialect.name](WalletDailyRollup)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[WalletDailyRollup.address, WalletDailyRollup.day],
+                    set_={
+                        column: statement.excluded[column]
+                        for column in records[0]
+                        if column not in ("address", "day")
+                    }
+                )
+                with _DB_UPSERT.time():
+                    await self.db.execute(statement, records)
+            with _DB_COMMIT.time():
+                await self.db.commit()
+            return len(records)
+        except exc.SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to roll up queries") from e
+
+    async def purge_queries_before(self, cutoff: datetime, limit: int, archive: bool = False) -> int:
+        """Удаляет (или переносит в архив) не больше limit самых старых записей до cutoff.
+
+        Одна пачка - одна короткая транзакция, чтобы не держать блокировку таблицы.
+        """
+        try:
+            with _DB_SELECT.time():
+                ids = list((await self.db.scalars(
+                    select(WalletQuery.id)
+                        .where(WalletQuery.created_at < cutoff)
+                        .order_by(WalletQuery.created_at, WalletQuery.id)
+                        .limit(limit)
+                )).all())
+            if not ids:
+                return 0
+            with _DB_DELETE.time():
+                if archive:
+                    columns = [column.name for column in WalletQueryArchive.__table__.c]
+                    await self.db.execute(
+                        insert(WalletQueryArchive).from_select(
+                            columns,
+                            select(*(WalletQuery.__table__.c[name] for name in columns))
+                                .where(WalletQuery.id.in_(ids))
+                        )
+                    )
+                await self.db.execute(delete(WalletQuery).where(WalletQuery.id.in_(ids)))
+            with _DB_COMMIT.time():
+                await self.db.commit()
+            return len(ids)
+        except exc.SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error: {str(e)}", exc_info=True)
+            raise DatabaseError("Failed to purge old queries") from e
+
+    async def get_daily_rollups(
+        self,
+        address: str,
+        since: Optional[date] = None,
+        until: Optional[date] = None
+    ) -> list[WalletDailyRollup]:
         try:
-            return self.db.query(WalletQuery).count()
+            query = select(WalletDailyRollup).where(WalletDailyRollup.address == address)
+            if since is not None:
+                query = query.where(WalletDailyRollup.day >= since)
+            if until is not None:
+                query = query.where(WalletDailyRollup.day <= until)
+            with _DB_SELECT.time():
+                return list((await self.db.scalars(query.order_by(WalletDailyRollup.day.desc()))).all())
         except exc.SQLAlchemyError as e:
             logger.error(f"Database error: {str(e)}", exc_info=True)
-            raise DatabaseError("Failed to count queries") from e
\ No newline at end of file
+            raise DatabaseError("Failed to fetch daily rollups") from e
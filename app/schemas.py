@@ -1,28 +1,84 @@
-from pydantic import BaseModel, Field
-from typing import Optional
-from datetime import datetime
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Literal, Optional
+from datetime import date, datetime
+from app.utils.address import normalize_address
+
+# Адрес проверяется и приводится к base58 до любых обращений к сети и БД
+TronAddress = Annotated[str, AfterValidator(normalize_address)]
+
+class AccountResources(BaseModel):
+    free_net_limit: int = 0
+    free_net_used: int = 0
+    net_limit: int = 0
+    net_used: int = 0
+    energy_limit: int = 0
+    energy_used: int = 0
 
 class WalletInfo(BaseModel):
     address: str
-    bandwidth: Optional[int] = Field(None)
-    energy: Optional[int] = Field(None)
-    trx_balance: Optional[int] = Field(None)
+    bandwidth: Optional[int] = Field(None) # израсходованный бесплатный bandwidth
+    energy: Optional[int] = Field(None) # израсходованная энергия
+    trx_balance: Optional[int] = Field(None) # в целых TRX
+    # Полные лимиты и расход; в истории запросов не сохраняются
+    resources: Optional[AccountResources] = None
+    # Когда получено из TronGrid; хранится вместе со значением в кэше, в ответ не выводится
+    fetched_at: Optional[datetime] = Field(None, exclude=True)
     
     class Config:
         from_attributes = True
 
 class WalletQueryCreate(BaseModel):
-    wallet_address: str
+    wallet_address: TronAddress
+
+class WalletBatchQueryCreate(BaseModel):
+    wallet_addresses: list[TronAddress]
 
 class WalletQueryResponse(WalletInfo):
-    id: int
+    # None, пока запись ожидает отложенного сохранения (write-behind)
+    id: Optional[int] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class WalletSnapshotResponse(WalletInfo):
+    updated_at: datetime # когда состояние получено из TronGrid
+    source: Literal["database", "tron"]
+
+TotalMode = Literal["exact", "cached", "estimated", "none"]
+
 class PaginatedResponse(BaseModel):
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    items: list[WalletQueryResponse]
\ No newline at end of file
+    items: list[WalletQueryResponse]
+    next_cursor: Optional[str] = None
+
+class WalletBatchItem(BaseModel):
+    address: str
+    result: Optional[WalletQueryResponse] = None
+    error: Optional[str] = None
+
+class WalletBatchResponse(BaseModel):
+    items: list[WalletBatchItem]
+
+class DailyRollup(BaseModel):
+    day: date
+    queries: int
+    min_trx_balance: Optional[int] = None
+    max_trx_balance: Optional[int] = None
+    last_trx_balance: Optional[int] = None
+    min_energy: Optional[int] = None
+    max_energy: Optional[int] = None
+    last_energy: Optional[int] = None
+    min_bandwidth: Optional[int] = None
+    max_bandwidth: Optional[int] = None
+    last_bandwidth: Optional[int] = None
+    last_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class DailyHistoryResponse(BaseModel):
+    address: str
+    items: list[DailyRollup]
@@ -0,0 +1,187 @@
+import asyncio
+from typing import Optional
+from tronpy import AsyncTron
+from app.config import settings
+from app.services.tron import WALLET_INFO_CACHE_PREFIX, TronService
+from app.utils.cache import CacheManager, cache_manager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Поля контрактов, адреса в которых меняют баланс или ресурсы аккаунта
+ADDRESS_FIELDS = (
+    "owner_address",
+    "to_address",
+    "receiver_address",
+    "account_address",
+    "origin_address",
+)
+
+def extract_touched_addresses(block: dict) -> set[str]:
+    """Адреса, затронутые транзакциями блока (формат visible=True)"""
+    touched = set()
+    for transaction in block.get("transactions", ()):
+        for contract in transaction.get("raw_data", {}).get("contract", ()):
+            value = contract.get("parameter", {}).get("value", {})
+            for field in ADDRESS_FIELDS:
+                address = value.get(field)
+                if address:
+                    touched.add(address)
+    return touched
+
+def block_number(block: dict) -> int:
+    return block["block_header"]["raw_data"]["number"]
+
+class BlockFollower:
+    """Следит за новыми блоками и сбрасывает кэш только затронутых кошельков.
+
+    mode="invalidate" удаляет записи из кэша, mode="refresh" сразу загружает
+    их заново. Адреса, которых нет в кэше, не трогаются. Блоки читаются
+    пачками не больше max_blocks; при большем отставании пачки идут подряд,
+    без паузы poll_interval, пока follower не догонит сеть.
+    """
+
+    def __init__(
+        self,
+        client: AsyncTron,
+        service: Optional[TronService] = None,
+        cache: CacheManager = cache_manager,
+        mode: str = "invalidate",
+        poll_interval: float = 3.0,
+        max_blocks: int = 100,
+        concurrency: int = 4
+    ):
+        if mode not in ("invalidate", "refresh"):
+            raise ValueError(f"Unknown block follower mode: {mode}")
+        if mode == "refresh" and service is None:
+            raise ValueError("Block follower in refresh mode requires a TronService")
+        self._client = client
+        self._service = service
+        self._cache = cache
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.max_blocks = max_blocks
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self.last_block: Optional[int] = None
+        self.blocks = 0
+        self.invalidated = 0
+        self.refreshed = 0
+        self.errors = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Block follower started (mode: {self.mode})")
+
+    async def fetch_blocks(self, start: int, end: int) -> list[dict]:
+        """Блоки [start, end) одним запросом"""
+        response = await self._client.provider.make_request(
+            "wallet/getblockbylimitnext", {"startNum": start, "endNum": end, "visible": True}
+        )
+        return sorted(response.get("block", []), key=block_number)
+
+    async def poll(self) -> bool:
+        """Обрабатывает очередную пачку блоков; True, если follower ещё отстаёт"""
+        head = await self._client.get_latest_block_number()
+        if self.last_block is None:
+            self.last_block = head
+            return False
+        if head <= self.last_block:
+            return False
+
+        end = min(head, self.last_block + self.max_blocks)
+        if end < head:
+            logger.warning(f"Block follower is {head - self.last_block} blocks behind, catching up")
+        for block in await self.fetch_blocks(self.last_block + 1, end + 1):
+            await self.apply_block(block)
+            self.last_block = block_number(block)
+        # Пропущенные узлом блоки не должны зациклить догонялку
+        self.last_block = max(self.last_block, end)
+        return end < head
+
+    async def apply_block(self, block: dict):
+        self.blocks += 1
+        touched = extract_touched_addresses(block)
+        if not touched:
+            return
+        keys = {self._cache.make_key(WALLET_INFO_CACHE_PREFIX, address): address for address in touched}
+        cached = await self._cache.cached_keys(list(keys))
+        if not cached:
+            return
+
+        if self.mode == "invalidate":
+            for key in cached:
+                await self._cache.delete(key)
+            self.invalidated += len(cached)
+            return
+
+        async def refresh(address: str):
+            async with self._semaphore:
+                try:
+                    # Загрузка, начатая до блока, вернула бы прежнее состояние
+                    await self._service.refresh_wallet_info(address, join=False)
+                    self.refreshed += 1
+                except Exception as e:
+                    # Устаревшее значение всё равно лучше удалить, чем отдавать до конца TTL
+                    logger.warning(f"Block-driven refresh failed for {address}: {str(e)}")
+                    await self._cache.delete(self._cache.make_key(WALLET_INFO_CACHE_PREFIX, address))
+                    self.invalidated += 1
+
+        await asyncio.gather(*(refresh(keys[key]) for key in cached))
+
+    async def _run(self):
+        while True:
+            behind = False
+            try:
+                behind = await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Block follower poll failed: {str(e)}")
+            if not behind:
+                await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info(f"Block follower stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "last_block": self.last_block,
+            "blocks": self.blocks,
+            "invalidated": self.invalidated,
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+        }
+
+_follower: Optional[BlockFollower] = None
+
+def get_block_follower() -> Optional[BlockFollower]:
+    return _follower
+
+def start_block_follower(client: AsyncTron, service: TronService) -> BlockFollower:
+    global _follower
+    if _follower is None:
+        _follower = BlockFollower(
+            client,
+            service,
+            mode=settings.BLOCK_FOLLOWER_MODE,
+            poll_interval=settings.BLOCK_FOLLOWER_POLL_INTERVAL,
+            max_blocks=settings.BLOCK_FOLLOWER_MAX_BLOCKS,
+            concurrency=settings.BLOCK_FOLLOWER_CONCURRENCY
+        )
+        _follower.start()
+    return _follower
+
+async def stop_block_follower():
+    global _follower
+    if _follower is not None:
+        await _follower.stop()
+        _follower = None
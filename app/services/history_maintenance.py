@@ -0,0 +1,152 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.errors import AppError
+from app.config import settings
+from app.models import as_utc, utcnow
+from app.repositories.wallet import WalletRepository, day_bounds
+import logging
+
+logger = logging.getLogger(__name__)
+
+class HistoryMaintenance:
+    """Сводки по дням и срок хранения для wallet_queries.
+
+    Сначала досчитываются дневные сводки: с последнего посчитанного дня
+    (он мог быть неполным) по сегодняшний. Затем записи старше
+    retention_days удаляются или переносятся в архив пачками по chunk_size
+    с паузой между ними - каждая пачка отдельная короткая транзакция.
+    Удаляются только дни, по которым сводки уже посчитаны.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        retention_days: int = 0,
+        mode: str = "delete",
+        chunk_size: int = 5000,
+        chunk_pause: float = 0.05,
+        interval: float = 3600.0
+    ):
+        if mode not in ("delete", "archive"):
+            raise ValueError(f"Unknown history retention mode: {mode}")
+        self._session_factory = session_factory
+        self.retention_days = retention_days
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.chunk_pause = chunk_pause
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.rolled_up_days = 0
+        self.purged = 0
+        self.runs = 0
+        self.errors = 0
+        self.last_run: Optional[datetime] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("History maintenance started")
+
+    async def rollup(self, today: Optional[date] = None) -> date:
+        """Досчитывает сводки; возвращает первый день, сводка которого может быть неполной"""
+        today = today or utcnow().date()
+        async with self._session_factory() as session:
+            repo = WalletRepository(session)
+            day = await repo.get_last_rollup_day()
+            if day is None:
+                first = await repo.get_first_query_time()
+                if first is None:
+                    return today
+                day = as_utc(first).date()
+            while day <= today:
+                await repo.rollup_day(day)
+                self.rolled_up_days += 1
+                day += timedelta(days=1)
+        return today
+
+    async def purge(self, rolled_up_until: date) -> int:
+        if self.retention_days <= 0:
+            return 0
+        cutoff, _ = day_bounds(utcnow().date() - timedelta(days=self.retention_days))
+        # Сырые записи дня удаляем только после того, как по нему посчитана полная сводка
+        cutoff = min(cutoff, day_bounds(rolled_up_until)[0])
+        purged = 0
+        while True:
+            async with self._session_factory() as session:
+                count = await WalletRepository(session).purge_queries_before(
+                    cutoff, self.chunk_size, archive=self.mode == "archive"
+                )
+            purged += count
+            if count < self.chunk_size:
+                break
+            await asyncio.sleep(self.chunk_pause)
+        self.purged += purged
+        if purged:
+            logger.info(f"History retention {self.mode}d {purged} queries older than {cutoff.isoformat()}")
+        return purged
+
+    async def run_once(self):
+        rolled_up_until = await self.rollup()
+        await self.purge(rolled_up_until)
+        self.runs += 1
+        self.last_run = utcnow()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except AppError as e:
+                self.errors += 1
+                logger.warning(f"History maintenance failed: {str(e)}")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"History maintenance failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info(f"History maintenance stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "retention_days": self.retention_days,
+            "mode": self.mode,
+            "runs": self.runs,
+            "rolled_up_days": self.rolled_up_days,
+            "purged": self.purged,
+            "errors": self.errors,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
+
+_maintenance: Optional[HistoryMaintenance] = None
+
+def get_history_maintenance() -> Optional[HistoryMaintenance]:
+    return _maintenance
+
+def start_history_maintenance(session_factory: Callable[[], AsyncSession]) -> HistoryMaintenance:
+    global _maintenance
+    if _maintenance is None:
+        _maintenance = HistoryMaintenance(
+            session_factory,
+            retention_days=settings.HISTORY_RETENTION_DAYS,
+            mode=settings.HISTORY_RETENTION_MODE,
+            chunk_size=settings.HISTORY_RETENTION_CHUNK_SIZE,
+            chunk_pause=settings.HISTORY_RETENTION_CHUNK_PAUSE,
+            interval=settings.HISTORY_MAINTENANCE_INTERVAL
+        )
+        _maintenance.start()
+    return _maintenance
+
+async def stop_history_maintenance():
+    global _maintenance
+    if _maintenance is not None:
+        await _maintenance.stop()
+        _maintenance = None
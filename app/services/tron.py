@@ -1,68 +1,209 @@
-from datetime import datetime
-from typing import Optional
-from app.config import Settings
+import asyncio
+import time
+from typing import Optional, Union
+import httpx
+from tronpy import AsyncTron
+from tronpy.exceptions import AddressNotFound
+from app.config import settings
+from app.models import utcnow
+from app.utils import tron_client
 from app.utils.tron_client import initialize_tron_client
 from app.utils.cache import cache_manager
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
-from app.schemas import WalletInfo
-from app.api.errors import TronAPIError
+from app.utils.metrics import TRON_REQUEST_ERRORS, TRON_REQUEST_LATENCY, TRON_RETRIES
+from app.utils.resilience import CLOSED, AdaptiveConcurrencyLimiter, CircuitBreaker
+from tenacity import retry, stop_after_attempt, wait_exponential
+from app.schemas import AccountResources, WalletInfo
+from app.api.errors import AppError, TronAPIError, UpstreamUnavailableError, WalletNotFoundError
 import logging
 
 logger = logging.getLogger(__name__)
 
+WALLET_INFO_CACHE_PREFIX = "wallet_info"
+SUN_PER_TRX = 1_000_000
+UPSTREAM_CALLS_PER_WALLET = 2 # getaccount и getaccountresource на один адрес
+
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError)
+# Ошибки, говорящие о недоступности upstream, а не об ответе на конкретный запрос
+UPSTREAM_FAILURES = (ConnectionError, TimeoutError, httpx.HTTPError)
+
+_MISSING = object()
+
+def _method_name(method: callable) -> str:
+    return getattr(method, "__name__", "unknown")
+
+def _record_retry(retry_state):
+    TRON_RETRIES.labels(_method_name(retry_state.args[1])).inc()
+
+def _should_retry(retry_state) -> bool:
+    # Пока цепь разомкнута, ждать перед повтором бессмысленно: он будет отклонён
+    if not isinstance(retry_state.outcome.exception(), RETRYABLE_ERRORS):
+        return False
+    breaker = retry_state.args[0].breaker
+    return breaker is None or breaker.state == CLOSED
+
+def parse_resources(resource: dict) -> AccountResources:
+    return AccountResources(
+        free_net_limit=resource.get("freeNetLimit", 0),
+        free_net_used=resource.get("freeNetUsed", 0),
+        net_limit=resource.get("NetLimit", 0),
+        net_used=resource.get("NetUsed", 0),
+        energy_limit=resource.get("EnergyLimit", 0),
+        energy_used=resource.get("EnergyUsed", 0)
+    )
+
+def parse_wallet_info(address: str, account: dict, resource: dict) -> WalletInfo:
+    """WalletInfo из ответов getaccount и getaccountresource.
+
+    Основные поля сохраняют прежний смысл, они же хранятся в истории:
+    bandwidth и energy - израсходованные (free_net_usage и energy_usage
+    из getaccount), trx_balance - целые TRX. Лимиты и расход по ресурсам -
+    в resources, время получения - в fetched_at.
+    """
+    return WalletInfo(
+        address=address,
+        bandwidth=account.get("free_net_usage"),
+        energy=account.get("account_resource", {}).get("energy_usage"),
+        trx_balance=account.get("balance", 0) // SUN_PER_TRX,
+        resources=parse_resources(resource),
+        fetched_at=utcnow()
+    )
+
 class TronService:
-    def __init__(self):
-        self.client = initialize_tron_client()
+    def __init__(
+        self,
+        client: Optional[AsyncTron] = None,
+        breaker: Optional[CircuitBreaker] = _MISSING,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = _MISSING
+    ):
+        self.client = client or initialize_tron_client()
+        self.breaker = tron_client.tron_breaker if breaker is _MISSING else breaker
+        self.limiter = tron_client.tron_limiter if limiter is _MISSING else limiter
         self._cache = cache_manager
 
+    async def _admit(self):
+        if self.breaker is not None:
+            self.breaker.before_call()
+        if self.limiter is not None:
+            try:
+                await self.limiter.acquire()
+            except BaseException:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+
+    def _settle(self, succeeded: Optional[bool], latency: float):
+        # succeeded=None: вызов отменён, ни успехом, ни ошибкой upstream не считается
+        if self.limiter is not None:
+            self.limiter.release(None if succeeded is None else latency, failed=succeeded is False)
+        if self.breaker is not None:
+            if succeeded is None:
+                self.breaker.release()
+            elif succeeded:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((ConnectionError, TimeoutError)),
+        retry=_should_retry,
+        before_sleep=_record_retry,
         reraise=True
     )
-    def _safe_api_call(self, method: callable, *args, **kwargs):
+    async def _safe_api_call(self, method: callable, *args, **kwargs):
+        name = _method_name(method)
+        await self._admit()
+        started = time.perf_counter()
+        succeeded = None
         try:
-            return method(*args, **kwargs)
+            result = await method(*args, **kwargs)
+            succeeded = True
+            return result
         except Exception as e:
+            # Ответ с ошибкой (например, AddressNotFound) означает, что upstream жив;
+            # отказ локального лимита запросов (UpstreamUnavailableError) - без вердикта
+            if not isinstance(e, UpstreamUnavailableError):
+                succeeded = not isinstance(e, UPSTREAM_FAILURES)
+            TRON_REQUEST_ERRORS.labels(name).inc()
             logger.warning(f"API call failed: {str(e)}")
             raise
+        finally:
+            latency = time.perf_counter() - started
+            TRON_REQUEST_LATENCY.labels(name).observe(latency)
+            self._settle(succeeded, latency)
 
-    @cache_manager.cached()
-    def get_wallet_info(self, address: str) -> WalletInfo:
+    @cache_manager.cached(
+        ttl=settings.CACHE_TTL,
+        key_prefix=WALLET_INFO_CACHE_PREFIX,
+        single_flight=True,
+        stale_ttl=settings.CACHE_STALE_TTL,
+        negative_ttl=settings.CACHE_NEGATIVE_TTL,
+        negative_exceptions=(TronAPIError, WalletNotFoundError),
+        fallback_exceptions=(UpstreamUnavailableError,),
+        fallback_ttl=settings.CACHE_FALLBACK_TTL
+    )
+    async def get_wallet_info(self, address: str) -> WalletInfo:
         try:
-            account = self._safe_api_call(self.client.get_account, address)
-            balance = self._safe_api_call(self.client.get_account_balance, address)
-            
-            return WalletInfo(
-                address=address,
-                bandwidth=account.get("free_net_usage", None),
-                energy=account.get("account_resource", {}).get("energy_usage", None),
-                trx_balance=balance if balance is not None else None
-            )
+            # get_account_balance в tronpy - тот же getaccount, баланс берём из ответа
+            if self.breaker is None or self.breaker.state == CLOSED:
+                account, resource = await asyncio.gather(
+                    self._safe_api_call(self.client.get_account, address),
+                    self._safe_api_call(self.client.get_account_resource, address),
+                )
+            else:
+                # Цепь пропускает один пробный вызов: второй идёт после того,
+                # как проба её замкнёт, иначе он был бы отклонён
+                account = await self._safe_api_call(self.client.get_account, address)
+                resource = await self._safe_api_call(self.client.get_account_resource, address)
+            return parse_wallet_info(address, account, resource)
+        except AddressNotFound:
+            raise WalletNotFoundError(f"Wallet {address} not found")
+        except UpstreamUnavailableError:
+            raise
+        except UPSTREAM_FAILURES as e:
+            # Недоступность upstream, а не ответ про этот адрес: не кэшируется
+            # как ошибка и позволяет отдать сохранённое значение
+            logger.warning(f"Tron API unavailable for {address}: {str(e)}")
+            raise UpstreamUnavailableError(f"API request failed: {str(e)}") from e
         except Exception as e:
             logger.error(f"Tron API error for {address}: {str(e)}")
             raise TronAPIError(f"API request failed: {str(e)}")
 
-    def get_multiple_wallets(self, addresses: list[str]) -> dict[str, Optional[WalletInfo]]:
-        results = {}
-        uncached_addresses = []
+    async def refresh_wallet_info(self, address: str, join: bool = True) -> WalletInfo:
+        """Обновляет запись в кэше, минуя чтение из него.
 
-        for addr in addresses:
-            cache_key = f"wallet_info:{addr}"
-            cached = self._cache._cache_store.get(cache_key)
-            if cached and datetime.now() < cached['expires_at']:
-                results[addr] = cached['value']
-            else:
-                uncached_addresses.append(addr)
-        for addr in uncached_addresses:
-            try:
-                results[addr] = self.get_wallet_info(addr)
-            except TronAPIError as e:
-                results[addr] = None
-                logger.warning(f"Skipped address {addr} due to error: {str(e)}")
-        
-        return results
-
-    def clear_cache(self):
-        self._cache.clear_cache()
\ No newline at end of file
+        join=False - не присоединяться к загрузке, начатой до изменения кошелька.
+        """
+        if join:
+            return await TronService.get_wallet_info.refresh(self, address)
+        return await TronService.get_wallet_info.reload(self, address)
+
+    async def get_multiple_wallets(
+        self,
+        addresses: list[str],
+        concurrency: Optional[int] = None
+    ) -> dict[str, Union[WalletInfo, AppError]]:
+        unique_addresses = list(dict.fromkeys(addresses))
+        keys = {addr: self._cache.make_key(WALLET_INFO_CACHE_PREFIX, addr) for addr in unique_addresses}
+        cached = await self._cache.get_many(list(keys.values())) if settings.CACHE_ENABLED else {}
+
+        results = {addr: cached[key] for addr, key in keys.items() if key in cached}
+        uncached_addresses = [addr for addr in unique_addresses if addr not in results]
+
+        semaphore = asyncio.Semaphore(concurrency or settings.BATCH_CONCURRENCY)
+
+        async def fetch(addr: str) -> Union[WalletInfo, AppError]:
+            async with semaphore:
+                try:
+                    return await self.get_wallet_info(addr)
+                except (TronAPIError, WalletNotFoundError) as e:
+                    logger.warning(f"Skipped address {addr} due to error: {str(e)}")
+                    return e
+
+        fetched = await asyncio.gather(*(fetch(addr) for addr in uncached_addresses))
+        results.update(zip(uncached_addresses, fetched))
+
+        return {addr: results[addr] for addr in unique_addresses}
+
+    async def clear_cache(self):
+        await self._cache.clear_cache()
@@ -0,0 +1,202 @@
+import asyncio
+from datetime import timedelta
+import heapq
+import time
+from typing import Callable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.api.errors import AppError
+from app.config import settings
+from app.models import utcnow
+from app.repositories.wallet import WalletRepository
+from app.services.tron import UPSTREAM_CALLS_PER_WALLET, TronService
+from app.utils.address import normalize_address
+from app.utils.rate_limit import TokenBucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WatchlistRefresher:
+    """Фоновое обновление кэша для горячих адресов до истечения TTL.
+
+    Список составляется из заданных адресов и самых частых адресов в
+    wallet_queries за lookback и перечитывается раз в reload_interval.
+    Каждый адрес обновляется через refresh_interval после предыдущего
+    обновления. max_rps ограничивает вызовы upstream (calls_per_refresh на
+    обновление) в этом процессе: реплики обновляют список независимо, и их
+    суммарная нагрузка - max_rps на каждую.
+    """
+
+    def __init__(
+        self,
+        service: TronService,
+        session_factory: Callable[[], AsyncSession],
+        addresses: Optional[list[str]] = None,
+        top_n: int = 1000,
+        lookback: timedelta = timedelta(hours=24),
+        reload_interval: float = 300.0,
+        refresh_interval: float = 240.0,
+        max_rps: float = 5.0,
+        concurrency: int = 4,
+        calls_per_refresh: int = UPSTREAM_CALLS_PER_WALLET
+    ):
+        self._service = service
+        self._session_factory = session_factory
+        self.configured = list(addresses or [])
+        self.top_n = top_n
+        self.lookback = lookback
+        self.reload_interval = reload_interval
+        self.refresh_interval = refresh_interval
+        self.calls_per_refresh = calls_per_refresh
+        self._budget = TokenBucket(max_rps, max(float(calls_per_refresh), max_rps))
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._watched: set[str] = set()
+        self._due: list[tuple[float, str]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._refreshes: set[asyncio.Task] = set()
+        self.refreshed = 0
+        self.failed = 0
+        self.max_lag = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Watchlist refresher started")
+
+    async def load_addresses(self) -> list[str]:
+        addresses = list(self.configured)
+        if self.top_n > 0:
+            try:
+                async with self._session_factory() as session:
+                    addresses += await WalletRepository(session).get_top_addresses(
+                        self.top_n, since=utcnow() - self.lookback
+                    )
+            except AppError as e:
+                logger.warning(f"Watchlist reload failed, keeping previous list: {str(e)}")
+                return list(self._watched)
+        return list(dict.fromkeys(addresses))
+
+    def _schedule(self, address: str, due: float):
+        heapq.heappush(self._due, (due, address))
+        self._wakeup.set()
+
+    async def reload(self):
+        addresses = await self.load_addresses()
+        now = time.monotonic()
+        added = [address for address in addresses if address not in self._watched]
+        self._watched = set(addresses)
+        # Новые адреса прогреваем сразу: темп задаёт бюджет, дальше обновления
+        # распределяются во времени сами
+        for address in added:
+            self._schedule(address, now)
+        refreshes = len(self._watched) / self.refresh_interval if self.refresh_interval else 0
+        required = refreshes * self.calls_per_refresh
+        if required > self._budget.rate:
+            logger.warning(
+                f"Watchlist needs {required:.1f} upstream calls/s ({refreshes:.1f} refreshes/s) "
+                f"but budget is {self._budget.rate:.1f}/s, some addresses will expire before refresh"
+            )
+        logger.info(f"Watchlist reloaded: {len(self._watched)} addresses, {len(added)} new")
+
+    async def _refresh(self, address: str, due: float):
+        try:
+            async with self._semaphore:
+                self.max_lag = max(self.max_lag, time.monotonic() - due)
+                await self._service.refresh_wallet_info(address)
+            self.refreshed += 1
+            next_due = time.monotonic() + self.refresh_interval
+        except AppError as e:
+            self.failed += 1
+            logger.warning(f"Watchlist refresh failed for {address}: {str(e)}")
+            next_due = time.monotonic() + self.refresh_interval / 4
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Watchlist refresh failed for {address}: {str(e)}", exc_info=True)
+            next_due = time.monotonic() + self.refresh_interval / 4
+        if address in self._watched:
+            self._schedule(address, next_due)
+
+    async def _run(self):
+        next_reload = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= next_reload:
+                try:
+                    await self.reload()
+                except Exception as e:
+                    logger.error(f"Watchlist reload failed: {str(e)}", exc_info=True)
+                next_reload = now + self.reload_interval
+                continue
+
+            if not self._due or self._due[0][0] > now:
+                wake_at = min(next_reload, self._due[0][0] if self._due else next_reload)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wake_at - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due, address = heapq.heappop(self._due)
+            if address not in self._watched:
+                continue
+            cost = self.calls_per_refresh
+            if self._budget.refill(now) < cost:
+                await asyncio.sleep(self._budget.time_to_token(cost))
+                self._budget.refill(time.monotonic())
+            self._budget.tokens -= cost
+
+            task = asyncio.create_task(self._refresh(address, due))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refreshes.discard)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        for task in (self._task, *self._refreshes):
+            task.cancel()
+        await asyncio.gather(self._task, *self._refreshes, return_exceptions=True)
+        self._task = None
+        logger.info(f"Watchlist refresher stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "watched": len(self._watched),
+            "scheduled": len(self._due),
+            "in_flight": len(self._refreshes),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "max_lag_seconds": round(self.max_lag, 3),
+        }
+
+_refresher: Optional[WatchlistRefresher] = None
+
+def get_watchlist_refresher() -> Optional[WatchlistRefresher]:
+    return _refresher
+
+def start_watchlist_refresher(
+    service: TronService,
+    session_factory: Callable[[], AsyncSession]
+) -> WatchlistRefresher:
+    global _refresher
+    if _refresher is None:
+        _refresher = WatchlistRefresher(
+            service,
+            session_factory,
+            # Тот же ключ кэша, что и у запросов через API
+            addresses=[normalize_address(address) for address in settings.watchlist_addresses],
+            top_n=settings.WATCHLIST_TOP_N,
+            lookback=timedelta(hours=settings.WATCHLIST_LOOKBACK_HOURS),
+            reload_interval=settings.WATCHLIST_RELOAD_INTERVAL,
+            refresh_interval=settings.CACHE_TTL * settings.WATCHLIST_REFRESH_AHEAD,
+            max_rps=settings.WATCHLIST_MAX_RPS,
+            concurrency=settings.WATCHLIST_CONCURRENCY
+        )
+        _refresher.start()
+    return _refresher
+
+async def stop_watchlist_refresher():
+    global _refresher
+    if _refresher is not None:
+        await _refresher.stop()
+        _refresher = None
@@ -0,0 +1,70 @@
+from functools import lru_cache
+from hashlib import sha256
+
+ADDRESS_PREFIX = 0x41
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+# Таблица символ -> значение; -1 для символов вне алфавита
+_B58_VALUES = [-1] * 128
+for _index, _char in enumerate(_B58_ALPHABET):
+    _B58_VALUES[ord(_char)] = _index
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+def _checksum(payload: bytes) -> bytes:
+    return sha256(sha256(payload).digest()).digest()[:4]
+
+def _b58decode_check(value: str) -> bytes:
+    number = 0
+    for char in value:
+        digit = _B58_VALUES[ord(char)] if ord(char) < 128 else -1
+        if digit < 0:
+            raise ValueError(f"invalid character {char!r}")
+        number = number * 58 + digit
+    try:
+        raw = number.to_bytes(25, "big")
+    except OverflowError:
+        raise ValueError("invalid length") from None
+    payload, checksum = raw[:21], raw[21:]
+    if payload[0] != ADDRESS_PREFIX:
+        raise ValueError("invalid prefix")
+    if _checksum(payload) != checksum:
+        raise ValueError("checksum mismatch")
+    return payload
+
+def _b58encode_check(payload: bytes) -> str:
+    number = int.from_bytes(payload + _checksum(payload), "big")
+    chars = []
+    while number:
+        number, digit = divmod(number, 58)
+        chars.append(_B58_ALPHABET[digit])
+    # Первый байт 0x41 ненулевой, ведущих '1' не бывает
+    return "".join(reversed(chars))
+
+@lru_cache(maxsize=65536)
+def normalize_address(value: str) -> str:
+    """Каноническая base58check-форма адреса Tron.
+
+    Принимает base58 (T...), hex с префиксом 41 (42 символа) и
+    0x + 20 байт. Проверка локальная, без обращения к сети; повторные
+    адреса отдаются из кэша.
+    """
+    if not isinstance(value, str):
+        raise ValueError("Address must be a string")
+    value = value.strip()
+    if len(value) == 34 and value[0] == "T":
+        try:
+            _b58decode_check(value)
+        except ValueError as e:
+            raise ValueError(f"Invalid Tron address: {str(e)}") from None
+        return value
+    if len(value) == 42 and value[:2] in ("0x", "0X"):
+        value = "41" + value[2:]
+    if len(value) == 42 and value[:2] == "41" and _HEX_DIGITS.issuperset(value):
+        return _b58encode_check(bytes.fromhex(value))
+    raise ValueError(f"Invalid Tron address: {value[:64]!r}")
+
+def is_valid_address(value: str) -> bool:
+    try:
+        normalize_address(value)
+        return True
+    except ValueError:
+        return False
@@ -1,18 +1,22 @@
+import asyncio
 from functools import wraps
-from datetime import datetime, timedelta
-from typing import Callable, Optional, TypeVar, Any
-import hashlib
-import pickle
+from typing import Awaitable, Callable, Optional, TypeVar, Any
 from app.config import settings
+from app.utils.cache_backends import MISSING, CacheBackend, CachedValue, create_backend
+from app.utils.metrics import registry
+from app.utils.singleflight import SingleFlight
 import logging
 import inspect
+import time
 
 logger = logging.getLogger(__name__)
 T = TypeVar('T')
 
+KEY_SEPARATOR = ":"
+
 class CacheManager:
     _instance = None
-    _cache_store = {}
+    _backend: CacheBackend
     
     def __new__(cls):
         if cls._instance is None:
@@ -22,65 +26,257 @@ class CacheManager:
     
     @classmethod
     def _setup_cache(cls):
-        cls._cache_store = {}
-        logger.info("Cache initialized")
+        cls._backend = create_backend()
+        cls._flight = SingleFlight()
+        cls._refreshes = set()
+        cls.hits = 0
+        cls.misses = 0
+        cls.stale_hits = 0
+        cls.negative_hits = 0
+        cls.fallback_hits = 0
+        logger.info(
+            f"Cache initialized (backend: {settings.CACHE_BACKEND}, max size: {settings.CACHE_MAX_SIZE})"
+        )
     
     @staticmethod
-    def _generate_key(func: Callable, *args, **kwargs) -> str:
-        if args and inspect.ismethod(func):
-            args = args[1:]  
-        
-        try:
-            args_str = pickle.dumps((args, kwargs))
-        except (pickle.PicklingError, TypeError):
-            args_str = f"{args!r}:{kwargs!r}".encode('utf-8')
-        
-        return f"{func.__module__}.{func.__name__}:{hashlib.md5(args_str).hexdigest()}"
+    def make_key(prefix: str, *parts: Any) -> str:
+        """Ключ вида ``prefix:part1:part2``; части должны иметь стабильный str()"""
+        return KEY_SEPARATOR.join((prefix, *map(str, parts)))
+
+    async def get(self, cache_key: str) -> tuple[bool, Any]:
+        entry = await self._backend.get(cache_key)
+        if entry is MISSING or entry.error is not None or entry.fresh_until <= time.time():
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        logger.debug(f"Cache hit for {cache_key}")
+        return True, entry.value
+
+    async def get_many(self, cache_keys: list[str]) -> dict[str, Any]:
+        # Промахи, устаревшие и негативные записи не считаются:
+        # вызывающий код дозапрашивает их через cached()
+        now = time.time()
+        found = {
+            key: entry.value
+            for key, entry in (await self._backend.get_many(cache_keys)).items()
+            if entry.error is None and entry.fresh_until > now
+        }
+        self.hits += len(found)
+        return found
+
+    async def set(self, cache_key: str, value: Any, ttl: int = 300, stale_ttl: int = 0, fallback_ttl: int = 0):
+        # Запись живёт дольше окна SWR, если её нужно держать для отдачи при отказе upstream
+        await self._backend.set(cache_key, CachedValue(value, time.time() + ttl), ttl + max(stale_ttl, fallback_ttl))
+        logger.debug(f"Cached result for {cache_key} (TTL: {ttl}s)")
+
+    async def set_error(self, cache_key: str, error: Exception, ttl: int):
+        """Кэширует ошибку; cached() не вызывает его поверх сохранённого значения"""
+        entry = CachedValue(None, time.time() + ttl, (type(error).__name__, str(error)))
+        await self._backend.set(cache_key, entry, ttl)
+        logger.debug(f"Cached {type(error).__name__} for {cache_key} (TTL: {ttl}s)")
+
+    async def delete(self, cache_key: str) -> bool:
+        return await self._backend.delete(cache_key)
+
+    async def cached_keys(self, cache_keys: list[str]) -> list[str]:
+        """Ключи, по которым в кэше есть запись, в том числе устаревшая или ошибка"""
+        return list(await self._backend.get_many(cache_keys))
+
+    def _refresh_in_background(self, cache_key: str, load: Callable[[], Awaitable[Any]]):
+        async def refresh():
+            try:
+                await self._flight.do(cache_key, load)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {cache_key}: {str(e)}")
+
+        task = asyncio.ensure_future(refresh())
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
     
     def cached(
         self, 
         ttl: int = 300, 
-        max_size: int = 1000,
         key_prefix: Optional[str] = None,
-        ignore_self: bool = True  
-    ) -> Callable[[Callable[..., T]], Callable[..., T]]:
+        ignore_self: bool = True,
+        single_flight: bool = False,
+        stale_ttl: int = 0,
+        negative_ttl: int = 0,
+        negative_exceptions: tuple[type[Exception], ...] = (),
+        fallback_exceptions: tuple[type[Exception], ...] = (),
+        fallback_ttl: int = 0
+    ) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+        """Кэширует результат корутины.
+
+        stale_ttl: сколько секунд после истечения ttl отдавать устаревшее значение,
+            обновляя его в фоне.
+        negative_ttl: на сколько секунд кэшировать исключения из negative_exceptions.
+        fallback_exceptions: при этих исключениях отдавать имеющееся в кэше
+            устаревшее значение вместо ошибки; сами они не кэшируются.
+        fallback_ttl: сколько секунд после истечения ttl хранить значение
+            для fallback_exceptions. Вне окна stale_ttl оно отдаётся только
+            при такой ошибке.
+        """
         
-        def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+            if not inspect.iscoroutinefunction(func):
+                raise TypeError(f"cached() supports only coroutine functions, got {func.__qualname__}")
+
+            prefix = key_prefix or f"{func.__module__}.{func.__qualname__}"
+            signature = inspect.signature(func)
+            params = list(signature.parameters)
+            skip = 1 if ignore_self and params and params[0] in ("self", "cls") else 0
+            negative_types = {exc_type.__name__: exc_type for exc_type in negative_exceptions}
+            cache_errors = tuple(negative_exceptions) if negative_ttl > 0 else ()
+            fallback_errors = tuple(fallback_exceptions)
+            keep_ttl = fallback_ttl if fallback_errors else 0
+
+            def make_key(args, kwargs) -> str:
+                if kwargs or len(args) != len(params):
+                    bound = signature.bind(*args, **kwargs)
+                    bound.apply_defaults()
+                    args = tuple(bound.arguments.values())
+                return self.make_key(prefix, *args[skip:])
+
             @wraps(func)
-            def wrapper(*args, **kwargs) -> T:
+            async def wrapper(*args, **kwargs) -> T:
                 if not settings.CACHE_ENABLED:
-                    return func(*args, **kwargs)
-
-                if ignore_self and args and inspect.ismethod(func):
-                    cache_args = args[1:]
-                else:
-                    cache_args = args
-                
-                cache_key = key_prefix or self._generate_key(func, *cache_args, **kwargs)
-
-                if cache_key in self._cache_store:
-                    entry = self._cache_store[cache_key]
-                    if datetime.now() < entry['expires_at']:
+                    return await func(*args, **kwargs)
+
+                cache_key = make_key(args, kwargs)
+
+                entry = await self._backend.get(cache_key)
+                stale = entry.value if entry is not MISSING and entry.error is None else MISSING
+
+                async def load() -> T:
+                    try:
+                        result = await func(*args, **kwargs)
+                    except fallback_errors as e:
+                        if stale is MISSING:
+                            raise
+                        self.fallback_hits += 1
+                        logger.warning(f"Serving stale value for {cache_key}: {str(e)}")
+                        return stale
+                    except cache_errors as e:
+                        # Ошибка не затирает сохранённое значение: оно нужно для
+                        # окна stale_ttl и для отдачи при fallback_exceptions
+                        if stale is MISSING:
+                            await self.set_error(cache_key, e, negative_ttl)
+                        raise
+                    await self.set(cache_key, result, ttl, stale_ttl, keep_ttl)
+                    return result
+
+                now = time.time()
+                if entry is not MISSING:
+                    if entry.error is not None:
+                        error_type = negative_types.get(entry.error[0])
+                        if error_type is not None:
+                            self.negative_hits += 1
+                            logger.debug(f"Negative cache hit for {cache_key}")
+                            raise error_type(entry.error[1])
+                    elif entry.fresh_until > now:
+                        self.hits += 1
                         logger.debug(f"Cache hit for {cache_key}")
-                        return entry['value']
-                    del self._cache_store[cache_key]
-
-                result = func(*args, **kwargs)
-
-                if len(self._cache_store) < max_size:
-                    self._cache_store[cache_key] = {
-                        'value': result,
-                        'expires_at': datetime.now() + timedelta(seconds=ttl)
-                    }
-                    logger.debug(f"Cached result for {cache_key} (TTL: {ttl}s)")
-                
-                return result
-            
+                        return entry.value
+                    elif entry.fresh_until + stale_ttl > now:
+                        self.stale_hits += 1
+                        logger.debug(f"Stale cache hit for {cache_key}, refreshing")
+                        self._refresh_in_background(cache_key, load)
+                        return entry.value
+
+                self.misses += 1
+                if single_flight:
+                    return await self._flight.do(cache_key, load)
+                return await load()
+
+            def make_refresh(join: bool):
+                async def refresh(*args, **kwargs) -> T:
+                    """Загружает значение заново и кладёт в кэш, не читая его.
+
+                    Ошибка не затирает закэшированное значение.
+                    """
+                    cache_key = make_key(args, kwargs)
+
+                    async def load() -> T:
+                        result = await func(*args, **kwargs)
+                        await self.set(cache_key, result, ttl, stale_ttl, keep_ttl)
+                        return result
+
+                    return await self._flight.do(cache_key, load, join=join)
+                return refresh
+
+            wrapper.refresh = make_refresh(join=True)
+            # Данные изменились после начала идущей загрузки: присоединяться к ней нельзя
+            wrapper.reload = make_refresh(join=False)
             return wrapper
         return decorator
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.stale_hits + self.negative_hits
+        return {
+            "backend": settings.CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "negative_hits": self.negative_hits,
+            "fallback_hits": self.fallback_hits,
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+            "upstream_calls": self._flight.calls,
+            "coalesced_calls": self._flight.shared,
+            "refreshing": len(self._refreshes),
+            **self._backend.stats(),
+        }
     
-    def clear_cache(self):
-        self._cache_store.clear()
+    async def clear_cache(self):
+        await self._backend.clear()
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.fallback_hits = 0
+        self._flight.reset_stats()
         logger.info("Cache cleared")
 
-cache_manager = CacheManager()
\ No newline at end of file
+    async def close(self):
+        await self._backend.close()
+
+cache_manager = CacheManager()
+
+class TTLValue:
+    """Одно значение с TTL отдельно от кэша кошельков.
+
+    Не попадает в его статистику и LRU и не сбрасывается clear_cache().
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._value: Any = None
+        self._expires_at = 0.0
+
+    def get(self) -> tuple[bool, Any]:
+        if time.monotonic() < self._expires_at:
+            return True, self._value
+        return False, None
+
+    def set(self, value: Any):
+        self._value = value
+        self._expires_at = time.monotonic() + self.ttl
+
+    def clear(self):
+        self._value = None
+        self._expires_at = 0.0
+
+def _cache_stat(name: str) -> Callable[[], Optional[float]]:
+    return lambda: cache_manager.stats().get(name)
+
+for _name, _kind, _doc in (
+    ("hits", "counter", "Fresh cache hits"),
+    ("misses", "counter", "Cache misses"),
+    ("stale_hits", "counter", "Stale values served while refreshing"),
+    ("negative_hits", "counter", "Cached upstream errors served"),
+    ("fallback_hits", "counter", "Stale values served because the upstream was unavailable"),
+    ("coalesced_calls", "counter", "Loads coalesced by single-flight"),
+    ("evictions", "counter", "LRU evictions from the in-process cache"),
+    ("size", "gauge", "Entries in the in-process cache"),
+):
+    _register = registry.counter_callback if _kind == "counter" else registry.gauge_callback
+    _register(f"cache_{_name}{'_total' if _kind == 'counter' else ''}", _doc, _cache_stat(_name))
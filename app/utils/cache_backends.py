@@ -0,0 +1,343 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Optional
+from app.config import settings
+from app.schemas import AccountResources, WalletInfo
+import logging
+import threading
+import time
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+_EXT_WALLET_INFO = 1
+_EXT_CACHED_VALUE = 2
+_RESOURCE_FIELDS = tuple(AccountResources.model_fields)
+
+class CachedValue:
+    """Значение в кэше: свежее до fresh_until (unix time) или закэшированная ошибка"""
+    __slots__ = ("value", "fresh_until", "error")
+
+    def __init__(self, value: Any, fresh_until: float, error: Optional[tuple[str, str]] = None):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.error = error
+
+class _CacheEntry:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value: Any, expires_at: float):
+        self.value = value
+        self.expires_at = expires_at
+
+class LRUCache:
+    """LRU-хранилище с TTL на запись и амортизированной очисткой просроченных"""
+
+    def __init__(self, max_size: int, sweep_interval: float = 60.0):
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def get(self, key: str, now: Optional[float] = None) -> Any:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry.expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = _CacheEntry(value, now + ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def sweep_expired(self) -> int:
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def _sweep(self, now: float) -> int:
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        self._next_sweep = now + self.sweep_interval
+        if expired:
+            logger.debug(f"Cache sweep removed {len(expired)} expired entries")
+        return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class CacheBackend:
+    """Базовый интерфейс хранилища кэша"""
+
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+class MemoryBackend(CacheBackend):
+    """Кэш в памяти процесса"""
+
+    def __init__(self, max_size: int, sweep_interval: float = 60.0):
+        self.store = LRUCache(max_size=max_size, sweep_interval=sweep_interval)
+
+    async def get(self, key: str) -> Any:
+        return self.store.get(key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        now = time.monotonic()
+        found = {}
+        for key in keys:
+            value = self.store.get(key, now)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.store.set(key, value, ttl)
+
+    async def delete(self, key: str) -> bool:
+        return self.store.delete(key)
+
+    async def clear(self):
+        self.store.clear()
+
+    def stats(self) -> dict:
+        return {
+            "evictions": self.store.evictions,
+            "expirations": self.store.expirations,
+            "size": len(self.store),
+            "max_size": self.store.max_size,
+        }
+
+def _msgpack_default(obj: Any) -> Any:
+    if type(obj) is WalletInfo:
+        resources = obj.resources
+        return msgpack.ExtType(_EXT_WALLET_INFO, msgpack.packb((
+            obj.address, obj.bandwidth, obj.energy, obj.trx_balance,
+            None if resources is None else tuple(getattr(resources, name) for name in _RESOURCE_FIELDS),
+            None if obj.fetched_at is None else obj.fetched_at.timestamp()
+        )))
+    if type(obj) is CachedValue:
+        return msgpack.ExtType(_EXT_CACHED_VALUE, serialize(
+            (obj.value, obj.fresh_until, obj.error)
+        ))
+    raise TypeError(f"Cannot serialize {type(obj).__name__} for cache")
+
+def _msgpack_ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_WALLET_INFO:
+        # Записи без resources и fetched_at остались от предыдущих версий формата
+        address, bandwidth, energy, trx_balance, *rest = msgpack.unpackb(data)
+        resources = rest[0] if rest else None
+        fetched_at = rest[1] if len(rest) > 1 else None
+        return WalletInfo.model_construct(
+            address=address,
+            bandwidth=bandwidth,
+            energy=energy,
+            trx_balance=trx_balance,
+            resources=None if resources is None else AccountResources.model_construct(
+                **dict(zip(_RESOURCE_FIELDS, resources))
+            ),
+            fetched_at=None if fetched_at is None else datetime.fromtimestamp(fetched_at, timezone.utc)
+        )
+    if code == _EXT_CACHED_VALUE:
+        value, fresh_until, error = deserialize(data)
+        return CachedValue(value, fresh_until, tuple(error) if error else None)
+    return msgpack.ExtType(code, data)
+
+def serialize(value: Any) -> bytes:
+    return msgpack.packb(value, default=_msgpack_default)
+
+def deserialize(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_msgpack_ext_hook)
+
+class RedisBackend(CacheBackend):
+    """Общий кэш в Redis; ошибки Redis считаются промахом"""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = "", client=None):
+        if msgpack is None:
+            raise ImportError("Redis cache backend requires the 'msgpack' package")
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.errors = 0
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    def _error(self, operation: str, error: Exception):
+        self.errors += 1
+        logger.warning(f"Redis cache {operation} failed: {str(error)}")
+
+    def _decode(self, data: bytes) -> Any:
+        # Повреждённое или несовместимое значение - такой же промах, как ошибка Redis
+        try:
+            return deserialize(data)
+        except Exception as e:
+            self._error("decode", e)
+            return MISSING
+
+    async def get(self, key: str) -> Any:
+        try:
+            data = await self.client.get(self._key(key))
+        except Exception as e:
+            self._error("get", e)
+            return MISSING
+        return MISSING if data is None else self._decode(data)
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        if not keys:
+            return {}
+        try:
+            values = await self.client.mget([self._key(key) for key in keys])
+        except Exception as e:
+            self._error("mget", e)
+            return {}
+        found = {}
+        for key, data in zip(keys, values):
+            value = MISSING if data is None else self._decode(data)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    async def set(self, key: str, value: Any, ttl: float):
+        try:
+            await self.client.set(self._key(key), serialize(value), px=max(int(ttl * 1000), 1))
+        except Exception as e:
+            self._error("set", e)
+
+    async def delete(self, key: str) -> bool:
+        try:
+            return bool(await self.client.delete(self._key(key)))
+        except Exception as e:
+            self._error("delete", e)
+            return False
+
+    async def clear(self):
+        try:
+            keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}*")]
+            if keys:
+                await self.client.delete(*keys)
+        except Exception as e:
+            self._error("clear", e)
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self) -> dict:
+        return {"redis_errors": self.errors}
+
+class TieredBackend(CacheBackend):
+    """L1 в памяти процесса перед общим L2 (Redis)"""
+
+    def __init__(self, l1: MemoryBackend, l2: CacheBackend, l1_max_ttl: float):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_max_ttl = l1_max_ttl
+        self.l2_hits = 0
+
+    async def get(self, key: str) -> Any:
+        value = await self.l1.get(key)
+        if value is not MISSING:
+            return value
+        value = await self.l2.get(key)
+        if value is not MISSING:
+            self.l2_hits += 1
+            await self.l1.set(key, value, self.l1_max_ttl)
+        return value
+
+    async def get_many(self, keys: list[str]) -> dict[str, Any]:
+        found = await self.l1.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            from_l2 = await self.l2.get_many(missing)
+            self.l2_hits += len(from_l2)
+            for key, value in from_l2.items():
+                await self.l1.set(key, value, self.l1_max_ttl)
+            found.update(from_l2)
+        return found
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.l1.set(key, value, min(ttl, self.l1_max_ttl))
+        await self.l2.set(key, value, ttl)
+
+    async def delete(self, key: str) -> bool:
+        deleted = await self.l1.delete(key)
+        return await self.l2.delete(key) or deleted
+
+    async def clear(self):
+        await self.l1.clear()
+        await self.l2.clear()
+
+    async def close(self):
+        await self.l2.close()
+
+    def stats(self) -> dict:
+        return {**self.l1.stats(), **self.l2.stats(), "l2_hits": self.l2_hits}
+
+def create_backend() -> CacheBackend:
+    memory = MemoryBackend(
+        max_size=settings.CACHE_MAX_SIZE,
+        sweep_interval=settings.CACHE_SWEEP_INTERVAL
+    )
+    if settings.CACHE_BACKEND == "memory":
+        return memory
+
+    redis_backend = RedisBackend(settings.REDIS_URL, prefix=settings.CACHE_REDIS_PREFIX)
+    if settings.CACHE_BACKEND == "redis":
+        return redis_backend
+    if settings.CACHE_BACKEND == "tiered":
+        return TieredBackend(memory, redis_backend, l1_max_ttl=settings.CACHE_L1_MAX_TTL)
+    raise ValueError(f"Unknown cache backend: {settings.CACHE_BACKEND}")
@@ -0,0 +1,206 @@
+import asyncio
+from collections import deque
+import time
+from typing import Optional
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Endpoint:
+    """Full node с EWMA латентности и окном последних замеров для перцентилей"""
+
+    def __init__(self, base_url: str, alpha: float = 0.3, window: int = 100):
+        self.base_url = normalize_base_url(base_url)
+        self.alpha = alpha
+        self.ewma: Optional[float] = None
+        self.samples: deque[float] = deque(maxlen=window)
+        self.in_flight = 0
+        self.down_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def is_healthy(self, now: float) -> bool:
+        return self.down_until <= now
+
+    def score(self) -> float:
+        # Ещё не опрошенный узел пробуем первым; занятый узел дороже пропорционально нагрузке
+        return (self.ewma or 0.0) * (self.in_flight + 1)
+
+    def observe(self, latency: float):
+        self.samples.append(latency)
+        self.ewma = latency if self.ewma is None else self.alpha * latency + (1 - self.alpha) * self.ewma
+
+    def fail(self, cooldown: float):
+        self.failures += 1
+        self.down_until = time.monotonic() + cooldown
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> dict:
+        return {
+            "url": self.base_url,
+            "healthy": self.is_healthy(time.monotonic()),
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+def normalize_base_url(url: str) -> str:
+    return url if url.endswith("/") else url + "/"
+
+class EndpointPool:
+    """Пул full node: выбор самого быстрого здорового узла и задержка hedging.
+
+    Запросы строятся клиентом относительно primary_url (первого узла) и
+    переписываются на выбранный узел. Узел после сетевой ошибки или 5xx
+    выводится из ротации на cooldown.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        alpha: float = 0.3,
+        cooldown: float = 10.0,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_min_samples: int = 5
+    ):
+        if not urls:
+            raise ValueError("Endpoint pool requires at least one endpoint")
+        self.endpoints = [Endpoint(url, alpha=alpha) for url in urls]
+        self.primary_url = self.endpoints[0].base_url
+        self.cooldown = cooldown
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def ranked(self) -> list[Endpoint]:
+        now = time.monotonic()
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.is_healthy(now)]
+        # Если упали все, пробуем тот, что раньше вернётся в ротацию
+        down = sorted(
+            (endpoint for endpoint in self.endpoints if not endpoint.is_healthy(now)),
+            key=lambda endpoint: endpoint.down_until
+        )
+        return sorted(healthy, key=Endpoint.score) + down
+
+    def hedge_delay(self, endpoint: Endpoint) -> Optional[float]:
+        if not self.hedge or len(endpoint.samples) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, endpoint.percentile(self.hedge_percentile))
+
+    def stats(self) -> dict:
+        return {
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+        }
+
+class EndpointPoolTransport(httpx.AsyncBaseTransport):
+    """Отправляет запрос на узел из пула, при ошибке переключается на следующий.
+
+    С hedging, если ответ не пришёл за p95 латентности узла, параллельно
+    отправляется дубль на следующий узел и берётся первый ответ.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, pool: EndpointPool):
+        self._transport = transport
+        self.pool = pool
+
+    def _rewrite(self, request: httpx.Request, endpoint: Endpoint) -> httpx.Request:
+        if endpoint.base_url == self.pool.primary_url:
+            return request
+        url = endpoint.base_url + str(request.url)[len(self.pool.primary_url):]
+        headers = [(name, value) for name, value in request.headers.raw if name.lower() != b"host"]
+        return httpx.Request(
+            request.method, url, headers=headers, content=request.content, extensions=request.extensions
+        )
+
+    async def _send(self, endpoint: Endpoint, request: httpx.Request) -> httpx.Response:
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+        started = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(self._rewrite(request, endpoint))
+        except httpx.TransportError:
+            endpoint.fail(self.pool.cooldown)
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        if response.status_code >= 500:
+            endpoint.fail(self.pool.cooldown)
+        else:
+            endpoint.observe(time.perf_counter() - started)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self.pool
+        if not str(request.url).startswith(pool.primary_url):
+            return await self._transport.handle_async_request(request)
+
+        await request.aread()
+        candidates = pool.ranked()
+        primary = candidates.pop(0)
+        pending = {asyncio.ensure_future(self._send(primary, request))}
+        hedge_delay = pool.hedge_delay(primary)
+        hedge_task = None
+        last_error: Optional[Exception] = None
+        last_response: Optional[httpx.Response] = None
+
+        try:
+            while pending:
+                timeout = hedge_delay if hedge_task is None and candidates else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    pool.hedged += 1
+                    hedge_task = asyncio.ensure_future(self._send(candidates.pop(0), request))
+                    pending.add(hedge_task)
+                    continue
+
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    response = task.result()
+                    if response.status_code < 500:
+                        if task is hedge_task:
+                            pool.hedge_wins += 1
+                        for other in done - {task}:
+                            _close_abandoned_response(other)
+                        if last_response is not None:
+                            await last_response.aclose()
+                        return response
+                    if last_response is not None:
+                        await last_response.aclose()
+                    last_response = response
+
+                if not pending and candidates:
+                    logger.warning(f"Tron endpoint failed, failing over: {last_error or last_response.status_code}")
+                    pending.add(asyncio.ensure_future(self._send(candidates.pop(0), request)))
+        finally:
+            for task in pending:
+                task.cancel()
+                task.add_done_callback(_close_abandoned_response)
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def _close_abandoned_response(task: asyncio.Task):
+    # Проигравший дубль мог успеть получить ответ до отмены: возвращаем соединение в пул
+    if task.cancelled() or task.exception() is not None:
+        return
+    asyncio.ensure_future(task.result().aclose())
@@ -0,0 +1,47 @@
+import csv
+import io
+import json
+from typing import Iterable, Literal, Optional, Sequence
+from app.models import as_utc
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_COLUMNS = ("id", "address", "bandwidth", "energy", "trx_balance", "created_at")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def _created_at(value) -> Optional[str]:
+    return as_utc(value).isoformat() if value is not None else None
+
+def encode_ndjson(rows: Iterable[Sequence]) -> bytes:
+    """Строки (id, address, bandwidth, energy, trx_balance, created_at) в NDJSON без Pydantic"""
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    lines = []
+    for query_id, address, bandwidth, energy, trx_balance, created_at in rows:
+        lines.append(dumps({
+            "id": query_id,
+            "address": address,
+            "bandwidth": bandwidth,
+            "energy": energy,
+            "trx_balance": trx_balance,
+            "created_at": _created_at(created_at),
+        }))
+    lines.append("")
+    return "\n".join(lines).encode("utf-8")
+
+def csv_header() -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_COLUMNS)
+    return buffer.getvalue().encode("utf-8")
+
+def encode_csv(rows: Iterable[Sequence]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(
+        (query_id, address, bandwidth, energy, trx_balance, _created_at(created_at))
+        for query_id, address, bandwidth, energy, trx_balance, created_at in rows
+    )
+    return buffer.getvalue().encode("utf-8")
@@ -1,30 +1,52 @@
+import json
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 import httpx
 from app.config import settings
 
 class LogDispatcher:
+    """Отправка логов во внешние системы через один пул соединений"""
+
+    def __init__(self, client: Optional[httpx.Client] = None):
+        self.client = client or httpx.Client(
+            timeout=settings.LOG_HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2)
+        )
+        self._telegram_last_sent = 0.0
+        self._telegram_recent: Dict[str, float] = {}
+        self.telegram_suppressed = 0
+        self.elastic_failed = 0
+
     @staticmethod
-    def send_to_elasticsearch(log_data: Dict[str, Any]):
-        if not settings.ELASTICSEARCH_URL:
+    def _elastic_doc(log_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "@timestamp": log_data.get("asctime"),
+            "level": log_data.get("levelname"),
+            "message": log_data.get("message"),
+            "service": "tron_api",
+            **log_data.get("extra", {})
+        }
+
+    def send_to_elasticsearch(self, batch: list[Dict[str, Any]]):
+        if not settings.ELASTICSEARCH_URL or not batch:
             return
-            
+
         try:
-            doc = {
-                "@timestamp": log_data.get("asctime"),
-                "level": log_data.get("levelname"),
-                "message": log_data.get("message"),
-                "service": "tron_api",
-                **log_data.get("extra", {})
-            }
-            
-            httpx.post(
-                f"{settings.ELASTICSEARCH_URL}/logs/_doc",
-                json=doc,
-                timeout=2
+            action = json.dumps({"index": {"_index": "logs"}})
+            body = "".join(
+                f"{action}\n{json.dumps(self._elastic_doc(log_data), default=str)}\n"
+                for log_data in batch
+            )
+            response = self.client.post(
+                f"{settings.ELASTICSEARCH_URL}/_bulk",
+                content=body.encode("utf-8"),
+                headers={"Content-Type": "application/x-ndjson"}
             )
+            response.raise_for_status()
         except Exception as e:
-            logging.warning(f"Failed to send log to Elastic: {str(e)}")
+            self.elastic_failed += len(batch)
+            logging.warning(f"Failed to send {len(batch)} logs to Elastic: {str(e)}")
 
     @staticmethod
     def send_to_sentry(log_data: Dict[str, Any]):
@@ -37,20 +59,48 @@ class LogDispatcher:
         except Exception as e:
             logging.warning(f"Failed to send log to Sentry: {str(e)}")
 
-    @staticmethod
-    def send_to_telegram(log_data: Dict[str, Any]):
+    def _telegram_allowed(self, message: str, now: float) -> bool:
+        window = settings.LOG_TELEGRAM_DEDUPE_WINDOW
+        self._telegram_recent = {
+            text: sent_at for text, sent_at in self._telegram_recent.items()
+            if now - sent_at < window
+        }
+        if message in self._telegram_recent:
+            return False
+        return now - self._telegram_last_sent >= settings.LOG_TELEGRAM_MIN_INTERVAL
+
+    def send_to_telegram(self, log_data: Dict[str, Any]):
         if not settings.TELEGRAM_BOT_TOKEN or log_data.get("levelname") != "CRITICAL":
             return
+
+        now = time.monotonic()
+        text = log_data.get("message") or ""
+        if not self._telegram_allowed(text, now):
+            self.telegram_suppressed += 1
+            return
             
         try:
-            message = f"🚨 CRITICAL ERROR\n{log_data.get('message')}"
-            httpx.post(
+            message = f"🚨 CRITICAL ERROR\n{text}"
+            if self.telegram_suppressed:
+                message += f"\n(+{self.telegram_suppressed} suppressed alerts)"
+            self.client.post(
                 f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage",
                 json={
                     "chat_id": settings.TELEGRAM_CHAT_ID,
                     "text": message
-                },
-                timeout=5
+                }
             )
+            self.telegram_suppressed = 0
+            self._telegram_last_sent = now
+            self._telegram_recent[text] = now
         except Exception as e:
-            logging.warning(f"Failed to send log to Telegram: {str(e)}")
\ No newline at end of file
+            logging.warning(f"Failed to send log to Telegram: {str(e)}")
+
+    def dispatch(self, batch: list[Dict[str, Any]]):
+        self.send_to_elasticsearch(batch)
+        for log_data in batch:
+            self.send_to_sentry(log_data)
+            self.send_to_telegram(log_data)
+
+    def close(self):
+        self.client.close()
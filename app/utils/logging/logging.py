@@ -1,24 +1,122 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import queue
+import threading
+import time
+from typing import Optional
 from app.config import settings
 from app.utils.logging.log_handlers import LogDispatcher
 
-class ExternalLogHandler(logging.Handler):
-    def __init__(self):
-        super().__init__()
+_STOP = object()
+
+class LogShipper:
+    """Фоновый поток: забирает логи из очереди и отправляет их пачками"""
+
+    def __init__(self, dispatcher: Optional[LogDispatcher] = None):
+        self.queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.dispatcher = dispatcher or LogDispatcher()
+        self.batch_size = settings.LOG_BATCH_SIZE
+        self.flush_interval = settings.LOG_FLUSH_INTERVAL
+        self.dropped = 0
+        self.shipped = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # Срок считается от первой записи пачки, а не от последней:
+            # иначе ровный поток реже flush_interval не отправлялся бы вовсе
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self.dispatcher.dispatch(batch)
+            self.shipped += len(batch)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Досылает накопленные логи и останавливает поток"""
+        if self._thread is None:
+            return
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # Поток ещё отправляет пачку: клиент под ним не закрываем,
+            # daemon-поток завершится вместе с процессом
+            return
+        self._thread = None
+        self.dispatcher.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "shipped": self.shipped,
+            "dropped": self.dropped,
+            "elastic_failed": self.dispatcher.elastic_failed,
+            "telegram_suppressed": self.dispatcher.telegram_suppressed,
+        }
+
+_shipper: Optional[LogShipper] = None
+
+def get_log_shipper() -> LogShipper:
+    global _shipper
+    if _shipper is None:
+        _shipper = LogShipper()
+        _shipper.start()
+    return _shipper
+
+class ExternalLogHandler(logging.handlers.QueueHandler):
+    """Ставит лог в очередь фоновой отправки, не блокируя вызывающий код"""
+
+    def __init__(self, shipper: Optional[LogShipper] = None):
+        self.shipper = shipper or get_log_shipper()
+        super().__init__(self.shipper.queue)
         self.formatter = logging.Formatter(fmt="%(asctime)s", datefmt="%Y-%m-%d %H:%M:%S")
 
-    def emit(self, record):
-        log_data = {
+    def prepare(self, record):
+        return {
             "asctime": self.format(record).strip(),
             "levelname": record.levelname,
             "message": record.getMessage(),
             "extra": getattr(record, "extra", {})
         }
 
-        LogDispatcher.send_to_elasticsearch(log_data)
-        LogDispatcher.send_to_sentry(log_data)
-        LogDispatcher.send_to_telegram(log_data)
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.shipper.dropped += 1
+
+def shutdown_logging(timeout: float = 5.0):
+    global _shipper
+    if _shipper is None:
+        return
+    # Сначала отцепляем обработчики, чтобы новые записи не копились в очереди остановленного потока
+    for logger in (logging.getLogger(), *logging.Logger.manager.loggerDict.values()):
+        for handler in list(getattr(logger, "handlers", ())):
+            if isinstance(handler, ExternalLogHandler) and handler.shipper is _shipper:
+                logger.removeHandler(handler)
+    _shipper.stop(timeout)
+    _shipper = None
 
 def setup_logging():
     
@@ -36,6 +134,7 @@ def setup_logging():
             "()": ExternalLogHandler,
             "level": "ERROR" 
         }
+        atexit.register(shutdown_logging)
     
     log_config = {
         "version": 1,
@@ -59,4 +158,4 @@ def setup_logging():
     }
     
     logging.config.dictConfig(log_config)
-    logging.info("Logging setup complete", extra={"service": "logging"})
\ No newline at end of file
+    logging.info("Logging setup complete", extra={"service": "logging"})
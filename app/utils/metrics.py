@@ -0,0 +1,249 @@
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+import re
+import time
+
+# Запись метрик идёт из event loop без блокировок: инкремент int/float под GIL
+# дешевле lock и достаточен для счётчиков мониторинга.
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: _HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip((*self.bounds, float("inf")), child.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class CallbackMetric:
+    """Значение считывается при сборе метрик, без затрат на горячем пути"""
+
+    def __init__(self, name: str, documentation: str, kind: str, fn: Callable[[], Optional[float]]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> list[str]:
+        value = self.fn()
+        if value is None:
+            return []
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            f"{self.name} {_format_value(value)}",
+        ]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: tuple = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str, fn: Callable[[], Optional[float]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, "gauge", fn))
+
+    def counter_callback(self, name: str, documentation: str, fn: Callable[[], Optional[float]]) -> CallbackMetric:
+        return self._register(CallbackMetric(name, documentation, "counter", fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status")
+)
+HTTP_REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("route", "method")
+)
+TRON_REQUEST_LATENCY = registry.histogram(
+    "tron_request_duration_seconds", "Latency of a single TronGrid call attempt", ("method",)
+)
+TRON_REQUEST_ERRORS = registry.counter(
+    "tron_request_errors_total", "Failed TronGrid call attempts", ("method",)
+)
+TRON_RETRIES = registry.counter(
+    "tron_retries_total", "TronGrid call retries", ("method",)
+)
+TRON_THROTTLED = registry.counter(
+    "tron_throttled_total", "TronGrid responses with status 429"
+)
+DB_OPERATION_LATENCY = registry.histogram(
+    "db_operation_duration_seconds", "Database query and commit latency", ("operation",)
+)
+
+class MetricsMiddleware:
+    """ASGI middleware: число и латентность запросов по шаблону маршрута"""
+
+    def __init__(self, app):
+        self.app = app
+        self._templates: dict[int, str] = {}
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is None:
+            return "unmatched"
+        template = self._templates.get(id(route))
+        if template is None:
+            template = route.path
+            # Новые версии FastAPI кладут в scope маршрут без префикса
+            # include_router: восстанавливаем его по фактическому пути
+            regex = getattr(route, "path_regex", None)
+            if regex is not None and not regex.match(scope["path"]):
+                match = re.search(regex.pattern.lstrip("^"), scope["path"])
+                if match is not None:
+                    template = scope["path"][:match.start()] + template
+            self._templates[id(route)] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            path = self._route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.labels(path, method, str(status)).inc()
+            HTTP_REQUEST_LATENCY.labels(path, method).observe(time.perf_counter() - started)
@@ -0,0 +1,15 @@
+import base64
+from datetime import datetime
+from app.api.errors import InvalidRequestError
+
+def encode_cursor(created_at: datetime, query_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{query_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, query_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(query_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidRequestError("Invalid pagination cursor") from e
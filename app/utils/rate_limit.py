@@ -0,0 +1,108 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+import time
+from typing import Optional
+from app.api.errors import UpstreamUnavailableError
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def time_to_token(self, tokens: float = 1.0) -> float:
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+class ApiKeyState:
+    __slots__ = ("api_key", "bucket", "blocked_until", "requests", "throttled")
+
+    def __init__(self, api_key: Optional[str], rate: float, burst: float):
+        self.api_key = api_key
+        self.bucket = TokenBucket(rate, burst)
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+
+class KeyPoolRateLimiter:
+    """Общий для процесса лимит исходящих запросов по пулу API-ключей.
+
+    У каждого ключа своя корзина токенов. Запрос получает ключ с наибольшим
+    остатком токенов, так что нагрузка распределяется пропорционально
+    оставшейся квоте. Ключ, получивший 429, не используется до Retry-After.
+    Без ключей работает одна корзина для анонимных запросов.
+    """
+
+    def __init__(self, api_keys: list[str], rate: float, burst: float, max_wait: float = 5.0):
+        self.keys = [ApiKeyState(key, rate, burst) for key in api_keys] or [ApiKeyState(None, rate, burst)]
+        self.max_wait = max_wait
+        self.waited = 0.0
+        self.rejected = 0
+
+    def _pick(self, now: float) -> tuple[Optional[ApiKeyState], float]:
+        best, best_tokens, wait = None, -1.0, float("inf")
+        for state in self.keys:
+            if state.blocked_until > now:
+                wait = min(wait, state.blocked_until - now)
+                continue
+            tokens = state.bucket.refill(now)
+            if tokens >= 1:
+                if tokens > best_tokens:
+                    best, best_tokens = state, tokens
+            else:
+                wait = min(wait, state.bucket.time_to_token())
+        return best, wait
+
+    async def acquire(self) -> ApiKeyState:
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            now = time.monotonic()
+            state, wait = self._pick(now)
+            if state is not None:
+                state.bucket.tokens -= 1
+                state.requests += 1
+                return state
+            if now + wait > deadline:
+                self.rejected += 1
+                raise UpstreamUnavailableError("TronGrid rate limit budget exhausted")
+            self.waited += wait
+            await asyncio.sleep(wait)
+
+    def throttle(self, state: ApiKeyState, retry_after: float):
+        state.throttled += 1
+        state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+        # Квота у ключа, скорее всего, исчерпана: не даём накопленным токенам уйти залпом
+        state.bucket.tokens = 0
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "keys": len(self.keys),
+            "available_keys": sum(1 for state in self.keys if state.blocked_until <= now),
+            "requests": sum(state.requests for state in self.keys),
+            "throttled": sum(state.throttled for state in self.keys),
+            "rejected": self.rejected,
+            "waited_seconds": round(self.waited, 3),
+        }
+
+def parse_retry_after(value: Optional[str], default: float) -> float:
+    """Retry-After в секундах или HTTP-дате"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,150 @@
+import asyncio
+from collections import deque
+import time
+from typing import Optional
+from app.api.errors import UpstreamUnavailableError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+class CircuitBreaker:
+    """Размыкается после fail_max ошибок подряд и отклоняет вызовы до reset_timeout.
+
+    После таймаута пропускает один пробный вызов: успех замыкает цепь,
+    ошибка снова размыкает её на reset_timeout.
+    """
+
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 30.0, name: str = "breaker"):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def before_call(self):
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and not self._probing:
+            self._state = HALF_OPEN
+            self._probing = True
+            return
+        self.rejected += 1
+        raise UpstreamUnavailableError(f"Circuit {self.name} is open")
+
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        self._state = CLOSED
+
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self._state == HALF_OPEN or self._failures >= self.fail_max:
+            if self._state != OPEN:
+                self.opened += 1
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Вызов завершился без вердикта (например, отменён)"""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD-лимит одновременных исходящих вызовов.
+
+    Успешный вызов быстрее latency_target увеличивает лимит на 1/limit
+    (примерно +1 за "окно" запросов), ошибка или медленный ответ умножает
+    его на backoff. Сверх лимита вызовы ждут не дольше queue_timeout,
+    чтобы очередь не росла во время деградации upstream.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        latency_target: float = 1.0,
+        backoff: float = 0.7,
+        queue_timeout: float = 1.0
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self):
+        if self._has_capacity() and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return
+            self.rejected += 1
+            raise UpstreamUnavailableError(
+                f"Outbound concurrency limit {int(self.limit)} reached"
+            ) from None
+        except asyncio.CancelledError:
+            # Слот мог быть передан уже после отмены: возвращаем его
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake_waiters()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, latency: Optional[float] = None, failed: bool = False):
+        self.in_flight -= 1
+        if failed or (latency is not None and latency > self.latency_target):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif latency is not None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,55 @@
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar('T')
+
+class SingleFlight:
+    """Объединяет конкурентные вызовы с одинаковым ключом в один вызов"""
+
+    def __init__(self):
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]], join: bool = True) -> T:
+        """join=False: не присоединяться к уже идущему вызову, а начать новый.
+
+        Новый вызов стартует после завершения предыдущего (его результат не
+        перезапишет более свежий), а следующие вызовы присоединяются к нему.
+        """
+        task = self._in_flight.get(key)
+        if task is None or not join:
+            self.calls += 1
+            task = asyncio.ensure_future(fn() if task is None else self._after(task, fn))
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._done, key))
+        else:
+            self.shared += 1
+        # shield: отмена одного ожидающего не отменяет общий вызов
+        return await asyncio.shield(task)
+
+    @staticmethod
+    async def _after(previous: asyncio.Task, fn: Callable[[], Awaitable[T]]) -> T:
+        await asyncio.wait([previous])
+        return await fn()
+
+    def _done(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._in_flight),
+        }
+
+    def reset_stats(self):
+        self.calls = 0
+        self.shared = 0
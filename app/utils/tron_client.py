@@ -1,22 +1,281 @@
-from tronpy import Tron
-from tronpy.providers import HTTPProvider
+from typing import Optional
+import httpx
+import httpcore
+from tronpy import AsyncTron
+from tronpy.providers.async_http import AsyncHTTPProvider
 from app.config import settings
+from app.utils.metrics import TRON_THROTTLED, registry
+from app.utils.endpoint_pool import EndpointPool, EndpointPoolTransport, normalize_base_url
+from app.utils.rate_limit import KeyPoolRateLimiter, parse_retry_after
+from app.utils.resilience import OPEN, AdaptiveConcurrencyLimiter, CircuitBreaker
 import logging
 
 logger = logging.getLogger(__name__)
 
-def initialize_tron_client(network: str = None) -> Tron:
+_DEFAULT_PORTS = {b"http": 80, b"https": 443}
+
+_tron_client: Optional[AsyncTron] = None
+_transport: Optional["PoolStatsTransport"] = None
+_rate_limiter: Optional[KeyPoolRateLimiter] = None
+_endpoint_pool: Optional[EndpointPool] = None
+
+API_KEY_HEADER = "TRON-PRO-API-KEY"
+
+# Общие для всех TronService: состояние upstream не зависит от запроса
+tron_breaker: Optional[CircuitBreaker] = CircuitBreaker(
+    fail_max=settings.TRON_BREAKER_FAIL_MAX,
+    reset_timeout=settings.TRON_BREAKER_RESET_TIMEOUT,
+    name="trongrid"
+) if settings.TRON_BREAKER_ENABLED else None
+tron_limiter = AdaptiveConcurrencyLimiter(
+    initial_limit=settings.TRON_LIMIT_INITIAL,
+    min_limit=settings.TRON_LIMIT_MIN,
+    max_limit=settings.TRON_LIMIT_MAX,
+    latency_target=settings.TRON_LIMIT_LATENCY_TARGET,
+    backoff=settings.TRON_LIMIT_BACKOFF,
+    queue_timeout=settings.TRON_LIMIT_QUEUE_TIMEOUT
+)
+
+class PoolStatsTransport(httpx.AsyncHTTPTransport):
+    """Транспорт, считающий переиспользование соединений из пула"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+
+    def _has_reusable_connection(self, request: httpx.Request) -> bool:
+        url = request.url
+        origin = httpcore.Origin(
+            url.raw_scheme,
+            url.raw_host,
+            url.port or _DEFAULT_PORTS.get(url.raw_scheme, 443)
+        )
+        return any(
+            conn.can_handle_request(origin) and conn.is_available()
+            for conn in self._pool.connections
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._has_reusable_connection(request):
+            self.hits += 1
+        else:
+            self.misses += 1
+        return await super().handle_async_request(request)
+
+    def stats(self) -> dict:
+        connections = self._pool.connections
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "connections": len(connections),
+            "idle_connections": sum(1 for conn in connections if conn.is_idle()),
+        }
+
+def host_in_domains(host: str, domains: list[str]) -> bool:
+    host = host.lower()
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Выдаёт запросам токены и API-ключи из пула, повторяет 429 другим ключом.
+
+    Ключи и квота относятся к TronGrid: запросы к другим узлам пула (domains
+    не совпали) уходят без ключа и мимо лимитера.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiter: KeyPoolRateLimiter,
+        max_retries: int = 2,
+        domains: Optional[list[str]] = None
+    ):
+        self._transport = transport
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.domains = domains
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.domains is not None and not host_in_domains(request.url.host, self.domains):
+            # Заголовок мог остаться от попытки к основному узлу, с которой скопирован запрос
+            request.headers.pop(API_KEY_HEADER, None)
+            return await self._transport.handle_async_request(request)
+
+        attempt = 0
+        while True:
+            key = await self.limiter.acquire()
+            if key.api_key is not None:
+                request.headers[API_KEY_HEADER] = key.api_key
+            response = await self._transport.handle_async_request(request)
+            if response.status_code != 429:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"), default=1.0)
+            self.limiter.throttle(key, retry_after)
+            TRON_THROTTLED.inc()
+            if attempt >= self.max_retries:
+                return response
+            attempt += 1
+            await response.aclose()
+            logger.warning(f"TronGrid returned 429, retrying in up to {retry_after:.1f}s")
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+def _http2_available() -> bool:
     try:
-        network = network or settings.tron_network
-        provider_url = (
-            "https://api.trongrid.io" 
-            if network == "mainnet" 
-            else "https://api.shasta.trongrid.io"
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("HTTP/2 requested but 'h2' package is not installed, falling back to HTTP/1.1")
+        return False
+
+def create_rate_limiter() -> Optional[KeyPoolRateLimiter]:
+    enabled = settings.TRON_RATE_LIMIT_ENABLED
+    if enabled is None:
+        enabled = bool(settings.tron_api_keys)
+    if not enabled:
+        return None
+    return KeyPoolRateLimiter(
+        settings.tron_api_keys,
+        rate=settings.TRON_RATE_LIMIT_QPS,
+        burst=settings.TRON_RATE_LIMIT_BURST,
+        max_wait=settings.TRON_RATE_LIMIT_MAX_WAIT
+    )
+
+def create_endpoint_pool(network: str = None) -> Optional[EndpointPool]:
+    endpoints = settings.tron_endpoints(network)
+    if len(endpoints) < 2:
+        return None
+    return EndpointPool(
+        endpoints,
+        alpha=settings.TRON_ENDPOINT_EWMA_ALPHA,
+        cooldown=settings.TRON_ENDPOINT_COOLDOWN,
+        hedge=settings.TRON_HEDGE_ENABLED,
+        hedge_percentile=settings.TRON_HEDGE_PERCENTILE,
+        hedge_min_delay=settings.TRON_HEDGE_MIN_DELAY
+    )
+
+def create_http_client(
+    rate_limiter: Optional[KeyPoolRateLimiter] = None,
+    endpoint_pool: Optional[EndpointPool] = None
+) -> tuple[httpx.AsyncClient, PoolStatsTransport]:
+    limits = httpx.Limits(
+        max_connections=settings.TRON_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.TRON_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.TRON_HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(
+        settings.TRON_HTTP_TIMEOUT,
+        connect=settings.TRON_HTTP_CONNECT_TIMEOUT
+    )
+    transport = PoolStatsTransport(
+        http2=settings.TRON_HTTP2_ENABLED and _http2_available(),
+        limits=limits
+    )
+    outer = transport
+    if rate_limiter is not None:
+        outer = RateLimitedTransport(
+            transport, rate_limiter,
+            max_retries=settings.TRON_RATE_LIMIT_MAX_RETRIES,
+            domains=settings.tron_api_key_domains
         )
+    if endpoint_pool is not None:
+        outer = EndpointPoolTransport(outer, endpoint_pool)
+    return httpx.AsyncClient(transport=outer, timeout=timeout), transport
+
+def initialize_tron_client(
+    network: str = None,
+    http_client: Optional[httpx.AsyncClient] = None
+) -> AsyncTron:
+    try:
+        network = network or settings.tron_network
+        # Остальные узлы сети подключает EndpointPoolTransport
+        provider_url = normalize_base_url(settings.tron_endpoints(network)[0])
         
         logger.debug(f"Initializing Tron client for {network} network")
-        return Tron(HTTPProvider(provider_url))
+        return AsyncTron(AsyncHTTPProvider(
+            provider_url,
+            timeout=settings.TRON_HTTP_TIMEOUT,
+            client=http_client
+        ))
         
     except Exception as e:
         logger.error(f"Failed to initialize Tron client: {str(e)}")
-        raise ValueError(f"Tron client initialization failed: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Tron client initialization failed: {str(e)}")
+
+def get_tron_client() -> AsyncTron:
+    global _tron_client, _transport, _rate_limiter, _endpoint_pool
+    if _tron_client is None:
+        _rate_limiter = create_rate_limiter()
+        _endpoint_pool = create_endpoint_pool()
+        http_client, _transport = create_http_client(_rate_limiter, _endpoint_pool)
+        _tron_client = initialize_tron_client(http_client=http_client)
+    return _tron_client
+
+async def close_tron_client():
+    global _tron_client, _transport
+    if _tron_client is not None:
+        stats = get_pool_stats()
+        await _tron_client.close()
+        logger.info(f"Tron client closed, pool stats: {stats}")
+        _tron_client = None
+        _transport = None
+
+def get_pool_stats() -> dict:
+    if _transport is None:
+        return {"hits": 0, "misses": 0, "connections": 0, "idle_connections": 0}
+    return _transport.stats()
+
+def get_resilience_stats() -> dict:
+    return {
+        "breaker": tron_breaker.stats() if tron_breaker is not None else None,
+        "limiter": tron_limiter.stats(),
+        "rate_limit": _rate_limiter.stats() if _rate_limiter is not None else None,
+        "endpoints": _endpoint_pool.stats() if _endpoint_pool is not None else None,
+    }
+
+registry.counter_callback(
+    "tron_http_pool_hits_total", "TronGrid requests served by a reused connection",
+    lambda: get_pool_stats()["hits"]
+)
+registry.counter_callback(
+    "tron_http_pool_misses_total", "TronGrid requests that opened a new connection",
+    lambda: get_pool_stats()["misses"]
+)
+registry.gauge_callback(
+    "tron_http_pool_connections", "Open TronGrid connections",
+    lambda: get_pool_stats()["connections"]
+)
+registry.gauge_callback(
+    "tron_breaker_open", "1 while the TronGrid circuit breaker rejects calls",
+    lambda: None if tron_breaker is None else int(tron_breaker.state == OPEN)
+)
+registry.counter_callback(
+    "tron_breaker_rejected_total", "TronGrid calls rejected by the open circuit",
+    lambda: None if tron_breaker is None else tron_breaker.rejected
+)
+registry.gauge_callback(
+    "tron_concurrency_limit", "Current adaptive limit of concurrent TronGrid calls",
+    lambda: int(tron_limiter.limit)
+)
+registry.gauge_callback(
+    "tron_concurrency_in_flight", "TronGrid calls in flight",
+    lambda: tron_limiter.in_flight
+)
+registry.counter_callback(
+    "tron_concurrency_rejected_total", "TronGrid calls rejected after waiting for a slot",
+    lambda: tron_limiter.rejected
+)
+registry.gauge_callback(
+    "tron_api_keys_available", "API keys not cooling down after a 429",
+    lambda: None if _rate_limiter is None else _rate_limiter.stats()["available_keys"]
+)
+registry.counter_callback(
+    "tron_hedged_requests_total", "Duplicate requests sent to a second endpoint",
+    lambda: None if _endpoint_pool is None else _endpoint_pool.hedged
+)
+registry.counter_callback(
+    "tron_hedge_wins_total", "Hedged requests answered first by the duplicate",
+    lambda: None if _endpoint_pool is None else _endpoint_pool.hedge_wins
+)
@@ -0,0 +1,52 @@
+"""Бенчмарк доли попаданий в кэш для повторных запросов кошельков.
+
+Запуск: python -m benchmarks.cache_hit_ratio --requests 10000 --addresses 100
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import AsyncMock, Mock
+from app.services.tron import TronService
+from app.utils.cache import cache_manager
+
+def make_stub_client(latency: float) -> Mock:
+    async def get_account(address):
+        await asyncio.sleep(latency)
+        return {"balance": 0}
+
+    client = Mock()
+    client.get_account = AsyncMock(side_effect=get_account)
+    client.get_account_resource = AsyncMock(return_value={})
+    return client
+
+async def run(requests: int, addresses: int, latency: float) -> dict:
+    await cache_manager.clear_cache()
+    client = make_stub_client(latency)
+    started = time.perf_counter()
+    for i in range(requests):
+        # Как в эндпоинте: новый TronService на каждый запрос
+        await TronService(client=client).get_wallet_info(f"T{i % addresses:033d}")
+    elapsed = time.perf_counter() - started
+
+    stats = cache_manager.stats()
+    stats.update(
+        requests=requests,
+        upstream_calls=client.get_account.await_count,
+        elapsed_s=round(elapsed, 4),
+        per_request_us=round(elapsed / requests * 1e6, 2),
+    )
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--addresses", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.001)
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args.requests, args.addresses, args.latency))
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Нагрузочный тест HTTP API против локальной заглушки TronGrid.
+
+Поднимает StubTronGrid, запускает приложение через uvicorn на временной
+SQLite и с фиксированной конкурентностью гоняет POST /api/wallet-info/,
+GET /api/wallet-info/{address} и GET /api/query-history/. Для каждого
+сценария считаются RPS и p50/p95/p99, результат сохраняется в JSON
+(см. benchmarks.report).
+Сеть не нужна.
+Запуск: python -m benchmarks.load_test --concurrency 32 --requests 2000 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+import httpx
+from sqlalchemy import create_engine, insert
+from tronpy import keys
+from app.models import Base, WalletQuery, utcnow
+from benchmarks.report import save_results, summarize
+from benchmarks.stub_trongrid import StubTronGrid
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+def make_addresses(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [keys.to_base58check_address(b"\x41" + rng.randbytes(20)) for _ in range(count)]
+
+def seed_history(path: Path, rows: int, addresses: list[str]):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    started = utcnow() - timedelta(seconds=rows)
+    with engine.begin() as conn:
+        for offset in range(0, rows, 10000):
+            conn.execute(insert(WalletQuery.__table__), [
+                {
+                    "address": addresses[i % len(addresses)],
+                    "bandwidth": i % 1500,
+                    "energy": i % 50000,
+                    "trx_balance": i,
+                    "created_at": started + timedelta(seconds=i),
+                }
+                for i in range(offset, min(rows, offset + 10000))
+            ])
+    engine.dispose()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(port: int, db_path: Path, stub_url: str, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        TRON_NETWORK="shasta",
+        TRON_SHASTA_ENDPOINTS=stub_url,
+        # Лимит TronGrid к заглушке не относится и исказил бы замер
+        TRON_RATE_LIMIT_ENABLED="false",
+        CACHE_ENABLED=str(not args.no_cache).lower(),
+        WRITE_BEHIND_ENABLED=str(args.write_behind).lower(),
+        EXTERNAL_LOGGING_ENABLED="false",
+        LOG_LEVEL="CRITICAL",
+    )
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=PROJECT_ROOT,
+        env=env,
+    )
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode}")
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time")
+
+async def drive(client: httpx.AsyncClient, make_request, requests: int, concurrency: int) -> dict:
+    """requests запросов, не больше concurrency одновременно"""
+    latencies: list[float] = []
+    errors = 0
+    issued = 0
+
+    async def worker():
+        nonlocal errors, issued
+        while issued < requests:
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await make_request(client)
+                failed = response.status_code != 200
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+async def run_scenarios(base_url: str, addresses: list[str], args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    rng = random.Random(1)
+
+    def wallet_info(client: httpx.AsyncClient):
+        return client.post("/api/wallet-info/", json={"wallet_address": rng.choice(addresses)})
+
+    def wallet_snapshot(client: httpx.AsyncClient):
+        return client.get(f"/api/wallet-info/{rng.choice(addresses)}", params={"max_age": args.max_age})
+
+    def query_history(client: httpx.AsyncClient):
+        return client.get("/api/query-history/", params={
+            "page": rng.randint(1, args.max_page),
+            "per_page": args.per_page,
+            "total_mode": args.total_mode,
+        })
+
+    scenarios = {"wallet_info": wallet_info, "wallet_snapshot": wallet_snapshot, "query_history": query_history}
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        for name in args.scenarios:
+            if args.warmup:
+                await drive(client, scenarios[name], args.warmup, args.concurrency)
+            results[name] = await drive(client, scenarios[name], args.requests, args.concurrency)
+            print(name, results[name])
+        results["server"] = (await client.get("/")).json()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="запросов на сценарий")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--scenarios", nargs="+", default=["wallet_info", "wallet_snapshot", "query_history"],
+                        choices=["wallet_info", "wallet_snapshot", "query_history"])
+    parser.add_argument("--addresses", type=int, default=500, help="число разных адресов (управляет долей попаданий в кэш)")
+    parser.add_argument("--history-rows", type=int, default=100000)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--max-page", type=int, default=100)
+    parser.add_argument("--max-age", type=int, default=60, help="max_age для GET /api/wallet-info/{address}")
+    parser.add_argument("--total-mode", default="cached", choices=["exact", "estimated", "cached", "none"])
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка заглушки TronGrid, с")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов заглушки с ошибкой")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--output", help="путь к JSON; по умолчанию benchmarks/results/")
+    args = parser.parse_args()
+
+    addresses = make_addresses(args.addresses)
+    stub = StubTronGrid(args.latency, args.jitter, args.error_rate, args.error_status).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        seed_history(db_path, args.history_rows, addresses)
+        port = free_port()
+        server = start_server(port, db_path, stub.url, args)
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            asyncio.run(wait_ready(base_url, server))
+            results = asyncio.run(run_scenarios(base_url, addresses, args))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            stub.stop()
+    results["stub_trongrid"] = stub.stats()
+
+    path = save_results("load_test", vars(args), results, args.output)
+    print(f"Results saved to {path}")
+
+if __name__ == "__main__":
+    main()
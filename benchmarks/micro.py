@@ -0,0 +1,224 @@
+"""Микробенчмарки горячих путей без HTTP-слоя.
+
+- cache: CacheManager.cached на попадании и на промахе;
+- insert: WalletRepository.create_wallet_query на файловой SQLite;
+- pagination: OFFSET против курсора и точный/оценочный count на
+  таблице из --rows строк (по умолчанию 10^6);
+- address: проверка и нормализация адреса (base58, hex, ошибка, кэш);
+- export: потоковая выгрузка --rows строк в NDJSON/CSV, строк в секунду
+  и пик памяти.
+Результат сохраняется в JSON (см. benchmarks.report).
+Запуск: python -m benchmarks.micro --rows 1000000
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from tronpy import keys
+from app.database import create_async_db_engine
+from app.models import Base, WalletQuery, utcnow
+from app.repositories.wallet import WalletRepository
+from app.schemas import WalletInfo
+from app.utils.address import normalize_address
+from app.utils.cache import cache_manager
+from app.utils.export import encode_csv, encode_ndjson
+from benchmarks.load_test import make_addresses
+from benchmarks.report import save_results, summarize
+
+async def timed(call, iterations: int) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        await call(i)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+def bench_address(iterations: int) -> dict:
+    addresses = make_addresses(iterations)
+    hex_addresses = [keys.to_hex_address(address) for address in addresses]
+    invalid = [address[:-1] + ("M" if address[-1] != "M" else "N") for address in addresses]
+    decode = normalize_address.__wrapped__
+
+    def measure(call, values: list[str]) -> dict:
+        latencies = []
+        rejected = 0
+        started = time.perf_counter()
+        for value in values:
+            call_started = time.perf_counter()
+            try:
+                call(value)
+            except ValueError:
+                rejected += 1
+            latencies.append(time.perf_counter() - call_started)
+        return summarize(latencies, time.perf_counter() - started, rejected)
+
+    normalize_address.cache_clear()
+    results = {
+        "base58": measure(decode, addresses),
+        "hex": measure(decode, hex_addresses),
+        "invalid_checksum": measure(decode, invalid),
+    }
+    for address in addresses:
+        normalize_address(address)
+    results["cached"] = measure(normalize_address, addresses)
+    normalize_address.cache_clear()
+    return results
+
+async def bench_cache(iterations: int) -> dict:
+    await cache_manager.clear_cache()
+
+    @cache_manager.cached(ttl=300, key_prefix="bench", single_flight=True, stale_ttl=60)
+    async def load(key: int) -> dict:
+        return {"key": key}
+
+    await load(0)
+    hit = await timed(lambda i: load(0), iterations)
+    # Уникальные ключи: каждый вызов - промах, запись и со временем вытеснение
+    miss = await timed(lambda i: load(i + 1), iterations)
+    stats = cache_manager.stats()
+    await cache_manager.clear_cache()
+    return {"hit": hit, "miss": miss, "cache": stats}
+
+async def bench_insert(db_path: Path, iterations: int) -> dict:
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{db_path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    info = WalletInfo(address="TBenchmark", bandwidth=1, energy=1, trx_balance=1)
+    try:
+        async with session_factory() as session:
+            repo = WalletRepository(session)
+            return await timed(lambda i: repo.create_wallet_query(info), iterations)
+    finally:
+        await engine.dispose()
+
+def seed_rows(db_path: Path, rows: int, chunk: int = 50000):
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    started = utcnow() - timedelta(seconds=rows)
+    with engine.begin() as conn:
+        for offset in range(0, rows, chunk):
+            conn.execute(insert(WalletQuery.__table__), [
+                {
+                    "address": f"T{i % 10000:033d}",
+                    "bandwidth": i % 1500,
+                    "energy": i % 50000,
+                    "trx_balance": i,
+                    "created_at": started + timedelta(seconds=i),
+                }
+                for i in range(offset, min(rows, offset + chunk))
+            ])
+    engine.dispose()
+
+async def bench_pagination(db_path: Path, rows: int, per_page: int, repeats: int) -> dict:
+    seed_started = time.perf_counter()
+    seed_rows(db_path, rows)
+    seed_elapsed = time.perf_counter() - seed_started
+
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    results = {"rows": rows, "seed_s": round(seed_elapsed, 2), "depths": {}}
+    try:
+        async with session_factory() as session:
+            repo = WalletRepository(session)
+            for depth in sorted({0, 100, rows // 100, rows // 10, rows // 2, rows - per_page}):
+                if depth < 0 or depth >= rows:
+                    continue
+                # Курсор строки, после которой начинается страница на этой глубине
+                anchor = None
+                if depth:
+                    anchor = (await session.execute(
+                        select(WalletQuery.created_at, WalletQuery.id)
+                            .order_by(WalletQuery.created_at.desc(), WalletQuery.id.desc())
+                            .offset(depth - 1)
+                            .limit(1)
+                    )).one()
+                offset = await timed(lambda i: repo.get_wallet_queries(depth, per_page), repeats)
+                keyset = await timed(
+                    lambda i: repo.get_wallet_queries_before(*(anchor or (None, None)), per_page),
+                    repeats
+                )
+                results["depths"][depth] = {"offset_p50_ms": offset["p50_ms"], "keyset_p50_ms": keyset["p50_ms"]}
+                print("page at", depth, results["depths"][depth])
+            results["count_exact"] = await timed(lambda i: repo.get_total_queries_count(), repeats)
+            results["count_estimated"] = await timed(lambda i: repo.estimate_total_queries_count(), repeats)
+    finally:
+        await engine.dispose()
+    return results
+
+async def bench_export(db_path: Path, rows: int, batch_size: int) -> dict:
+    if not db_path.exists():
+        seed_rows(db_path, rows)
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    results = {"rows": rows, "batch_size": batch_size}
+    try:
+        for name, encode in (("ndjson", encode_ndjson), ("csv", encode_csv)):
+            exported = size = 0
+            tracemalloc.start()
+            started = time.perf_counter()
+            async with session_factory() as session:
+                async for partition in WalletRepository(session).stream_wallet_queries(batch_size=batch_size):
+                    exported += len(partition)
+                    size += len(encode(partition))
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name] = {
+                "rows": exported,
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_s": round(exported / elapsed, 1) if elapsed else 0.0,
+                "bytes": size,
+                "peak_memory_mib": round(peak / 2 ** 20, 2),
+            }
+            print("export", name, results[name])
+    finally:
+        await engine.dispose()
+    return results
+
+async def run(args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "address" in args.benchmarks:
+            results["address"] = bench_address(args.iterations)
+            print("address", results["address"])
+        if "cache" in args.benchmarks:
+            results["cache"] = await bench_cache(args.iterations)
+            print("cache", {name: results["cache"][name] for name in ("hit", "miss")})
+        if "insert" in args.benchmarks:
+            results["insert"] = await bench_insert(Path(tmp) / "insert.db", args.inserts)
+            print("insert", results["insert"])
+        if "pagination" in args.benchmarks:
+            results["pagination"] = await bench_pagination(
+                Path(tmp) / "pagination.db", args.rows, args.per_page, args.repeats
+            )
+        if "export" in args.benchmarks:
+            # Та же таблица, что и для пагинации, если она уже заполнена
+            results["export"] = await bench_export(Path(tmp) / "pagination.db", args.rows, args.export_batch_size)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--benchmarks", nargs="+", default=["address", "cache", "insert", "pagination", "export"],
+                        choices=["address", "cache", "insert", "pagination", "export"])
+    parser.add_argument("--iterations", type=int, default=100000, help="вызовов на сценарий для address и cache")
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--per-page", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--export-batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="путь к JSON; по умолчанию benchmarks/results/")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    path = save_results("micro", vars(args), results, args.output)
+    print(f"Results saved to {path}")
+
+if __name__ == "__main__":
+    main()
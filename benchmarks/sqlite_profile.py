@@ -0,0 +1,90 @@
+"""Сравнение конкурентной записи/чтения SQLite с профилем pragma и без него.
+
+Работает на копии tron_wallet.db, исходный файл не меняется.
+Запуск: python -m benchmarks.sqlite_profile --threads 8 --seconds 5
+"""
+import argparse
+import random
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from sqlalchemy import create_engine, exc, insert, select
+from app.database import apply_sqlite_pragmas, engine_options, sqlite_pragmas
+from app.models import Base, WalletQuery, utcnow
+
+SOURCE_DB = Path(__file__).resolve().parent.parent / "tron_wallet.db"
+
+def make_engine(path: Path, tuned: bool):
+    url = f"sqlite:///{path}"
+    if not tuned:
+        return create_engine(url, connect_args={"check_same_thread": False})
+    engine = create_engine(url, **engine_options(url))
+    apply_sqlite_pragmas(engine, sqlite_pragmas())
+    return engine
+
+def worker(engine, deadline: float, write_ratio: float, counters: dict, lock: threading.Lock):
+    writes = reads = errors = 0
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as conn:
+                if random.random() < write_ratio:
+                    conn.execute(insert(WalletQuery.__table__).values(
+                        address="TBenchmark", bandwidth=1, energy=1, trx_balance=1, created_at=utcnow()
+                    ))
+                    writes += 1
+                else:
+                    conn.execute(
+                        select(WalletQuery.id)
+                        .order_by(WalletQuery.created_at.desc(), WalletQuery.id.desc())
+                        .limit(10)
+                    ).all()
+                    reads += 1
+        except exc.OperationalError:
+            errors += 1
+    with lock:
+        counters["writes"] += writes
+        counters["reads"] += reads
+        counters["errors"] += errors
+
+def run(tuned: bool, threads: int, seconds: float, write_ratio: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        if SOURCE_DB.exists():
+            shutil.copy(SOURCE_DB, path)
+        engine = make_engine(path, tuned)
+        Base.metadata.create_all(engine)
+
+        counters = {"writes": 0, "reads": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+        pool = [
+            threading.Thread(target=worker, args=(engine, deadline, write_ratio, counters, lock))
+            for _ in range(threads)
+        ]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        engine.dispose()
+
+    return {
+        "profile": "tuned" if tuned else "default",
+        "writes_per_s": round(counters["writes"] / seconds, 1),
+        "reads_per_s": round(counters["reads"] / seconds, 1),
+        "locked_errors": counters["errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.5)
+    args = parser.parse_args()
+
+    for tuned in (False, True):
+        print(run(tuned, args.threads, args.seconds, args.write_ratio))
+
+if __name__ == "__main__":
+    main()
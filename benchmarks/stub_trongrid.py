@@ -0,0 +1,139 @@
+"""Локальная заглушка TronGrid для бенчмарков без сети.
+
+Отвечает на wallet/getaccount, wallet/getaccountresource и
+wallet/getnowblock с заданной задержкой; доля запросов error_rate
+завершается ошибкой error_status.
+Запуск отдельно: python -m benchmarks.stub_trongrid --port 8090 --latency 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubTronGrid:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        host: str = "127.0.0.1",
+        port: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _count(self, failed: bool):
+        with self._lock:
+            self.requests += 1
+            self.errors += failed
+
+    def respond(self, path: str, payload: dict) -> tuple[int, dict]:
+        time.sleep(self._delay())
+        if random.random() < self.error_rate:
+            self._count(True)
+            return self.error_status, {"Error": "injected failure"}
+        self._count(False)
+
+        address = payload.get("address", "")
+        # Детерминированные значения, чтобы ответы для адреса не менялись между запусками
+        seed = sum(address.encode())
+        if path == "/wallet/getaccount":
+            return 200, {
+                "address": address,
+                "balance": seed * 1_000_000,
+                "free_net_usage": seed % 600,
+                "account_resource": {"energy_usage": seed % 50000},
+            }
+        if path == "/wallet/getaccountresource":
+            return 200, {
+                "freeNetLimit": 600,
+                "freeNetUsed": seed % 600,
+                "NetLimit": 1000,
+                "NetUsed": seed % 1000,
+                "EnergyLimit": 50000,
+                "EnergyUsed": seed % 50000,
+            }
+        if path == "/wallet/getnowblock":
+            return 200, {"block_header": {"raw_data": {"number": 62700000}}}
+        return 404, {}
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                try:
+                    payload = json.loads(body) if body else {}
+                except ValueError:
+                    payload = {}
+                status, data = stub.respond(self.path, payload)
+                encoded = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            do_GET = _reply
+            do_POST = _reply
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> "StubTronGrid":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "errors": self.errors}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    stub = StubTronGrid(args.latency, args.jitter, args.error_rate, args.error_status, port=args.port)
+    print(f"Stub TronGrid listening on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,38 @@
+import asyncio
 import sys
 from pathlib import Path
+from unittest.mock import AsyncMock, Mock
+import pytest
 
 project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
\ No newline at end of file
+sys.path.insert(0, str(project_root))
+
+from app.utils.cache import cache_manager  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш кошельков - синглтон процесса: тесты не должны видеть записи друг друга
+    asyncio.run(cache_manager.clear_cache())
+    yield
+    asyncio.run(cache_manager.clear_cache())
+
+@pytest.fixture
+def tron_client():
+    """AsyncTron с ответами getaccount и getaccountresource для одного кошелька"""
+    client = Mock()
+    client.get_account = AsyncMock(return_value={
+        "balance": 15_250_000,
+        "free_net_usage": 120,
+        "account_resource": {"energy_usage": 30}
+    })
+    client.get_account_resource = AsyncMock(return_value={
+        "freeNetLimit": 600,
+        "freeNetUsed": 100,
+        "NetLimit": 50,
+        "NetUsed": 30,
+        "EnergyLimit": 1000,
+        "EnergyUsed": 970
+    })
+    client.get_account_balance = AsyncMock()
+    client.close = AsyncMock()
+    return client
@@ -1,13 +1,29 @@
+import asyncio
+import csv
+import json
+import httpx
 import pytest
+import time
+from types import SimpleNamespace
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app.config import settings
 from app.main import app
-from app.models import Base, WalletQuery
-from app.api.dependencies import get_db
+from app.api.endpoints import history_total
+from app.models import Base, WalletDailyRollup, WalletLatest, WalletQuery, as_utc, utcnow
+from app.api.dependencies import get_db, get_session_factory, get_tron_service, get_wallet_query_writer
 from datetime import datetime, timedelta
-from app.schemas import WalletQueryCreate
-from unittest.mock import patch
+from app.schemas import WalletQueryCreate, WalletInfo
+from app.api.errors import DatabaseError, TronAPIError
+from app.repositories.wallet import WalletRepository
+from app.services.tron import TronService
+from app.utils import cache as cache_module
+from app.utils.cache import cache_manager
+from app.utils.resilience import CLOSED, OPEN, CircuitBreaker
+from unittest.mock import AsyncMock, Mock
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
@@ -16,6 +32,10 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: TestClient запускает приложение в своём event loop на каждый клиент
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 @pytest.fixture(scope="function")
 def db_session():
     Base.metadata.create_all(bind=engine)
@@ -29,30 +49,33 @@ def db_session():
 
 @pytest.fixture(scope="function")
 def test_client(db_session):
-    def override_get_db():
-        try:
-            yield db_session
-        finally:
-            pass
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_session_factory] = lambda: TestingAsyncSessionLocal
+    history_total.clear()
     with TestClient(app) as client:
         yield client
 
 TEST_WALLET_ADDRESS = "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL"
+TEST_WALLET_HEX_ADDRESS = "418840e6c55b9ada326d211d818c34a994aeced808"
 MOCK_WALLET_INFO = {
     "address": TEST_WALLET_ADDRESS,
     "bandwidth": 1000,
     "energy": 500,
-    "trx_balance": 10.5
+    "trx_balance": 10_500_000
 }
 
 @pytest.fixture
 def mock_tron_service():
-    with patch("app.services.tron.TronService") as mock:
-        mock_instance = mock.return_value
-        mock_instance.get_wallet_info.return_value = MOCK_WALLET_INFO
-        yield mock_instance
+    mock_instance = Mock()
+    mock_instance.get_wallet_info = AsyncMock(return_value=WalletInfo(**MOCK_WALLET_INFO))
+    mock_instance.refresh_wallet_info = AsyncMock(return_value=WalletInfo(**MOCK_WALLET_INFO))
+    app.dependency_overrides[get_tron_service] = lambda: mock_instance
+    yield mock_instance
+    app.dependency_overrides.pop(get_tron_service, None)
 
 def test_get_wallet_info_success(test_client, mock_tron_service, db_session):
     request_data = {"wallet_address": TEST_WALLET_ADDRESS}
@@ -70,11 +93,27 @@ def test_get_wallet_info_success(test_client, mock_tron_service, db_session):
     assert db_record.address == TEST_WALLET_ADDRESS
 
 def test_get_wallet_info_invalid_address(test_client, mock_tron_service):
-    mock_tron_service.get_wallet_info.side_effect = Exception("Invalid address")
-    
-    request_data = {"wallet_address": "invalid_address"}
+    for address in ("invalid_address", TEST_WALLET_ADDRESS[:-1] + "M", "41" + "0" * 39):
+        response = test_client.post("/api/wallet-info/", json={"wallet_address": address})
+        assert response.status_code == 422
+        assert "Invalid Tron address" in response.text
+
+    mock_tron_service.get_wallet_info.assert_not_awaited()
+
+def test_get_wallet_info_hex_address_normalized(test_client, mock_tron_service, db_session):
+    request_data = {"wallet_address": TEST_WALLET_HEX_ADDRESS}
     response = test_client.post("/api/wallet-info/", json=request_data)
-    
+
+    assert response.status_code == 200
+    assert response.json()["address"] == TEST_WALLET_ADDRESS
+    mock_tron_service.get_wallet_info.assert_awaited_once_with(TEST_WALLET_ADDRESS)
+    assert db_session.query(WalletQuery).first().address == TEST_WALLET_ADDRESS
+
+def test_get_wallet_info_upstream_error(test_client, mock_tron_service):
+    mock_tron_service.get_wallet_info.side_effect = TronAPIError("Upstream failed")
+
+    response = test_client.post("/api/wallet-info/", json={"wallet_address": TEST_WALLET_ADDRESS})
+
     assert response.status_code == 503
     assert "API request failed" in response.json()["detail"]
 
@@ -118,3 +157,379 @@ def test_get_query_history_invalid_pagination(test_client):
     
     assert response.status_code == 400
     assert "Page and per_page must be positive integers" in response.json()["detail"]
+
+def test_get_wallet_info_batch(test_client, mock_tron_service, db_session):
+    failed_address = "TKmkfW5iHWSLMyov3He2u1T1cXxFdKGiwg"
+    mock_tron_service.get_multiple_wallets = AsyncMock(return_value={
+        TEST_WALLET_ADDRESS: WalletInfo(**MOCK_WALLET_INFO),
+        failed_address: TronAPIError("Invalid address")
+    })
+
+    request_data = {"wallet_addresses": [TEST_WALLET_ADDRESS, failed_address, TEST_WALLET_ADDRESS]}
+    response = test_client.post("/api/wallet-info/batch", json=request_data)
+
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == 2
+    assert items[0]["address"] == TEST_WALLET_ADDRESS
+    assert items[0]["result"]["energy"] == 500
+    assert items[0]["error"] is None
+    assert items[1]["address"] == failed_address
+    assert items[1]["result"] is None
+    assert items[1]["error"] == "API request failed"
+
+    assert db_session.query(WalletQuery).count() == 1
+
+def test_get_wallet_info_batch_too_many_addresses(test_client, mock_tron_service):
+    request_data = {"wallet_addresses": [TEST_WALLET_ADDRESS] * 1000}
+    response = test_client.post("/api/wallet-info/batch", json=request_data)
+
+    assert response.status_code == 400
+    assert "Too many addresses" in response.json()["detail"]
+
+def test_get_wallet_info_batch_invalid_address(test_client, mock_tron_service):
+    mock_tron_service.get_multiple_wallets = AsyncMock()
+
+    request_data = {"wallet_addresses": [TEST_WALLET_ADDRESS, "TFailedAddress"]}
+    response = test_client.post("/api/wallet-info/batch", json=request_data)
+
+    assert response.status_code == 422
+    mock_tron_service.get_multiple_wallets.assert_not_awaited()
+
+def test_get_query_history_cursor_pagination(test_client, db_session):
+    created_at = datetime.now()
+    test_records = [
+        WalletQuery(
+            address=f"address_{i}",
+            bandwidth=100 * i,
+            energy=50 * i,
+            trx_balance=i,
+            # Одинаковое время у пар записей проверяет сортировку по id
+            created_at=created_at - timedelta(minutes=i // 2)
+        )
+        for i in range(1, 15)
+    ]
+    db_session.add_all(test_records)
+    db_session.commit()
+
+    seen = []
+    response = test_client.get("/api/query-history/?per_page=5&total_mode=none")
+    while True:
+        assert response.status_code == 200
+        response_data = response.json()
+        assert response_data["total"] is None
+        seen.extend(item["id"] for item in response_data["items"])
+        if response_data["next_cursor"] is None:
+            break
+        response = test_client.get(
+            f"/api/query-history/?per_page=5&total_mode=none&cursor={response_data['next_cursor']}"
+        )
+
+    assert len(seen) == 14
+    assert len(set(seen)) == 14
+
+def test_get_query_history_total_modes(test_client, db_session):
+    db_session.add_all([WalletQuery(address=f"address_{i}") for i in range(3)])
+    db_session.commit()
+
+    for total_mode in ("exact", "cached", "estimated"):
+        response = test_client.get(f"/api/query-history/?total_mode={total_mode}")
+        assert response.status_code == 200
+        assert response.json()["total"] == 3
+
+    # cached отдаёт итог из своего TTL-хранилища, не трогая кэш кошельков
+    cache_stats = cache_manager.stats()
+    db_session.add(WalletQuery(address="address_3"))
+    db_session.commit()
+    assert test_client.get("/api/query-history/?total_mode=cached").json()["total"] == 3
+    assert test_client.get("/api/query-history/?total_mode=exact").json()["total"] == 4
+    assert cache_manager.stats()["hits"] == cache_stats["hits"]
+    assert cache_manager.stats()["misses"] == cache_stats["misses"]
+
+def test_get_query_history_invalid_cursor(test_client):
+    response = test_client.get("/api/query-history/?cursor=not-a-cursor")
+
+    assert response.status_code == 400
+    assert "Invalid pagination cursor" in response.json()["detail"]
+
+def test_get_wallet_info_write_behind(test_client, mock_tron_service):
+    query_writer = Mock()
+    query_writer.enqueue = AsyncMock(return_value=True)
+    app.dependency_overrides[get_wallet_query_writer] = lambda: query_writer
+
+    try:
+        response = test_client.post("/api/wallet-info/", json={"wallet_address": TEST_WALLET_ADDRESS})
+    finally:
+        app.dependency_overrides.pop(get_wallet_query_writer, None)
+
+    assert response.status_code == 200
+    response_data = response.json()
+    assert response_data["address"] == TEST_WALLET_ADDRESS
+    assert response_data["id"] is None
+    assert response_data["created_at"] is not None
+    query_writer.enqueue.assert_awaited_once()
+
+def test_metrics_endpoint(test_client, mock_tron_service):
+    test_client.post("/api/wallet-info/", json={"wallet_address": TEST_WALLET_ADDRESS})
+
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'http_requests_total{route="/api/wallet-info/",method="POST",status="200"}' in response.text
+    assert 'db_operation_duration_seconds_count{operation="commit"}' in response.text
+    assert "cache_size" in response.text
+
+def test_get_wallet_info_half_open_probe_succeeds(test_client, db_session):
+    async def get_account(address):
+        await asyncio.sleep(0.01)
+        return {"balance": 10_500_000}
+
+    async def get_account_resource(address):
+        await asyncio.sleep(0.01)
+        return {}
+
+    client = Mock()
+    client.get_account = AsyncMock(side_effect=get_account)
+    client.get_account_resource = AsyncMock(side_effect=get_account_resource)
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=0)
+    breaker.record_failure()
+    app.dependency_overrides[get_tron_service] = lambda: TronService(client=client, breaker=breaker, limiter=None)
+    try:
+        response = test_client.post("/api/wallet-info/", json={"wallet_address": TEST_WALLET_ADDRESS})
+    finally:
+        app.dependency_overrides.pop(get_tron_service, None)
+
+    assert response.status_code == 200
+    assert breaker.state == CLOSED
+
+def test_get_wallet_info_serves_cached_value_after_upstream_timeout(test_client, tron_client, db_session, monkeypatch):
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=60)
+    app.dependency_overrides[get_tron_service] = lambda: TronService(client=tron_client, breaker=breaker, limiter=None)
+    request_data = {"wallet_address": TEST_WALLET_ADDRESS}
+    try:
+        first = test_client.post("/api/wallet-info/", json=request_data)
+        # Часы кэша уходят за ttl и окно SWR: значение хранится только для fallback
+        shift = settings.CACHE_TTL + settings.CACHE_STALE_TTL + 1
+        monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: time.time() + shift))
+        tron_client.get_account.side_effect = httpx.ConnectTimeout("timed out")
+        after_timeout = test_client.post("/api/wallet-info/", json=request_data)
+        while_open = test_client.post("/api/wallet-info/", json=request_data)
+    finally:
+        app.dependency_overrides.pop(get_tron_service, None)
+
+    assert breaker.state == OPEN
+    assert [first.status_code, after_timeout.status_code, while_open.status_code] == [200, 200, 200]
+    assert after_timeout.json()["trx_balance"] == while_open.json()["trx_balance"] == first.json()["trx_balance"]
+    assert tron_client.get_account.await_count == 2
+
+def test_get_wallet_snapshot_fetches_and_records_latest(test_client, mock_tron_service, db_session):
+    response = test_client.get(f"/api/wallet-info/{TEST_WALLET_HEX_ADDRESS}")
+
+    assert response.status_code == 200
+    response_data = response.json()
+    assert response_data["source"] == "tron"
+    assert response_data["address"] == TEST_WALLET_ADDRESS
+    mock_tron_service.get_wallet_info.assert_awaited_once_with(TEST_WALLET_ADDRESS)
+
+    latest = db_session.get(WalletLatest, TEST_WALLET_ADDRESS)
+    assert latest.trx_balance == MOCK_WALLET_INFO["trx_balance"]
+    assert db_session.query(WalletQuery).count() == 1
+
+def test_get_wallet_snapshot_served_from_database(test_client, mock_tron_service, db_session):
+    db_session.add(WalletLatest(
+        address=TEST_WALLET_ADDRESS, bandwidth=1, energy=2, trx_balance=3,
+        updated_at=utcnow() - timedelta(seconds=30)
+    ))
+    db_session.commit()
+
+    response = test_client.get(f"/api/wallet-info/{TEST_WALLET_ADDRESS}?max_age=60")
+
+    assert response.status_code == 200
+    assert response.json()["source"] == "database"
+    assert response.json()["trx_balance"] == 3
+    mock_tron_service.get_wallet_info.assert_not_awaited()
+
+    # Снимок старше max_age - идём в TronGrid и обновляем его
+    response = test_client.get(f"/api/wallet-info/{TEST_WALLET_ADDRESS}?max_age=10")
+
+    assert response.status_code == 200
+    assert response.json()["source"] == "tron"
+    mock_tron_service.get_wallet_info.assert_awaited_once()
+    db_session.expire_all()
+    assert db_session.get(WalletLatest, TEST_WALLET_ADDRESS).trx_balance == MOCK_WALLET_INFO["trx_balance"]
+
+def test_get_wallet_snapshot_max_age_zero_bypasses_cache(test_client, db_session):
+    client = Mock()
+    client.get_account = AsyncMock(return_value={"balance": 10_500_000})
+    client.get_account_resource = AsyncMock(return_value={})
+    app.dependency_overrides[get_tron_service] = lambda: TronService(client=client, breaker=None, limiter=None)
+    try:
+        responses = [
+            test_client.get(f"/api/wallet-info/{TEST_WALLET_ADDRESS}?max_age=0") for _ in range(3)
+        ]
+    finally:
+        app.dependency_overrides.pop(get_tron_service, None)
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert client.get_account.await_count == 3
+    for response in responses:
+        updated_at = datetime.fromisoformat(response.json()["updated_at"])
+        assert updated_at.utcoffset() == timedelta(0)
+
+def test_get_wallet_snapshot_dates_cached_values_by_fetch_time(test_client, mock_tron_service, db_session):
+    fetched_at = utcnow() - timedelta(seconds=200)
+    mock_tron_service.get_wallet_info.return_value = WalletInfo(**MOCK_WALLET_INFO, fetched_at=fetched_at)
+
+    response = test_client.post("/api/wallet-info/", json={"wallet_address": TEST_WALLET_ADDRESS})
+
+    assert response.status_code == 200
+    assert "fetched_at" not in response.json()
+    latest = db_session.get(WalletLatest, TEST_WALLET_ADDRESS)
+    assert abs(as_utc(latest.updated_at) - fetched_at) < timedelta(seconds=1)
+
+    # И снимок в БД, и значение в кэше старше max_age - запрос в обход кэша
+    response = test_client.get(f"/api/wallet-info/{TEST_WALLET_ADDRESS}?max_age=60")
+
+    assert response.status_code == 200
+    assert response.json()["source"] == "tron"
+    mock_tron_service.refresh_wallet_info.assert_awaited_once_with(TEST_WALLET_ADDRESS)
+
+def test_get_wallet_snapshot_invalid_params(test_client, mock_tron_service):
+    assert test_client.get("/api/wallet-info/invalid_address").status_code == 422
+    response = test_client.get(f"/api/wallet-info/{TEST_WALLET_ADDRESS}?max_age=-1")
+    assert response.status_code == 400
+    mock_tron_service.get_wallet_info.assert_not_awaited()
+
+def test_get_query_history_filtered(test_client, db_session):
+    now = utcnow()
+    db_session.add_all(
+        [WalletQuery(address=TEST_WALLET_ADDRESS, trx_balance=i, created_at=now - timedelta(hours=i)) for i in range(6)]
+        + [WalletQuery(address="TKmkfW5iHWSLMyov3He2u1T1cXxFdKGiwg", created_at=now) for _ in range(3)]
+    )
+    db_session.commit()
+
+    response = test_client.get("/api/query-history/", params={
+        "address": TEST_WALLET_HEX_ADDRESS,
+        "since": (now - timedelta(hours=4, minutes=30)).isoformat(),
+        "until": (now - timedelta(minutes=30)).isoformat(),
+        "per_page": 2,
+    })
+
+    assert response.status_code == 200
+    response_data = response.json()
+    assert response_data["total"] == 4
+    assert [item["trx_balance"] for item in response_data["items"]] == [1, 2]
+
+    response = test_client.get("/api/query-history/", params={
+        "address": TEST_WALLET_ADDRESS, "per_page": 2, "cursor": response_data["next_cursor"],
+        "since": (now - timedelta(hours=4, minutes=30)).isoformat(), "total_mode": "cached",
+    })
+    assert [item["trx_balance"] for item in response.json()["items"]] == [3, 4]
+
+    cache_size = cache_manager.stats()["size"]
+    for total_mode in ("exact", "estimated", "cached"):
+        response = test_client.get("/api/query-history/", params={
+            "address": TEST_WALLET_ADDRESS, "total_mode": total_mode
+        })
+        assert response.json()["total"] == 6
+    # Итоги с фильтром не попадают в общий кэш кошельков
+    assert cache_manager.stats()["size"] == cache_size
+
+def test_get_query_history_invalid_filters(test_client):
+    assert test_client.get("/api/query-history/?address=invalid_address").status_code == 422
+    response = test_client.get(
+        "/api/query-history/?since=2026-01-02T00:00:00Z&until=2026-01-01T00:00:00Z"
+    )
+    assert response.status_code == 400
+
+def test_get_daily_history(test_client, db_session):
+    today = utcnow().date()
+    db_session.add_all([
+        WalletDailyRollup(
+            address=TEST_WALLET_ADDRESS, day=today - timedelta(days=i), queries=i + 1,
+            last_trx_balance=i, last_at=utcnow()
+        )
+        for i in range(3)
+    ])
+    db_session.commit()
+
+    response = test_client.get("/api/query-history/daily", params={
+        "address": TEST_WALLET_ADDRESS, "since": str(today - timedelta(days=1))
+    })
+
+    assert response.status_code == 200
+    response_data = response.json()
+    assert response_data["address"] == TEST_WALLET_ADDRESS
+    assert [item["day"] for item in response_data["items"]] == [str(today), str(today - timedelta(days=1))]
+    assert response_data["items"][1]["queries"] == 2
+
+def test_export_query_history_ndjson(test_client, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_EXPORT_BATCH_SIZE", 2)
+    now = utcnow()
+    db_session.add_all(
+        [WalletQuery(address=TEST_WALLET_ADDRESS, trx_balance=i, created_at=now - timedelta(hours=i)) for i in range(5)]
+        + [WalletQuery(address="TKmkfW5iHWSLMyov3He2u1T1cXxFdKGiwg", created_at=now)]
+    )
+    db_session.commit()
+
+    response = test_client.get("/api/query-history/export", params={
+        "address": TEST_WALLET_ADDRESS, "since": (now - timedelta(hours=3, minutes=30)).isoformat()
+    })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert "query-history.ndjson" in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Хронологический порядок, пачки курсора склеены без потерь
+    assert [row["trx_balance"] for row in rows] == [3, 2, 1, 0]
+    assert set(rows[0]) == {"id", "address", "bandwidth", "energy", "trx_balance", "created_at"}
+    assert rows[0]["created_at"].endswith("+00:00")
+
+def test_export_query_history_csv(test_client, db_session):
+    db_session.add_all([WalletQuery(address=f"address_{i}", trx_balance=i) for i in range(3)])
+    db_session.commit()
+
+    response = test_client.get("/api/query-history/export?format=csv")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(response.text.splitlines()))
+    assert rows[0] == ["id", "address", "bandwidth", "energy", "trx_balance", "created_at"]
+    assert [row[1] for row in rows[1:]] == ["address_0", "address_1", "address_2"]
+    assert rows[1][2] == ""
+
+def test_export_query_history_database_error_before_streaming(test_client, monkeypatch):
+    async def stream_wallet_queries(self, *args):
+        raise DatabaseError("Failed to stream queries")
+        yield
+
+    monkeypatch.setattr(WalletRepository, "stream_wallet_queries", stream_wallet_queries)
+
+    response = test_client.get("/api/query-history/export")
+
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Database operation failed"
+
+def test_export_query_history_aborts_on_mid_stream_error(test_client, db_session, monkeypatch):
+    db_session.add_all([WalletQuery(address=f"address_{i}") for i in range(3)])
+    db_session.commit()
+    stream = WalletRepository.stream_wallet_queries
+
+    async def stream_wallet_queries(self, *args):
+        async for rows in stream(self, *args):
+            yield rows
+            raise DatabaseError("Failed to stream queries")
+
+    monkeypatch.setattr(WalletRepository, "stream_wallet_queries", stream_wallet_queries)
+
+    # Ответ не завершается штатно: обрезанная выгрузка не выглядит полной
+    with pytest.raises(DatabaseError):
+        test_client.get("/api/query-history/export")
+
+def test_export_query_history_invalid_params(test_client):
+    assert test_client.get("/api/query-history/export?format=xml").status_code == 422
+    response = test_client.get(
+        "/api/query-history/export?since=2026-01-02T00:00:00Z&until=2026-01-01T00:00:00Z"
+    )
+    assert response.status_code == 400
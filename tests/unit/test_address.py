@@ -0,0 +1,50 @@
+import pytest
+from pydantic import ValidationError
+from tronpy import keys
+from app.schemas import WalletBatchQueryCreate, WalletQueryCreate
+from app.utils.address import is_valid_address, normalize_address
+
+TEST_ADDRESS = "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL"
+TEST_HEX_ADDRESS = "418840e6c55b9ada326d211d818c34a994aeced808"
+
+def test_normalize_keeps_valid_base58():
+    assert normalize_address(TEST_ADDRESS) == TEST_ADDRESS
+    assert normalize_address(f"  {TEST_ADDRESS}\n") == TEST_ADDRESS
+
+def test_normalize_converts_hex_forms():
+    assert normalize_address(TEST_HEX_ADDRESS) == TEST_ADDRESS
+    assert normalize_address(TEST_HEX_ADDRESS.upper()) == TEST_ADDRESS
+    assert normalize_address("0x" + TEST_HEX_ADDRESS[2:]) == TEST_ADDRESS
+
+def test_normalize_matches_tronpy():
+    for i in range(50):
+        raw = bytes([0x41]) + bytes((i * 7 + j) % 256 for j in range(20))
+        address = keys.to_base58check_address(raw)
+        assert normalize_address(raw.hex()) == address
+        assert normalize_address(address) == address
+
+@pytest.mark.parametrize("address", [
+    "",
+    "invalid_address",
+    TEST_ADDRESS[:-1] + "M", # неверная контрольная сумма
+    TEST_ADDRESS[:-1] + "0", # символ вне алфавита base58
+    TEST_ADDRESS[:-1],
+    "T" + "1" * 33, # не тот префикс сети
+    "42" + TEST_HEX_ADDRESS[2:],
+    TEST_HEX_ADDRESS[:-1] + "g",
+    TEST_HEX_ADDRESS[2:],
+])
+def test_normalize_rejects_invalid(address):
+    with pytest.raises(ValueError):
+        normalize_address(address)
+    assert not is_valid_address(address)
+
+def test_schemas_use_canonical_address():
+    assert WalletQueryCreate(wallet_address=TEST_HEX_ADDRESS).wallet_address == TEST_ADDRESS
+    batch = WalletBatchQueryCreate(wallet_addresses=[TEST_ADDRESS, TEST_HEX_ADDRESS])
+    assert batch.wallet_addresses == [TEST_ADDRESS, TEST_ADDRESS]
+
+    with pytest.raises(ValidationError):
+        WalletQueryCreate(wallet_address="invalid_address")
+    with pytest.raises(ValidationError):
+        WalletBatchQueryCreate(wallet_addresses=[TEST_ADDRESS, "TFailedAddress"])
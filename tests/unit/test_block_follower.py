@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import pytest
+from unittest.mock import AsyncMock, Mock
+from tronpy import AsyncTron
+from tronpy.providers.async_http import AsyncHTTPProvider
+from app.schemas import WalletInfo
+from app.services.block_follower import BlockFollower, extract_touched_addresses
+from app.services.tron import WALLET_INFO_CACHE_PREFIX
+from app.utils.cache import cache_manager
+
+BLOCKS = json.loads((Path(__file__).parent.parent / "fixtures" / "blocks.json").read_text())
+FIRST_BLOCK = BLOCKS[0]["block_header"]["raw_data"]["number"]
+
+SENDER = "TJiR1jwTqj2LHVy3XQK2yuqqiAf9WrpHYd"
+RECIPIENT = "TKmkfW5iHWSLMyov3He2u1T1cXxFdKGiwg"
+DELEGATE_RECEIVER = "TGpUyEStgLeB4iBaTbGwuJNoaefrRWx87p"
+DORMANT = "TXmrVabseevi8Nw2Va4gsxSJsdUwcqjKVK"
+
+class StubNodeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    head = FIRST_BLOCK - 1
+
+    def do_POST(self):
+        params = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/wallet/getnodeinfo":
+            body = {"block": f"Num:{self.head},ID:{self.head:064x}"}
+        elif self.path == "/wallet/getblockbylimitnext":
+            numbers = range(params["startNum"], params["endNum"])
+            body = {"block": [
+                block for block in BLOCKS
+                if block["block_header"]["raw_data"]["number"] in numbers
+            ]}
+        else:
+            body = {}
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_node():
+    StubNodeHandler.head = FIRST_BLOCK - 1
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubNodeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def key(address: str) -> str:
+    return cache_manager.make_key(WALLET_INFO_CACHE_PREFIX, address)
+
+async def seed_cache(*addresses: str):
+    for address in addresses:
+        await cache_manager.set(key(address), WalletInfo(address=address), ttl=3600)
+
+def test_extract_touched_addresses_from_recorded_blocks():
+    assert extract_touched_addresses(BLOCKS[0]) == {SENDER, RECIPIENT, "TVLYTe9yAHbiD1nagEkHQ5eyVjLiEHKTBw"}
+    assert extract_touched_addresses(BLOCKS[1]) == {"TH5nPuGeLQ52TBcAyZBwMsvc85QsKKWnor", DELEGATE_RECEIVER}
+    assert extract_touched_addresses(BLOCKS[2]) == set()
+
+def test_follower_invalidates_only_touched_cached_wallets(stub_node):
+    async def run():
+        client = AsyncTron(AsyncHTTPProvider(stub_node))
+        follower = BlockFollower(client)
+        await follower.poll()
+        await seed_cache(SENDER, DELEGATE_RECEIVER, DORMANT)
+
+        StubNodeHandler.head = FIRST_BLOCK + 2
+        await follower.poll()
+        remaining = await cache_manager.cached_keys([key(SENDER), key(DELEGATE_RECEIVER), key(DORMANT)])
+        await client.close()
+        return follower, remaining
+
+    follower, remaining = asyncio.run(run())
+
+    assert remaining == [key(DORMANT)]
+    assert follower.last_block == FIRST_BLOCK + 2
+    assert follower.blocks == 3
+    assert follower.invalidated == 2
+
+def test_follower_refreshes_touched_wallets_in_refresh_mode(stub_node):
+    service = Mock()
+    service.refresh_wallet_info = AsyncMock()
+
+    async def run():
+        client = AsyncTron(AsyncHTTPProvider(stub_node))
+        follower = BlockFollower(client, service, mode="refresh")
+        await follower.poll()
+        await seed_cache(RECIPIENT, DORMANT)
+        StubNodeHandler.head = FIRST_BLOCK
+        await follower.poll()
+        await client.close()
+
+    asyncio.run(run())
+
+    service.refresh_wallet_info.assert_awaited_once_with(RECIPIENT, join=False)
+
+def test_follower_catches_up_in_batches_when_far_behind(stub_node):
+    async def run():
+        client = AsyncTron(AsyncHTTPProvider(stub_node))
+        follower = BlockFollower(client, max_blocks=2)
+        await follower.poll()
+        await seed_cache(SENDER, DELEGATE_RECEIVER, DORMANT)
+        await cache_manager.get(key(DORMANT))
+        StubNodeHandler.head = FIRST_BLOCK + 5
+        polls = [await follower.poll(), await follower.poll(), await follower.poll()]
+        remaining = await cache_manager.cached_keys([key(SENDER), key(DELEGATE_RECEIVER), key(DORMANT)])
+        await client.close()
+        return follower, polls, remaining
+
+    follower, polls, remaining = asyncio.run(run())
+
+    # Кэш не очищается целиком: сбрасываются только затронутые адреса, статистика цела
+    assert polls == [True, True, False]
+    assert remaining == [key(DORMANT)]
+    assert follower.invalidated == 2
+    assert follower.last_block == FIRST_BLOCK + 5
+    assert cache_manager.stats()["hits"] == 1
@@ -0,0 +1,300 @@
+import asyncio
+import fakeredis
+from datetime import datetime, timezone
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.api.errors import TronAPIError, WalletNotFoundError
+from app.services.tron import TronService, WALLET_INFO_CACHE_PREFIX
+from app.utils.cache import CacheManager, cache_manager
+from app.schemas import AccountResources, WalletInfo
+from app.utils.cache_backends import MISSING, CachedValue, LRUCache, MemoryBackend, RedisBackend, TieredBackend
+
+TEST_ADDRESS = "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL"
+
+def test_make_key_is_deterministic():
+    assert CacheManager.make_key("wallet_info", TEST_ADDRESS) == f"wallet_info:{TEST_ADDRESS}"
+    assert CacheManager.make_key("prefix", 1, "a") == CacheManager.make_key("prefix", 1, "a")
+
+def test_cached_ignores_self_and_normalizes_kwargs():
+    calls = []
+
+    class Service:
+        @cache_manager.cached(key_prefix="test")
+        async def lookup(self, address, network="mainnet"):
+            calls.append(address)
+            return address.upper()
+
+    async def run():
+        assert await Service().lookup("abc") == "ABC"
+        assert await Service().lookup(address="abc") == "ABC"
+        assert await Service().lookup("abc", network="mainnet") == "ABC"
+
+    asyncio.run(run())
+
+    assert calls == ["abc"]
+    assert "test:abc:mainnet" in cache_manager._backend.store
+
+def test_wallet_info_is_cached_across_service_instances(tron_client):
+    client = tron_client
+
+    async def run():
+        for _ in range(10):
+            await TronService(client=client).get_wallet_info(TEST_ADDRESS)
+
+    asyncio.run(run())
+
+    assert client.get_account.await_count == 1
+    stats = cache_manager.stats()
+    assert stats["hits"] == 9
+    assert stats["misses"] == 1
+
+def test_batch_and_single_lookups_share_cache_keys(tron_client):
+    client = tron_client
+    service = TronService(client=client)
+
+    asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+    results = asyncio.run(service.get_multiple_wallets([TEST_ADDRESS, "other"]))
+
+    assert results[TEST_ADDRESS].bandwidth == 120
+    assert client.get_account.await_count == 2
+    assert CacheManager.make_key(WALLET_INFO_CACHE_PREFIX, "other") in cache_manager._backend.store
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3, ttl=60)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.evictions == 1
+
+def test_lru_cache_expires_entries():
+    cache = LRUCache(max_size=10, sweep_interval=0)
+    cache.set("a", 1, ttl=0)
+    cache.set("b", 2, ttl=60)
+
+    assert "a" not in cache
+    assert len(cache) == 1
+    assert cache.expirations == 1
+
+def test_lru_cache_sweep_removes_expired_entries():
+    cache = LRUCache(max_size=10)
+    for i in range(5):
+        cache.set(f"key_{i}", i, ttl=0)
+
+    assert cache.sweep_expired() == 5
+    assert len(cache) == 0
+
+def test_cached_rejects_sync_functions():
+    with pytest.raises(TypeError):
+        @cache_manager.cached()
+        def lookup(address):
+            return address
+
+def test_redis_backend_round_trips_wallet_info():
+    backend = RedisBackend(prefix="test:", client=fakeredis.FakeAsyncRedis())
+    wallet_info = WalletInfo(address=TEST_ADDRESS, bandwidth=1, energy=None, trx_balance=5)
+
+    async def run():
+        await backend.set("wallet_info:a", wallet_info, ttl=60)
+        await backend.set("wallet_info:b", wallet_info, ttl=60)
+        single = await backend.get("wallet_info:a")
+        many = await backend.get_many(["wallet_info:a", "wallet_info:b", "wallet_info:c"])
+        missing = await backend.get("wallet_info:c")
+        return single, many, missing
+
+    single, many, missing = asyncio.run(run())
+
+    assert single == wallet_info
+    assert set(many) == {"wallet_info:a", "wallet_info:b"}
+    assert missing is MISSING
+
+def test_tiered_backend_fills_l1_from_l2():
+    l2 = RedisBackend(client=fakeredis.FakeAsyncRedis())
+    worker_a = TieredBackend(MemoryBackend(max_size=10), l2, l1_max_ttl=30)
+    worker_b = TieredBackend(MemoryBackend(max_size=10), l2, l1_max_ttl=30)
+
+    async def run():
+        await worker_a.set("key", 42, ttl=60)
+        first = await worker_b.get("key")
+        second = await worker_b.get("key")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second == 42
+    assert worker_b.l2_hits == 1
+    assert "key" in worker_b.l1.store
+
+def test_redis_backend_errors_are_misses():
+    client = Mock()
+    client.get = AsyncMock(side_effect=ConnectionError("redis is down"))
+    backend = RedisBackend(client=client)
+
+    assert asyncio.run(backend.get("key")) is MISSING
+    assert backend.errors == 1
+
+def test_redis_backend_corrupt_values_are_misses():
+    redis = fakeredis.FakeAsyncRedis()
+    backend = RedisBackend(client=redis)
+
+    async def run():
+        await backend.set("ok", 42, ttl=60)
+        await redis.set("bad", b"\xc1")
+        return await backend.get("bad"), await backend.get_many(["ok", "bad"])
+
+    value, found = asyncio.run(run())
+
+    assert value is MISSING
+    assert found == {"ok": 42}
+    assert backend.errors == 2
+
+def test_concurrent_lookups_are_coalesced(tron_client):
+    client = tron_client
+
+    async def get_account(addr):
+        await asyncio.sleep(0.01)
+        return {"free_net_usage": 10}
+
+    client.get_account.side_effect = get_account
+
+    async def run():
+        return await asyncio.gather(*(
+            TronService(client=client).get_wallet_info(TEST_ADDRESS) for _ in range(10)
+        ))
+
+    results = asyncio.run(run())
+
+    assert all(result.bandwidth == 10 for result in results)
+    assert client.get_account.await_count == 1
+    stats = cache_manager.stats()
+    assert stats["upstream_calls"] == 1
+    assert stats["coalesced_calls"] == 9
+
+def test_coalesced_callers_share_errors(tron_client):
+    client = tron_client
+
+    async def get_account(addr):
+        await asyncio.sleep(0.01)
+        raise ValueError("bad address")
+
+    client.get_account.side_effect = get_account
+
+    async def run():
+        return await asyncio.gather(
+            *(TronService(client=client).get_wallet_info(TEST_ADDRESS) for _ in range(5)),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, TronAPIError) for result in results)
+    assert client.get_account.await_count == 1
+
+def test_stale_value_is_served_while_refreshing():
+    calls = []
+
+    @cache_manager.cached(ttl=0, key_prefix="stale", stale_ttl=60)
+    async def lookup(address):
+        calls.append(address)
+        return len(calls)
+
+    async def run():
+        first = await lookup("abc")
+        second = await lookup("abc")
+        await asyncio.sleep(0.01)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == 1
+    assert second == 1
+    assert len(calls) == 2
+    assert cache_manager.stats()["stale_hits"] == 1
+
+def test_errors_are_negatively_cached():
+    calls = []
+
+    @cache_manager.cached(key_prefix="negative", negative_ttl=60, negative_exceptions=(WalletNotFoundError,))
+    async def lookup(address):
+        calls.append(address)
+        raise WalletNotFoundError(f"Wallet {address} not found")
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(WalletNotFoundError, match="Wallet abc not found"):
+                await lookup("abc")
+
+    asyncio.run(run())
+
+    assert calls == ["abc"]
+    assert cache_manager.stats()["negative_hits"] == 2
+
+def test_failed_refresh_keeps_stale_value():
+    calls = []
+
+    @cache_manager.cached(ttl=0, key_prefix="refresh_failure", stale_ttl=60,
+                          negative_ttl=60, negative_exceptions=(TronAPIError,))
+    async def lookup(address):
+        calls.append(address)
+        if len(calls) > 1:
+            raise TronAPIError("API request failed")
+        return "value"
+
+    async def run():
+        first = await lookup("abc")
+        await lookup("abc")
+        await asyncio.sleep(0.01)
+        return first, await lookup("abc")
+
+    first, third = asyncio.run(run())
+
+    assert first == third == "value"
+
+def test_redis_backend_round_trips_cached_value_envelope():
+    backend = RedisBackend(client=fakeredis.FakeAsyncRedis())
+    wallet_info = WalletInfo(
+        address=TEST_ADDRESS, bandwidth=1, energy=2, trx_balance=3,
+        resources=AccountResources(free_net_limit=600, free_net_used=599, energy_limit=2),
+        fetched_at=datetime(2026, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+    )
+
+    async def run():
+        await backend.set("ok", CachedValue(wallet_info, 123.5), ttl=60)
+        await backend.set("error", CachedValue(None, 124.0, ("TronAPIError", "failed")), ttl=60)
+        return await backend.get("ok"), await backend.get("error")
+
+    ok, error = asyncio.run(run())
+
+    assert ok.value == wallet_info
+    assert ok.value.fetched_at == wallet_info.fetched_at
+    assert ok.fresh_until == 123.5
+    assert error.error == ("TronAPIError", "failed")
+
+def test_reload_does_not_join_a_load_started_before_it():
+    balances = iter([1, 2])
+    started = asyncio.Event()
+
+    @cache_manager.cached(key_prefix="reload", single_flight=True)
+    async def lookup(address):
+        balance = next(balances)
+        if balance == 1:
+            started.set()
+            await asyncio.sleep(0.02)
+        return balance
+
+    async def run():
+        before_change = asyncio.ensure_future(lookup("abc"))
+        await started.wait()
+        reloaded = await lookup.reload("abc")
+        return await before_change, reloaded, await lookup("abc")
+
+    before_change, reloaded, cached = asyncio.run(run())
+
+    assert before_change == 1
+    # Новая загрузка завершается после начатой раньше, и в кэше остаётся её значение
+    assert reloaded == cached == 2
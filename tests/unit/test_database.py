@@ -0,0 +1,24 @@
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool, StaticPool
+from app.database import create_sync_engine, engine_options, to_async_url
+
+def test_to_async_url():
+    assert to_async_url("sqlite:///./tron_wallet.db") == "sqlite+aiosqlite:///./tron_wallet.db"
+    assert to_async_url("postgresql://user:pass@db/tron") == "postgresql+asyncpg://user:pass@db/tron"
+
+def test_sqlite_profile_is_applied_on_connect(tmp_path):
+    engine = create_sync_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+
+    with engine.connect() as conn:
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+        synchronous = conn.execute(text("PRAGMA synchronous")).scalar()
+        busy_timeout = conn.execute(text("PRAGMA busy_timeout")).scalar()
+    engine.dispose()
+
+    assert journal_mode == "wal"
+    assert synchronous == 1
+    assert busy_timeout == 5000
+    assert isinstance(engine.pool, QueuePool)
+
+def test_sqlite_memory_uses_static_pool():
+    assert engine_options("sqlite://")["poolclass"] is StaticPool
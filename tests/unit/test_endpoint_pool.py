@@ -0,0 +1,104 @@
+import asyncio
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.utils.endpoint_pool import EndpointPool
+from app.utils.tron_client import create_http_client
+
+def make_handler():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        delay = 0.0
+        status = 200
+        hits = 0
+
+        def do_POST(self):
+            type(self).hits += 1
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(self.delay)
+            body = b"{}"
+            self.send_response(self.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+@pytest.fixture
+def stub_servers():
+    servers = []
+
+    def start():
+        handler = make_handler()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", handler
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def unused_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def send(pool: EndpointPool, count: int) -> list[int]:
+    async def run():
+        client, _ = create_http_client(endpoint_pool=pool)
+        async with client:
+            return [
+                (await client.post(f"{pool.primary_url}wallet/getaccount", json={})).status_code
+                for _ in range(count)
+            ]
+    return asyncio.run(run())
+
+def test_routes_to_lowest_latency_endpoint(stub_servers):
+    slow_url, slow = stub_servers()
+    fast_url, fast = stub_servers()
+    slow.delay = 0.03
+
+    statuses = send(EndpointPool([slow_url, fast_url]), 10)
+
+    assert statuses == [200] * 10
+    assert slow.hits == 1
+    assert fast.hits == 9
+
+def test_fails_over_and_sidelines_broken_endpoints(stub_servers):
+    healthy_url, healthy = stub_servers()
+    erroring_url, erroring = stub_servers()
+    erroring.status = 503
+    pool = EndpointPool([unused_url(), erroring_url, healthy_url], cooldown=60)
+
+    statuses = send(pool, 3)
+
+    assert statuses == [200] * 3
+    assert erroring.hits == 1
+    assert healthy.hits == 3
+    assert [endpoint.is_healthy(time.monotonic()) for endpoint in pool.endpoints] == [False, False, True]
+
+def test_hedged_request_returns_first_response(stub_servers):
+    primary_url, primary = stub_servers()
+    backup_url, backup = stub_servers()
+    pool = EndpointPool([primary_url, backup_url], hedge=True, hedge_min_delay=0.01)
+    for _ in range(5):
+        pool.endpoints[0].observe(0.005)
+        pool.endpoints[1].observe(0.05)
+    primary.delay = 0.5
+
+    started = time.perf_counter()
+    statuses = send(pool, 1)
+
+    assert statuses == [200]
+    assert time.perf_counter() - started < 0.4
+    assert pool.hedged == 1
+    assert pool.hedge_wins == 1
+    assert backup.hits == 1
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.models import Base, WalletDailyRollup, WalletQuery, WalletQueryArchive, utcnow
+from app.repositories.wallet import day_bounds
+from app.services.history_maintenance import HistoryMaintenance
+
+async def make_session_factory(rows: list[WalletQuery]):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add_all(rows)
+        await session.commit()
+    return engine, session_factory
+
+async def count(session_factory, model) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+def make_rows() -> list[WalletQuery]:
+    today = utcnow().date()
+    rows = []
+    # По 3 записи в день за последние 5 дней (сегодня включительно)
+    for days_ago in range(5):
+        start, _ = day_bounds(today - timedelta(days=days_ago))
+        for hour, balance in ((1, 30), (2, 10), (3, 20)):
+            rows.append(WalletQuery(
+                address="hot", trx_balance=balance + days_ago, energy=hour, bandwidth=100 - hour,
+                created_at=start + timedelta(hours=hour)
+            ))
+    rows.append(WalletQuery(address="cold", trx_balance=5, created_at=day_bounds(today)[0]))
+    return rows
+
+@pytest.mark.parametrize("mode", ["delete", "archive"])
+def test_maintenance_rolls_up_then_purges_in_chunks(mode):
+    async def run():
+        engine, session_factory = await make_session_factory(make_rows())
+        maintenance = HistoryMaintenance(
+            session_factory, retention_days=2, mode=mode, chunk_size=2, chunk_pause=0
+        )
+        await maintenance.run_once()
+        result = {
+            "remaining": await count(session_factory, WalletQuery),
+            "archived": await count(session_factory, WalletQueryArchive),
+        }
+        async with session_factory() as session:
+            result["rollups"] = {
+                (row.address, row.day): row
+                for row in (await session.scalars(select(WalletDailyRollup))).all()
+            }
+        # Повторный запуск не задваивает сводки
+        await maintenance.run_once()
+        result["rollups_after_rerun"] = await count(session_factory, WalletDailyRollup)
+        await engine.dispose()
+        return maintenance.stats(), result
+
+    stats, result = asyncio.run(run())
+    today = utcnow().date()
+
+    # Старше двух суток: 2 дня по 3 записи
+    assert stats["purged"] == 6
+    assert result["remaining"] == 10
+    assert result["archived"] == (6 if mode == "archive" else 0)
+    assert len(result["rollups"]) == 6
+    assert result["rollups_after_rerun"] == 6
+
+    oldest = result["rollups"][("hot", today - timedelta(days=4))]
+    assert oldest.queries == 3
+    assert (oldest.min_trx_balance, oldest.max_trx_balance, oldest.last_trx_balance) == (14, 34, 24)
+    assert (oldest.min_energy, oldest.max_energy, oldest.last_energy) == (1, 3, 3)
+    assert oldest.last_bandwidth == 97
+    assert result["rollups"][("cold", today)].queries == 1
+
+def test_maintenance_without_retention_keeps_rows():
+    async def run():
+        engine, session_factory = await make_session_factory(make_rows())
+        maintenance = HistoryMaintenance(session_factory, retention_days=0)
+        await maintenance.run_once()
+        remaining = await count(session_factory, WalletQuery)
+        await engine.dispose()
+        return remaining
+
+    assert asyncio.run(run()) == 16
+
+def test_maintenance_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        HistoryMaintenance(None, mode="truncate")
@@ -0,0 +1,117 @@
+import json
+import logging
+import threading
+import time
+import httpx
+import pytest
+from app.config import settings
+from app.utils.logging.log_handlers import LogDispatcher
+from app.utils.logging import logging as app_logging
+from app.utils.logging.logging import ExternalLogHandler, LogShipper
+
+@pytest.fixture
+def requests_log(monkeypatch):
+    monkeypatch.setattr(settings, "ELASTICSEARCH_URL", "http://elastic.test")
+    monkeypatch.setattr(settings, "TELEGRAM_BOT_TOKEN", "token")
+    monkeypatch.setattr(settings, "TELEGRAM_CHAT_ID", "chat")
+    monkeypatch.setattr(settings, "LOG_FLUSH_INTERVAL", 0.05)
+    return []
+
+def make_dispatcher(requests_log) -> LogDispatcher:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests_log.append(request)
+        return httpx.Response(200, json={})
+
+    return LogDispatcher(client=httpx.Client(transport=httpx.MockTransport(handler)))
+
+def make_record(level: int, message: str) -> logging.LogRecord:
+    return logging.LogRecord("app.test", level, __file__, 1, message, None, None)
+
+def test_logs_are_shipped_to_elasticsearch_in_bulk(requests_log):
+    shipper = LogShipper(make_dispatcher(requests_log))
+    handler = ExternalLogHandler(shipper)
+    for i in range(5):
+        handler.emit(make_record(logging.ERROR, f"error {i}"))
+
+    shipper.start()
+    shipper.stop(timeout=5)
+
+    bulk_requests = [r for r in requests_log if r.url.path == "/_bulk"]
+    assert len(bulk_requests) == 1
+    lines = bulk_requests[0].content.decode().splitlines()
+    assert len(lines) == 10
+    assert json.loads(lines[1])["message"] == "error 0"
+    assert shipper.stats()["shipped"] == 5
+
+def test_trickle_of_logs_is_flushed_by_interval(requests_log):
+    shipper = LogShipper(make_dispatcher(requests_log))
+    handler = ExternalLogHandler(shipper)
+    shipper.start()
+
+    # Записи приходят чаще flush_interval (0.05 с), пачка так и не наполняется
+    for i in range(12):
+        handler.emit(make_record(logging.ERROR, f"error {i}"))
+        time.sleep(0.02)
+    shipped_before_stop = len([r for r in requests_log if r.url.path == "/_bulk"])
+    shipper.stop(timeout=5)
+
+    assert shipped_before_stop >= 2
+    assert shipper.stats()["shipped"] == 12
+
+def test_telegram_alerts_are_deduplicated_and_rate_limited(requests_log):
+    dispatcher = make_dispatcher(requests_log)
+    shipper = LogShipper(dispatcher)
+    handler = ExternalLogHandler(shipper)
+    handler.emit(make_record(logging.CRITICAL, "database is down"))
+    handler.emit(make_record(logging.CRITICAL, "database is down"))
+    handler.emit(make_record(logging.CRITICAL, "cache is down"))
+
+    shipper.start()
+    shipper.stop(timeout=5)
+
+    telegram_requests = [r for r in requests_log if "sendMessage" in r.url.path]
+    assert len(telegram_requests) == 1
+    assert dispatcher.telegram_suppressed == 2
+
+def test_handler_drops_records_when_queue_is_full(requests_log, monkeypatch):
+    monkeypatch.setattr(settings, "LOG_QUEUE_SIZE", 2)
+    shipper = LogShipper(make_dispatcher(requests_log))
+    handler = ExternalLogHandler(shipper)
+
+    for i in range(5):
+        handler.emit(make_record(logging.ERROR, f"error {i}"))
+
+    assert shipper.stats()["dropped"] == 3
+    assert shipper.stats()["queued"] == 2
+
+def test_stop_does_not_close_dispatcher_under_a_busy_thread(requests_log):
+    dispatcher = make_dispatcher(requests_log)
+    release = threading.Event()
+    dispatch = dispatcher.dispatch
+    dispatcher.dispatch = lambda batch: (release.wait(5), dispatch(batch))
+    closed = []
+    dispatcher.close = lambda: closed.append(True)
+    shipper = LogShipper(dispatcher)
+    ExternalLogHandler(shipper).emit(make_record(logging.ERROR, "slow"))
+    shipper.start()
+
+    shipper.stop(timeout=0.05)
+    assert closed == []
+
+    release.set()
+    shipper.stop(timeout=5)
+    assert closed == [True]
+    assert shipper.stats()["shipped"] == 1
+
+def test_shutdown_logging_detaches_handler(requests_log, monkeypatch):
+    shipper = LogShipper(make_dispatcher(requests_log))
+    monkeypatch.setattr(app_logging, "_shipper", shipper)
+    logger = logging.getLogger("app.test_shutdown")
+    handler = ExternalLogHandler(shipper)
+    logger.addHandler(handler)
+    shipper.start()
+
+    app_logging.shutdown_logging(timeout=5)
+
+    assert handler not in logger.handlers
+    assert app_logging._shipper is None
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, Mock
+from app.services.tron import TronService
+from app.utils.metrics import MetricsRegistry, TRON_REQUEST_LATENCY, registry
+
+def test_counter_renders_labels_and_values():
+    metrics = MetricsRegistry()
+    counter = metrics.counter("requests_total", "Requests", ("route",))
+    counter.labels("/a").inc()
+    counter.labels("/a").inc(2)
+    counter.labels('/"b"').inc()
+
+    output = metrics.render()
+
+    assert "# TYPE requests_total counter" in output
+    assert 'requests_total{route="/a"} 3' in output
+    assert 'requests_total{route="/\\"b\\""} 1' in output
+
+def test_histogram_buckets_are_cumulative():
+    metrics = MetricsRegistry()
+    histogram = metrics.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    output = metrics.render()
+
+    assert 'latency_seconds_bucket{le="0.1"} 2' in output
+    assert 'latency_seconds_bucket{le="1.0"} 3' in output
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in output
+    assert "latency_seconds_count 4" in output
+    assert "latency_seconds_sum 2.65" in output
+
+def test_labels_reject_wrong_arity_and_duplicates():
+    metrics = MetricsRegistry()
+    counter = metrics.counter("errors_total", "Errors", ("method",))
+
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+    with pytest.raises(ValueError):
+        metrics.counter("errors_total", "Errors")
+
+def test_callback_metric_skips_missing_values():
+    metrics = MetricsRegistry()
+    metrics.gauge_callback("size", "Size", lambda: 7)
+    metrics.gauge_callback("absent", "Absent", lambda: None)
+
+    output = metrics.render()
+
+    assert "size 7" in output
+    assert "absent" not in output
+
+def test_tron_calls_are_timed_per_method():
+    client = Mock()
+    client.get_account = AsyncMock(return_value={})
+    client.get_account_resource = AsyncMock(return_value={})
+    client.get_account.__name__ = "get_account"
+    client.get_account_resource.__name__ = "get_account_resource"
+    before = TRON_REQUEST_LATENCY.labels("get_account").counts[:]
+
+    asyncio.run(TronService(client=client).get_wallet_info("metrics_address"))
+
+    assert sum(TRON_REQUEST_LATENCY.labels("get_account").counts) == sum(before) + 1
+    output = registry.render()
+    assert 'tron_request_duration_seconds_count{method="get_account_resource"}' in output
+    assert "cache_misses_total" in output
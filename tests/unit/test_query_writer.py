@@ -0,0 +1,98 @@
+import asyncio
+from datetime import timedelta
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.models import Base, WalletLatest, WalletQuery, utcnow
+from app.repositories.query_writer import WalletQueryWriter
+from app.schemas import WalletInfo
+
+def make_wallet_info(i: int) -> WalletInfo:
+    return WalletInfo(address=f"address_{i}", bandwidth=i, energy=i, trx_balance=i)
+
+async def make_session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+async def count_rows(session_factory) -> int:
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(WalletQuery))
+
+def test_writer_flushes_in_batches_and_drains_on_stop():
+    async def run():
+        engine, session_factory = await make_session_factory()
+        writer = WalletQueryWriter(session_factory, batch_size=10, flush_interval=0.05)
+        writer.start()
+        for i in range(25):
+            await writer.enqueue(make_wallet_info(i), utcnow())
+        await writer.stop(timeout=5)
+        rows = await count_rows(session_factory)
+        await engine.dispose()
+        return writer.stats(), rows
+
+    stats, rows = asyncio.run(run())
+
+    assert rows == 25
+    assert stats["written"] == 25
+    assert stats["flushes"] == 3
+    assert stats["queued"] == 0
+
+def test_writer_flushes_partial_batch_after_interval():
+    async def run():
+        engine, session_factory = await make_session_factory()
+        writer = WalletQueryWriter(session_factory, batch_size=100, flush_interval=0.01)
+        writer.start()
+        await writer.enqueue(make_wallet_info(1), utcnow())
+        await asyncio.sleep(0.2)
+        rows = await count_rows(session_factory)
+        await writer.stop(timeout=5)
+        await engine.dispose()
+        return rows
+
+    assert asyncio.run(run()) == 1
+
+def test_writer_drops_records_when_queue_is_full():
+    async def run():
+        engine, session_factory = await make_session_factory()
+        writer = WalletQueryWriter(session_factory, max_queue_size=2, overflow="drop")
+        results = [await writer.enqueue(make_wallet_info(i), utcnow()) for i in range(5)]
+        await engine.dispose()
+        return writer.stats(), results
+
+    stats, results = asyncio.run(run())
+
+    assert results == [True, True, False, False, False]
+    assert stats["dropped"] == 3
+
+def test_writer_keeps_newest_snapshot_in_wallet_latest():
+    async def write(session_factory, records):
+        writer = WalletQueryWriter(session_factory, batch_size=10, flush_interval=0.01)
+        writer.start()
+        for wallet_info, created_at in records:
+            await writer.enqueue(wallet_info, created_at)
+        await writer.stop(timeout=5)
+
+    async def run():
+        engine, session_factory = await make_session_factory()
+        now = utcnow()
+        await write(session_factory, [
+            (make_wallet_info(2), now),
+            (WalletInfo(address="address_2", trx_balance=1), now - timedelta(seconds=5)),
+            (make_wallet_info(3), now),
+        ])
+        # Запоздавшая пачка со старым снимком не затирает новый
+        await write(session_factory, [(WalletInfo(address="address_3", trx_balance=0), now - timedelta(seconds=1))])
+        async with session_factory() as session:
+            latest = {row.address: row for row in (await session.scalars(select(WalletLatest))).all()}
+            history = await count_rows(session_factory)
+        await engine.dispose()
+        return latest, history
+
+    latest, history = asyncio.run(run())
+
+    assert history == 4
+    assert set(latest) == {"address_2", "address_3"}
+    assert latest["address_2"].trx_balance == 2
+    assert latest["address_3"].trx_balance == 3
@@ -0,0 +1,204 @@
+import asyncio
+import httpx
+import pytest
+from unittest.mock import AsyncMock
+from app.api.errors import TronAPIError, UpstreamUnavailableError
+from app.services.tron import TronService
+from app.utils.cache import cache_manager
+from app.utils.resilience import CLOSED, HALF_OPEN, OPEN, AdaptiveConcurrencyLimiter, CircuitBreaker
+
+TEST_ADDRESS = "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL"
+
+def test_breaker_opens_after_consecutive_failures_and_probes():
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=0.05)
+
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+
+    assert breaker.state == OPEN
+    with pytest.raises(UpstreamUnavailableError):
+        breaker.before_call()
+
+    asyncio.run(asyncio.sleep(0.06))
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
+    # Пока идёт пробный вызов, остальные отклоняются
+    with pytest.raises(UpstreamUnavailableError):
+        breaker.before_call()
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.rejected == 2
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=0.05)
+    breaker.record_failure()
+    asyncio.run(asyncio.sleep(0.06))
+
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+
+def test_limiter_increases_on_fast_success_and_backs_off_on_failure():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=1, max_limit=5, latency_target=1.0, backoff=0.5)
+
+    async def run():
+        for _ in range(8):
+            await limiter.acquire()
+            limiter.release(latency=0.01)
+        grown = limiter.limit
+        await limiter.acquire()
+        limiter.release(latency=0.01, failed=True)
+        return grown
+
+    grown = asyncio.run(run())
+
+    assert grown == 5
+    assert limiter.limit == 2.5
+    assert limiter.in_flight == 0
+
+def test_limiter_rejects_after_queue_timeout():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, queue_timeout=0.01)
+
+    async def run():
+        await limiter.acquire()
+        with pytest.raises(UpstreamUnavailableError):
+            await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        limiter.release(latency=0.01)
+        await waiter
+        return limiter.in_flight
+
+    assert asyncio.run(run()) == 1
+    assert limiter.rejected == 1
+
+def test_service_fails_fast_when_breaker_is_open(tron_client):
+    client = tron_client
+    client.get_account.side_effect = httpx.HTTPStatusError(
+        "503", request=httpx.Request("POST", "http://tron"), response=httpx.Response(503)
+    )
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=60)
+    service = TronService(client=client, breaker=breaker, limiter=None)
+
+    with pytest.raises(TronAPIError):
+        asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+    assert breaker.state == OPEN
+    calls = client.get_account.await_count
+
+    with pytest.raises(UpstreamUnavailableError):
+        asyncio.run(service.get_wallet_info("another_address"))
+    assert client.get_account.await_count == calls
+
+def test_service_serves_stale_value_while_breaker_is_open(tron_client):
+    client = tron_client
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=60)
+    service = TronService(client=client, breaker=breaker, limiter=None)
+
+    async def run():
+        fresh = await service.get_wallet_info(TEST_ADDRESS)
+        key = cache_manager.make_key("wallet_info", TEST_ADDRESS)
+        await cache_manager.set(key, fresh, ttl=0, stale_ttl=60)
+        breaker.record_failure()
+        stale = await service.get_wallet_info(TEST_ADDRESS)
+        await asyncio.sleep(0.01)
+        return fresh, stale
+
+    fresh, stale = asyncio.run(run())
+
+    assert stale == fresh
+    assert client.get_account.await_count == 1
+
+def test_cached_falls_back_to_stale_value_and_does_not_cache_the_error():
+    calls = 0
+
+    @cache_manager.cached(ttl=60, key_prefix="fallback", negative_ttl=60,
+                          negative_exceptions=(TronAPIError,),
+                          fallback_exceptions=(UpstreamUnavailableError,))
+    async def load(key: str) -> str:
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise UpstreamUnavailableError("circuit open")
+        return "fresh"
+
+    async def run():
+        await cache_manager.set(cache_manager.make_key("fallback", "a"), "old", ttl=0, stale_ttl=60)
+        stale = await load("a")
+        with pytest.raises(UpstreamUnavailableError):
+            await load("b")
+        return stale, await load("b")
+
+    assert asyncio.run(run()) == ("old", "fresh")
+    assert cache_manager.stats()["fallback_hits"] == 1
+
+def test_cached_falls_back_to_expired_value_until_fallback_ttl():
+    upstream_down = False
+
+    @cache_manager.cached(ttl=0.05, key_prefix="expired_fallback", stale_ttl=0,
+                          fallback_exceptions=(UpstreamUnavailableError,), fallback_ttl=0.2)
+    async def load(key: str) -> str:
+        if upstream_down:
+            raise UpstreamUnavailableError("circuit open")
+        return "old"
+
+    async def run():
+        nonlocal upstream_down
+        assert await load("a") == "old"
+        upstream_down = True
+        # Окно SWR (stale_ttl=0) уже прошло, запись держится только ради fallback
+        await asyncio.sleep(0.1)
+        fallback = await load("a")
+        await asyncio.sleep(0.2)
+        with pytest.raises(UpstreamUnavailableError):
+            await load("a")
+        return fallback
+
+    assert asyncio.run(run()) == "old"
+    assert cache_manager.stats()["fallback_hits"] == 1
+    assert cache_manager.stats()["stale_hits"] == 0
+
+def test_half_open_lookup_is_admitted_as_one_probe(tron_client):
+    client = tron_client
+
+    async def get_account(address):
+        await asyncio.sleep(0.01)
+        return {"balance": 1}
+
+    async def get_account_resource(address):
+        await asyncio.sleep(0.01)
+        return {"freeNetLimit": 10}
+
+    client.get_account = AsyncMock(side_effect=get_account)
+    client.get_account_resource = AsyncMock(side_effect=get_account_resource)
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=0.05)
+    service = TronService(client=client, breaker=breaker, limiter=None)
+    breaker.record_failure()
+    asyncio.run(asyncio.sleep(0.06))
+
+    assert breaker.state == HALF_OPEN
+    wallet_info = asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+
+    assert wallet_info.address == TEST_ADDRESS
+    assert breaker.state == CLOSED
+    assert breaker.rejected == 0
+
+def test_rate_limit_rejection_is_neither_success_nor_failure(tron_client):
+    client = tron_client
+    client.get_account.side_effect = UpstreamUnavailableError("TronGrid rate limit budget exhausted")
+    client.get_account_resource.side_effect = UpstreamUnavailableError("TronGrid rate limit budget exhausted")
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=60)
+    breaker.record_failure()
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, latency_target=1.0)
+    service = TronService(client=client, breaker=breaker, limiter=limiter)
+
+    with pytest.raises(UpstreamUnavailableError):
+        asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+
+    # Отказ до отправки запроса не сбрасывает счётчик ошибок и не растит лимит
+    assert breaker.stats()["failures"] == 1
+    assert breaker.state == CLOSED
+    assert limiter.limit == 4
+    assert limiter.in_flight == 0
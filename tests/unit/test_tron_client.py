@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from app.api.errors import UpstreamUnavailableError
+from app.utils import tron_client
+from app.utils.rate_limit import KeyPoolRateLimiter, parse_retry_after
+from app.utils.tron_client import API_KEY_HEADER, RateLimitedTransport, create_http_client, host_in_domains
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_http_client_reuses_keepalive_connections(stub_server):
+    async def run():
+        client, transport = create_http_client()
+        async with client:
+            for _ in range(3):
+                response = await client.post(f"{stub_server}/wallet/getaccount", json={})
+                assert response.status_code == 200
+            return transport.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["misses"] == 1
+    assert stats["hits"] == 2
+    assert stats["connections"] == 1
+
+def test_get_tron_client_is_shared():
+    async def run():
+        first = tron_client.get_tron_client()
+        second = tron_client.get_tron_client()
+        await tron_client.close_tron_client()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first is second
+    assert tron_client.get_pool_stats()["connections"] == 0
+
+class ThrottlingHandler(StubHandler):
+    seen_keys: list = []
+
+    def do_POST(self):
+        key = self.headers.get("TRON-PRO-API-KEY")
+        self.seen_keys.append(key)
+        if key == "exhausted":
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(429)
+            self.send_header("Retry-After", "30")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_POST()
+
+@pytest.fixture
+def throttling_server():
+    ThrottlingHandler.seen_keys = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottlingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_rate_limited_transport_rotates_key_after_429(throttling_server, monkeypatch):
+    monkeypatch.setattr(tron_client.settings, "TRON_API_KEY_DOMAINS", "127.0.0.1")
+    limiter = KeyPoolRateLimiter(["exhausted", "healthy"], rate=0.001, burst=5)
+    # Первым выбирается ключ с наибольшим остатком токенов
+    limiter.keys[1].bucket.tokens = 4
+
+    async def run():
+        client, _ = create_http_client(limiter)
+        async with client:
+            statuses = [
+                (await client.post(f"{throttling_server}/wallet/getaccount", json={})).status_code
+                for _ in range(3)
+            ]
+        return statuses
+
+    statuses = asyncio.run(run())
+
+    assert statuses == [200, 200, 200]
+    assert ThrottlingHandler.seen_keys == ["exhausted", "healthy", "healthy", "healthy"]
+    assert limiter.stats()["throttled"] == 1
+    assert limiter.stats()["available_keys"] == 1
+
+def test_api_key_is_sent_only_to_key_domains():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append((request.url.host, request.headers.get(API_KEY_HEADER)))
+        return httpx.Response(200, json={})
+
+    limiter = KeyPoolRateLimiter(["key"], rate=0.001, burst=1)
+    transport = RateLimitedTransport(httpx.MockTransport(handler), limiter, domains=["trongrid.io"])
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.post("https://api.trongrid.io/wallet/getaccount", json={})
+            # Запрос, скопированный с попытки к TronGrid, не уносит ключ на другой узел
+            await client.post("https://node.example.com/wallet/getaccount", json={}, headers={API_KEY_HEADER: "key"})
+
+    asyncio.run(run())
+
+    assert seen == [("api.trongrid.io", "key"), ("node.example.com", None)]
+    # Квота TronGrid не расходуется на чужие узлы
+    assert limiter.stats()["requests"] == 1
+    assert host_in_domains("API.TronGrid.io", ["trongrid.io"])
+    assert not host_in_domains("eviltrongrid.io", ["trongrid.io"])
+
+def test_rate_limiter_waits_for_tokens_and_rejects_past_budget():
+    limiter = KeyPoolRateLimiter([], rate=50, burst=1, max_wait=0.1)
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        await limiter.acquire()
+        await limiter.acquire()
+        waited = asyncio.get_running_loop().time() - started
+        limiter.throttle(limiter.keys[0], retry_after=10)
+        with pytest.raises(UpstreamUnavailableError):
+            await limiter.acquire()
+        return waited
+
+    waited = asyncio.run(run())
+
+    assert 0.01 <= waited < 0.1
+    assert limiter.keys[0].api_key is None
+    assert limiter.stats()["rejected"] == 1
+
+def test_rate_limiter_defaults_to_configured_api_keys(monkeypatch):
+    monkeypatch.setattr(tron_client.settings, "TRON_RATE_LIMIT_ENABLED", None)
+    monkeypatch.setattr(tron_client.settings, "TRON_API_KEYS", "")
+    assert tron_client.create_rate_limiter() is None
+
+    monkeypatch.setattr(tron_client.settings, "TRON_API_KEYS", "key-a,key-b")
+    limiter = tron_client.create_rate_limiter()
+    assert [state.api_key for state in limiter.keys] == ["key-a", "key-b"]
+
+    # Явное включение оставляет общий анонимный лимит
+    monkeypatch.setattr(tron_client.settings, "TRON_RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(tron_client.settings, "TRON_API_KEYS", "")
+    assert tron_client.create_rate_limiter().keys[0].api_key is None
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5", default=1.0) == 2.5
+    assert parse_retry_after(None, default=1.0) == 1.0
+    assert parse_retry_after("garbage", default=1.0) == 1.0
+    assert 0 < parse_retry_after(formatdate(time.time() + 60, usegmt=True), default=1.0) <= 60
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from tronpy.exceptions import AddressNotFound
+from app.api.errors import TronAPIError, WalletNotFoundError
+from app.services.tron import TronService, parse_wallet_info
+
+TEST_ADDRESS = "TNPeeaaFB7K9cmo4uQpcU32zGK8G1NYqeL"
+
+def test_get_wallet_info_success(tron_client):
+    client = tron_client
+    service = TronService(client=client)
+
+    wallet_info = asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+
+    assert wallet_info.address == TEST_ADDRESS
+    assert wallet_info.bandwidth == 120
+    assert wallet_info.energy == 30
+    assert wallet_info.trx_balance == 15
+    assert wallet_info.resources.free_net_limit == 600
+    assert wallet_info.resources.energy_used == 970
+    client.get_account.assert_awaited_once_with(TEST_ADDRESS)
+    client.get_account_resource.assert_awaited_once_with(TEST_ADDRESS)
+    # Баланс берётся из ответа getaccount, отдельный запрос не нужен
+    client.get_account_balance.assert_not_awaited()
+
+def test_parse_wallet_info_defaults_missing_fields():
+    wallet_info = parse_wallet_info(TEST_ADDRESS, {"address": TEST_ADDRESS}, {"freeNetLimit": 600})
+
+    assert wallet_info.trx_balance == 0
+    assert wallet_info.bandwidth is None
+    assert wallet_info.energy is None
+    assert wallet_info.resources.free_net_limit == 600
+
+def test_parse_wallet_info_keeps_history_units():
+    # Смысл полей в wallet_queries и сводках не меняется: израсходованные
+    # ресурсы из getaccount и баланс в целых TRX
+    wallet_info = parse_wallet_info(
+        TEST_ADDRESS,
+        {"balance": 10_999_999, "free_net_usage": 250, "account_resource": {"energy_usage": 40}},
+        {"freeNetLimit": 600, "freeNetUsed": 250, "EnergyLimit": 1000, "EnergyUsed": 40}
+    )
+
+    assert (wallet_info.bandwidth, wallet_info.energy, wallet_info.trx_balance) == (250, 40, 10)
+
+def test_get_wallet_info_runs_upstream_calls_concurrently(tron_client):
+    in_flight = 0
+    max_in_flight = 0
+
+    def slow_call(result):
+        async def call(addr):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return result
+        return call
+
+    client = tron_client
+    client.get_account.side_effect = slow_call({"balance": 1})
+    client.get_account_resource.side_effect = slow_call({"freeNetLimit": 1})
+    service = TronService(client=client)
+
+    asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+
+    assert max_in_flight == 2
+
+def test_get_wallet_info_api_error(tron_client):
+    client = tron_client
+    client.get_account.side_effect = ValueError("bad address")
+    service = TronService(client=client)
+
+    with pytest.raises(TronAPIError, match="API request failed"):
+        asyncio.run(service.get_wallet_info(TEST_ADDRESS))
+
+def test_get_multiple_wallets_deduplicates_and_reports_errors(tron_client):
+    client = tron_client
+
+    async def get_account(addr):
+        if addr == "bad":
+            raise ValueError("bad address")
+        return {"balance": 1_000_000}
+
+    client.get_account.side_effect = get_account
+    service = TronService(client=client)
+
+    results = asyncio.run(service.get_multiple_wallets([TEST_ADDRESS, "bad", TEST_ADDRESS]))
+
+    assert list(results) == [TEST_ADDRESS, "bad"]
+    assert results[TEST_ADDRESS].trx_balance == 1
+    assert isinstance(results["bad"], TronAPIError)
+    assert client.get_account.await_count == 2
+
+def test_get_multiple_wallets_respects_concurrency_limit(tron_client):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def get_account(addr):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {}
+
+    client = tron_client
+    client.get_account.side_effect = get_account
+    service = TronService(client=client)
+
+    addresses = [f"address_{i}" for i in range(10)]
+    results = asyncio.run(service.get_multiple_wallets(addresses, concurrency=3))
+
+    assert len(results) == 10
+    assert max_in_flight == 3
+
+def test_get_wallet_info_not_found(tron_client):
+    client = tron_client
+    client.get_account.side_effect = AddressNotFound("account not found on-chain")
+    service = TronService(client=client)
+
+    with pytest.raises(WalletNotFoundError):
+        asyncio.run(service.get_wallet_info(TEST_ADDRESS))
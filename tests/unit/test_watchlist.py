@@ -0,0 +1,97 @@
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from app.models import Base, WalletQuery, utcnow
+from app.services.tron import TronService
+from app.services.watchlist import WatchlistRefresher
+from app.utils.cache import cache_manager
+
+async def make_session_factory(rows: list[WalletQuery]):
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as session:
+        session.add_all(rows)
+        await session.commit()
+    return engine, session_factory
+
+def make_service() -> Mock:
+    service = Mock()
+    service.refresh_wallet_info = AsyncMock()
+    return service
+
+def test_watchlist_combines_configured_and_most_frequent_addresses():
+    now = utcnow()
+    rows = (
+        [WalletQuery(address="hot", created_at=now) for _ in range(3)]
+        + [WalletQuery(address="warm", created_at=now) for _ in range(2)]
+        + [WalletQuery(address="cold", created_at=now)]
+        + [WalletQuery(address="old", created_at=now - timedelta(days=2)) for _ in range(5)]
+    )
+
+    async def run():
+        engine, session_factory = await make_session_factory(rows)
+        refresher = WatchlistRefresher(
+            make_service(), session_factory, addresses=["pinned", "hot"], top_n=2, lookback=timedelta(hours=24)
+        )
+        addresses = await refresher.load_addresses()
+        await engine.dispose()
+        return addresses
+
+    assert asyncio.run(run()) == ["pinned", "hot", "warm"]
+
+def test_refresher_refreshes_watched_addresses_before_expiry():
+    service = make_service()
+
+    async def run():
+        refresher = WatchlistRefresher(
+            service, None, addresses=["a", "b"], top_n=0, refresh_interval=0.05, max_rps=1000
+        )
+        refresher.start()
+        await asyncio.sleep(0.18)
+        await refresher.stop()
+        return refresher.stats()
+
+    stats = asyncio.run(run())
+
+    refreshed = [call.args[0] for call in service.refresh_wallet_info.await_args_list]
+    assert refreshed.count("a") >= 3
+    assert refreshed.count("b") >= 3
+    assert stats["watched"] == 2
+    assert stats["failed"] == 0
+
+def test_refresher_stays_within_upstream_budget():
+    service = make_service()
+
+    async def run():
+        refresher = WatchlistRefresher(
+            service, None, addresses=[f"address_{i}" for i in range(5)], top_n=0,
+            refresh_interval=0.001, max_rps=10
+        )
+        refresher.start()
+        await asyncio.sleep(0.3)
+        await refresher.stop()
+
+    asyncio.run(run())
+
+    # Стартовый запас корзины (10 вызовов) + 10 вызовов в секунду, по 2 на обновление
+    assert 3 <= service.refresh_wallet_info.await_count <= 7
+
+def test_refresh_wallet_info_warms_cache_for_lookups():
+    client = Mock()
+    client.get_account = AsyncMock(return_value={"balance": 7_000_000})
+    client.get_account_resource = AsyncMock(return_value={})
+    service = TronService(client=client, breaker=None, limiter=None)
+
+    async def run():
+        await service.refresh_wallet_info("hot")
+        return await service.get_wallet_info("hot")
+
+    wallet_info = asyncio.run(run())
+
+    assert wallet_info.trx_balance == 7
+    assert client.get_account.await_count == 1
+    assert cache_manager.stats()["hits"] == 1